@@ -0,0 +1,229 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# The benchmark cases of detectors, thresholders, suppressors, severity level and caches
+
+from __future__ import absolute_import
+import copy
+from abc import ABC, abstractmethod
+from typing import Callable, Dict
+
+import pandas as pd
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.differentiate_ad import DIFFERENTIATEAD
+from castor.detector.incremental_ad import IncrementalAD
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.severity_level.severity_level_combiner import (
+    SeverityLevelCombiner,
+)
+from castor.detector.stream_filter.get_latest_data_module import (
+    LatestData,
+    LatestDataContext,
+)
+from castor.detector.suppressor.suppressor import (
+    LabelSuppressor,
+    SuppressorPipeline,
+)
+from castor.detector.threshold_ad import ThresholdAD
+from castor.detector.thresholder.thresholder import ThresholderModule
+from castor.detector.value_change_ad import ValueChangeAD
+from castor.utils import const as con
+
+_NAME = "benchmark"
+
+DETECTORS = {
+    con.THRESHOLD_AD: ThresholdAD,
+    con.INCREMENTAL_AD: IncrementalAD,
+    con.DIFFERENTIATE_AD: DIFFERENTIATEAD,
+    con.VALUE_CHANGE_AD: ValueChangeAD,
+    con.BATCH_DIFFERENTIATE_AD: DIFFERENTIATEAD,
+}
+
+
+class BenchmarkCase(ABC):
+    """
+    A benchmark case runs on the chunks of a stream after warming up with the history.
+    Only run is timed, prepare and after are for building inputs and updating state.
+    """
+
+    def __init__(self, params: dict):
+        # some modules write their parameters, keep the original ones intact
+        self.params = copy.deepcopy(params)
+        self.cache_set = StateStore()
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        pass
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return data, labels
+
+    @abstractmethod
+    def run(self, *args) -> None:
+        pass
+
+    def after(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        pass
+
+
+class DetectorCase(BenchmarkCase):
+    """the detect of a detector, the latest data is updated after every chunk"""
+
+    def __init__(self, params: dict, algo: str):
+        super().__init__(params)
+        self.detector = DETECTORS[algo](_NAME, self.params[algo], self.cache_set)
+        self.window = self.params[algo].get(con.WINDOW) or 0
+        self.latest_data = LatestData(self.cache_set)
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.latest_data.update(self.window, data)
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return ({con.ORIGIN: data},)
+
+    def run(self, time_series: dict) -> None:
+        self.detector.detect(time_series)
+
+    def after(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.latest_data.update(self.window, data)
+
+
+class ThresholderCase(BenchmarkCase):
+    """the thresholder on the absolute difference of data"""
+
+    def __init__(self, params: dict, choice: str, algo: str):
+        super().__init__(params)
+        threshold_params = self.params[algo][con.DYNAMIC_THRESHOLD]
+        self.thresholder = ThresholderModule(
+            _NAME,
+            {"CHOICE": choice, choice: threshold_params[choice]},
+            self.cache_set,
+        )
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.thresholder.thresholder(data.diff().abs().iloc[1:])
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return (data.diff().abs().fillna(0),)
+
+    def run(self, score: pd.DataFrame) -> None:
+        self.thresholder.thresholder(score)
+
+
+class SuppressorCase(BenchmarkCase):
+    """a suppressor on the labels of injected spikes"""
+
+    def __init__(self, params: dict, suppressor: str):
+        super().__init__(params)
+        suppressor_params = self.params[con.ANOMALY_SUPPRESS]["common"][suppressor]
+        suppressor_class = SuppressorPipeline(_NAME, None).suppressor_dict[suppressor]
+        self.suppressor = suppressor_class(_NAME, suppressor_params, self.cache_set)
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.run(labels.copy(), data)
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return labels.copy(), data
+
+    def run(self, labels: pd.DataFrame, data: pd.DataFrame) -> None:
+        if isinstance(self.suppressor, LabelSuppressor):
+            self.suppressor.suppress(labels)
+        else:
+            self.suppressor.suppress(labels, data)
+
+
+class SeverityLevelCase(BenchmarkCase):
+    """the severity level combiner on the labels of injected spikes"""
+
+    def __init__(self, params: dict):
+        super().__init__(params)
+        self.combiner = SeverityLevelCombiner(
+            _NAME, self.params[con.SEVERITY_LEVEL], self.cache_set
+        )
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return ({con.LABEL: labels.copy()},)
+
+    def run(self, time_series: dict) -> None:
+        self.combiner.run(time_series, {con.ALGO: con.THRESHOLD_AD})
+
+
+class LatestDataCase(BenchmarkCase):
+    """stitching the cached history with the new data, and updating the cache"""
+
+    def __init__(self, params: dict):
+        super().__init__(params)
+        self.latest_data = LatestData(self.cache_set)
+        self.window = max(
+            self.params[algo].get(con.WINDOW) or 0 for algo in con.NON_TRAINABLE_AD
+        )
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.latest_data.update(self.window, data)
+
+    def run(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        LatestDataContext(self.latest_data, data, self.window).get_data(self.window)
+        self.latest_data.update(self.window, data)
+
+
+class PipelineDetectorCase(BenchmarkCase):
+    """the whole PipelineDetector with all non trainable detectors"""
+
+    def __init__(self, params: dict):
+        super().__init__(params)
+        self.detector = PipelineDetector(
+            algo=list(con.NON_TRAINABLE_AD),
+            params=self.params,
+            cache_set=self.cache_set,
+        )
+
+    def setup(self, data: pd.DataFrame, labels: pd.DataFrame) -> None:
+        self.detector.run(data)
+
+    def prepare(self, data: pd.DataFrame, labels: pd.DataFrame) -> tuple:
+        return (data.copy(),)
+
+    def run(self, data: pd.DataFrame) -> None:
+        self.detector.run(data)
+
+
+def get_cases() -> Dict[str, Callable[[dict], BenchmarkCase]]:
+    """
+    :return: the factories of all benchmark cases, keyed by the name of case
+    """
+    cases = {}
+    for algo in con.NON_TRAINABLE_AD:
+        cases["detector.%s" % algo] = lambda params, algo=algo: DetectorCase(
+            params, algo
+        )
+    for choice, algo in [
+        (con.SIGEWM_THRESHOLDER, con.DIFFERENTIATE_AD),
+        (con.SIGMA_THRESHOLDER, con.BATCH_DIFFERENTIATE_AD),
+        (con.WELFORD_THRESHOLDER, con.BATCH_DIFFERENTIATE_AD),
+    ]:
+        cases["thresholder.%s" % choice] = (
+            lambda params, choice=choice, algo=algo: ThresholderCase(
+                params, choice, algo
+            )
+        )
+    for suppressor in SuppressorPipeline(_NAME, None).suppressor_dict:
+        cases["suppressor.%s" % suppressor] = (
+            lambda params, suppressor=suppressor: SuppressorCase(params, suppressor)
+        )
+    cases["severity_level.SeverityLevelCombiner"] = SeverityLevelCase
+    cases["cache.LatestData"] = LatestDataCase
+    cases["pipeline.PipelineDetector"] = PipelineDetectorCase
+    return cases
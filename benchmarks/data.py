@@ -0,0 +1,55 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Generating synthetic series for benchmarks
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+
+
+def generate_series(
+    columns: int = 10,
+    length: int = 1000,
+    freq: str = "T",
+    anomaly_rate: float = 0.01,
+    seed: int = 0,
+    start: str = "2022-08-24",
+) -> (pd.DataFrame, pd.DataFrame):
+    """
+    generate random walks around 30 with spikes injected
+    :param columns: the number of columns
+    :param length: the number of points of every column
+    :param freq: the cadence of points
+    :param anomaly_rate: the rate of points with a spike
+    :param seed: the seed of random generator
+    :param start: the first timestamp
+    :return: the data and the labels of injected spikes
+    """
+    rng = np.random.default_rng(seed)
+    values = 30 + rng.normal(scale=0.5, size=(length, columns)).cumsum(axis=0)
+    labels = rng.random(size=(length, columns)) < anomaly_rate
+    spikes = rng.choice([-1, 1], size=(length, columns)) * rng.uniform(
+        20, 50, size=(length, columns)
+    )
+    values = np.where(labels, values + spikes, values)
+    index = pd.date_range(start=start, periods=length, freq=freq)
+    names = ["field%d" % i for i in range(columns)]
+    return (
+        pd.DataFrame(values, index=index, columns=names),
+        pd.DataFrame(labels, index=index, columns=names),
+    )
@@ -0,0 +1,236 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Running the benchmarks, saving the results and comparing them with a baseline
+#
+# usage:
+#   python -m benchmarks.run_benchmarks --columns 10 100 --output result.json
+#   python -m benchmarks.run_benchmarks --baseline result.json --output new.json
+
+from __future__ import absolute_import
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+from castor.utils import const as con
+from castor.utils import logger as llogger
+from castor.utils.base_functions import load_params_from_yaml
+from .cases import BenchmarkCase, get_cases
+from .data import generate_series
+
+DEFAULT_CONFIG = os.path.join(
+    os.path.dirname(os.path.dirname(con.CASTOR_PATH)), "conf", "detect_base.yaml"
+)
+
+
+def _stream(data: pd.DataFrame, labels: pd.DataFrame, warmup: int, chunk: int):
+    for start in range(warmup, len(data) - chunk + 1, chunk):
+        yield data.iloc[start : start + chunk], labels.iloc[start : start + chunk]
+
+
+def run_case(
+    factory: Callable[[dict], BenchmarkCase],
+    params: dict,
+    data: pd.DataFrame,
+    labels: pd.DataFrame,
+    warmup: int,
+    chunk: int,
+    memory: bool = True,
+) -> dict:
+    """
+    run one case on the stream of data
+    :return: the points per second, the percentiles of latency per call in seconds,
+        and the peak memory allocated while running in bytes
+    """
+    case = factory(params)
+    case.setup(data.iloc[:warmup], labels.iloc[:warmup])
+    latencies = []
+    for data_chunk, label_chunk in _stream(data, labels, warmup, chunk):
+        args = case.prepare(data_chunk, label_chunk)
+        start = time.perf_counter()
+        case.run(*args)
+        latencies.append(time.perf_counter() - start)
+        case.after(data_chunk, label_chunk)
+    latencies = np.array(latencies)
+    result = {
+        "calls": len(latencies),
+        "points_per_second": len(latencies) * chunk * data.shape[1] / latencies.sum(),
+        "latency_seconds": {
+            "mean": latencies.mean(),
+            "p50": np.percentile(latencies, 50),
+            "p90": np.percentile(latencies, 90),
+            "p99": np.percentile(latencies, 99),
+            "max": latencies.max(),
+        },
+    }
+
+    if memory:
+        # tracing memory slows the run down, so measure it in a separate pass
+        case = factory(params)
+        case.setup(data.iloc[:warmup], labels.iloc[:warmup])
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for data_chunk, label_chunk in _stream(data, labels, warmup, chunk):
+            case.run(*case.prepare(data_chunk, label_chunk))
+            case.after(data_chunk, label_chunk)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_memory_bytes"] = peak - baseline
+    return result
+
+
+def run_benchmarks(
+    params: dict,
+    columns: List[int],
+    length: int,
+    warmup: int,
+    chunk: int,
+    freq: str = "T",
+    anomaly_rate: float = 0.01,
+    cases: List[str] = None,
+    memory: bool = True,
+) -> List[dict]:
+    """
+    run the cases matching any of the patterns in cases on the scales of columns
+    """
+    results = []
+    for number_columns in columns:
+        data, labels = generate_series(
+            columns=number_columns,
+            length=length,
+            freq=freq,
+            anomaly_rate=anomaly_rate,
+        )
+        for name, factory in get_cases().items():
+            if cases and not any(pattern in name for pattern in cases):
+                continue
+            result = {"case": name, "columns": number_columns, "chunk": chunk}
+            result.update(
+                run_case(factory, params, data, labels, warmup, chunk, memory)
+            )
+            results.append(result)
+            print(
+                "%-50s columns=%-6d %12.0f points/s  p99=%.6fs"
+                % (
+                    name,
+                    number_columns,
+                    result["points_per_second"],
+                    result["latency_seconds"]["p99"],
+                )
+            )
+    return results
+
+
+def _result_key(result: dict) -> tuple:
+    return result["case"], result["columns"], result["chunk"]
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """
+    compare the points per second with baseline
+    :return: the descriptions of the cases slower than baseline by more than tolerance
+    """
+    baseline = {_result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get(_result_key(result))
+        if base is None:
+            continue
+        ratio = result["points_per_second"] / base["points_per_second"]
+        print(
+            "%-50s columns=%-6d %6.2fx of baseline"
+            % (result["case"], result["columns"], ratio)
+        )
+        if ratio < 1 - tolerance:
+            regressions.append(
+                "%s columns=%d: %.0f points/s, baseline %.0f points/s"
+                % (
+                    result["case"],
+                    result["columns"],
+                    result["points_per_second"],
+                    base["points_per_second"],
+                )
+            )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="benchmarks of castor")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--columns", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--length", type=int, default=1500)
+    parser.add_argument("--warmup", type=int, default=300)
+    parser.add_argument("--chunk", type=int, default=60)
+    parser.add_argument("--freq", default="T")
+    parser.add_argument("--anomaly-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--cases", nargs="*", default=None, help="run the cases containing any of them"
+    )
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", default=None, help="the json file of results")
+    parser.add_argument("--baseline", default=None, help="the json file to compare")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args(argv)
+
+    llogger.set_log_filename(os.devnull)
+    llogger.basic_config(level=args.log_level)
+    results = run_benchmarks(
+        params=load_params_from_yaml(config_file=args.config),
+        columns=args.columns,
+        length=args.length,
+        warmup=args.warmup,
+        chunk=args.chunk,
+        freq=args.freq,
+        anomaly_rate=args.anomaly_rate,
+        cases=args.cases,
+        memory=not args.no_memory,
+    )
+    output = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2, default=float)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("regression: %s" % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,13 +15,22 @@ limitations under the License.
 """
 
 from __future__ import absolute_import
+import threading
+import weakref
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
 
 from ...utils import const as con
-from ...utils.common import Singleton
+from ...utils.common import FIFOData, Singleton
+from ...utils.instrumentation import Instrumentation
 
+# all of the living state stores, used to expire or clear caches of every detector
+_STATE_STORES = weakref.WeakSet()
 
-@Singleton
-class KeyCache(object):
+
+class KeySet(object):
     def __init__(self):
         self._cache_key = set()
 
@@ -38,30 +47,55 @@ class KeyCache(object):
         self._cache_key = set()
 
 
+@Singleton
+class KeyCache(KeySet):
+    pass
+
+
 class KeyValueCache:
+    """
+    The cache may be written by the sub-pipelines running in multiple threads,
+    so that the operations changing the cache are locked.
+    """
+
     def __init__(self):
         self._cache = dict()
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
 
     def get_value(self, key, default=None):
         return self._cache.get(key, default)
 
     def clear(self):
-        self._cache = dict()
+        with self._lock:
+            self._cache = dict()
 
     def update(self, cache_dict: dict):
-        self._cache.update(cache_dict)
+        with self._lock:
+            self._cache.update(cache_dict)
 
     def remove_values_skip_keys(self, keys):
-        for key in list(self.keys()):
-            if key not in keys:
-                self._cache.pop(key)
+        with self._lock:
+            for key in list(self.keys()):
+                if key not in keys:
+                    self._cache.pop(key)
 
     def remove_values_by_keys(self, keys: list):
-        for key in keys:
-            self._cache.pop(key, None)
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
 
     def set_value(self, key, data):
-        self._cache[key] = data
+        with self._lock:
+            self._cache[key] = data
 
     def keys(self):
         return self._cache.keys()
@@ -78,29 +112,582 @@ class KeyValueCache:
 
 class PostfixCache(KeyValueCache):
     def remove_values_skip_keys(self, keys):
-        for key in list(self.keys()):
-            if all(not key.endswith(value) for value in keys):
-                self._cache.pop(key)
+        with self._lock:
+            for key in list(self.keys()):
+                if all(not key.endswith(value) for value in keys):
+                    self._cache.pop(key)
 
     def remove_values_by_keys(self, keys: list):
-        for key in list(self.keys()):
-            if any(key.endswith(value) for value in keys):
-                self._cache.pop(key)
+        with self._lock:
+            for key in list(self.keys()):
+                if any(key.endswith(value) for value in keys):
+                    self._cache.pop(key)
+
+
+# the timestamp of the values restored without timestamps
+_NO_TIME = np.iinfo(np.int64).min
+_NO_POINTS = (np.empty(0, dtype=np.int64), np.empty(0))
+
+
+class SeriesHistory(KeyValueCache):
+    """
+    The latest window values and timestamps of all series of a detector, kept in
+    one (n_series, window) ring buffer. Every series owns a row, the key of series
+    is mapped to its row, and the rows of expired series are reused.
+    The values of a series are get and set as a tuple of the values and timestamps
+    ordered by time, so that it can be used as the other caches of StateStore.
+    """
+
+    def __init__(self, window: int = 0):
+        super().__init__()
+        self.window = window
+        self._values = np.empty((0, window))
+        self._times = np.empty((0, window), dtype=np.int64)
+        # the position of the oldest value and the number of values of every row
+        self._start = np.zeros(0, dtype=np.int64)
+        self._length = np.zeros(0, dtype=np.int64)
+        self._free_rows = []
+
+    def get_rows(self, keys: List[str]) -> np.ndarray:
+        """
+        :return: the rows of keys, -1 for the keys not in history
+        """
+        cache = self._cache
+        return np.fromiter(
+            (cache.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def get_lengths(self, rows: np.ndarray) -> np.ndarray:
+        """
+        :return: the number of values of rows, 0 for the rows not in history
+        """
+        lengths = np.zeros(len(rows), dtype=np.int64)
+        found = rows >= 0
+        lengths[found] = self._length[rows[found]]
+        return lengths
+
+    def _add_rows(self, keys: List[str]) -> None:
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        missing = len(new_keys) - len(self._free_rows)
+        if missing > 0:
+            capacity = len(self._length)
+            new_capacity = max(capacity * 2, capacity + missing)
+            self._resize(new_capacity, self.window)
+            self._free_rows.extend(range(new_capacity - 1, capacity - 1, -1))
+        for key in new_keys:
+            self._cache[key] = self._free_rows.pop()
+
+    def _resize(self, capacity: int, window: int) -> None:
+        # copy the latest values of the rows in use into the new buffer
+        values = np.empty((capacity, window))
+        times = np.full((capacity, window), _NO_TIME, dtype=np.int64)
+        length = np.zeros(capacity, dtype=np.int64)
+        rows = np.flatnonzero(self._length)
+        if len(rows) and window:
+            length[rows] = np.minimum(self._length[rows], window)
+            count = length[rows].max()
+            positions = self._positions(rows, count)
+            # the rows shorter than count are aligned to the start of their buffer
+            shift = count - length[rows]
+            target = (np.arange(count) - shift[:, np.newaxis]) % window
+            values[rows[:, np.newaxis], target] = self._values[
+                rows[:, np.newaxis], positions
+            ]
+            times[rows[:, np.newaxis], target] = self._times[
+                rows[:, np.newaxis], positions
+            ]
+        self._values = values
+        self._times = times
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._length = length
+        self.window = window
+
+    def _positions(self, rows: np.ndarray, count: int) -> np.ndarray:
+        # the positions of the latest count values of rows, ordered by time
+        end = self._start[rows] + self._length[rows]
+        return (end[:, np.newaxis] - count + np.arange(count)) % self.window
+
+    def append(
+        self, keys: List[str], block: np.ndarray, times: np.ndarray, window: int
+    ) -> None:
+        """
+        append a block of new points to the series of keys
+        :param keys: the keys of series
+        :param block: the values, shape (n_points, n_series)
+        :param times: the timestamps of points in int64 nanoseconds, shape (n_points,)
+        :param window: the number of values to keep for every series
+        """
+        with self._lock:
+            if window != self.window:
+                self._resize(len(self._length), window)
+            self._add_rows(keys)
+            count = min(len(block), window)
+            if count == 0:
+                return
+            rows = self.get_rows(keys)
+            end = self._start[rows] + self._length[rows]
+            positions = (end[:, np.newaxis] + np.arange(count)) % window
+            self._values[rows[:, np.newaxis], positions] = block[-count:].T
+            self._times[rows[:, np.newaxis], positions] = times[-count:]
+            overflow = np.maximum(self._length[rows] + count - window, 0)
+            self._start[rows] = (self._start[rows] + overflow) % window
+            self._length[rows] += count - overflow
+
+    def gather(self, rows: np.ndarray, count: int) -> (np.ndarray, np.ndarray):
+        """
+        get the latest count values of rows, which have at least count values
+        :return: the values, shape (count, n_rows), and the timestamps of the first row,
+            None if the timestamps are not kept
+        """
+        positions = self._positions(rows, count)
+        values = self._values[rows[:, np.newaxis], positions].T
+        times = self._times[rows[0], positions[0]] if len(rows) else None
+        if times is not None and (times == _NO_TIME).any():
+            times = None
+        return values, times
 
+    def get_value(self, key, default=None):
+        row = self._cache.get(key)
+        if row is None:
+            return default
+        positions = self._positions(np.array([row]), self._length[row])[0]
+        return self._values[row, positions], self._times[row, positions]
+
+    def set_value(self, key, data: Union[tuple, FIFOData]):
+        """
+        set the values of series
+        :param data: the tuple of values and timestamps ordered by time,
+            or the FIFOData restored from the state of the old versions
+        """
+        if isinstance(data, FIFOData):
+            data = data.get_filling_data(), data.get_times()
+        values, times = data
+        if times is None:
+            times = np.full(len(values), _NO_TIME, dtype=np.int64)
+        with self._lock:
+            self.remove_values_by_keys([key])
+            window = max(self.window, len(values))
+            self.append([key], np.asarray(values)[:, np.newaxis], times, window)
 
-@Singleton
-class CacheSet:
-    def __init__(self, cache: dict = None):
+    def update(self, cache_dict: dict):
+        for key, data in cache_dict.items():
+            self.set_value(key, data)
+
+    def items(self):
+        return [(key, self.get_value(key)) for key in list(self.keys())]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        with self._lock:
+            self._cache = dict()
+            self._start[:] = 0
+            self._length[:] = 0
+            self._free_rows = list(range(len(self._length) - 1, -1, -1))
+
+    def remove_values_skip_keys(self, keys):
+        self.remove_values_by_keys([key for key in self.keys() if key not in keys])
+
+    def remove_values_by_keys(self, keys: list):
+        with self._lock:
+            for key in keys:
+                row = self._cache.pop(key, None)
+                if row is not None:
+                    self._start[row] = 0
+                    self._length[row] = 0
+                    self._free_rows.append(row)
+
+
+class WatermarkCache(KeyValueCache):
+    """
+    The latest timestamp of every series, held in an int64 array of nanoseconds
+    aligned with the map of the keys of series to their slots, so that the
+    timestamps of many series are compared at once.
+    The timestamps of a cache are in one time zone, they are get and set one by one
+    as pd.Timestamp, so that it can be used as the other caches of StateStore.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._watermarks = np.empty(0, dtype=np.int64)
+        self._free_slots = []
+        self._tz = None
+
+    def get_slots(self, keys: List[str]) -> np.ndarray:
+        """
+        :return: the slots of keys, -1 for the keys not in cache
+        """
+        cache = self._cache
+        return np.fromiter(
+            (cache.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def get_watermarks(self, keys: List[str]) -> np.ndarray:
+        """
+        :return: the latest timestamps of keys in int64 nanoseconds,
+            the minimum of int64 for the keys not in cache
+        """
+        slots = self.get_slots(keys)
+        watermarks = np.full(len(slots), _NO_TIME, dtype=np.int64)
+        found = slots >= 0
+        watermarks[found] = self._watermarks[slots[found]]
+        return watermarks
+
+    def get_latest(self, keys: List[str]) -> pd.Timestamp:
+        """
+        :return: the maximum of the latest timestamps of keys, None if no key is in cache
+        """
+        slots = self.get_slots(keys)
+        slots = slots[slots >= 0]
+        if not len(slots):
+            return None
+        return self.to_timestamp(self._watermarks[slots].max())
+
+    def set_watermarks(self, keys: List[str], timestamp: pd.Timestamp) -> None:
+        """
+        set the latest timestamp of all keys to timestamp
+        """
+        with self._lock:
+            self._add_slots(keys)
+            self._watermarks[self.get_slots(keys)] = timestamp.value
+            self._tz = timestamp.tz
+
+    def _add_slots(self, keys: List[str]) -> None:
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        missing = len(new_keys) - len(self._free_slots)
+        if missing > 0:
+            capacity = len(self._watermarks)
+            new_capacity = max(capacity * 2, capacity + missing)
+            watermarks = np.full(new_capacity, _NO_TIME, dtype=np.int64)
+            watermarks[:capacity] = self._watermarks
+            self._watermarks = watermarks
+            self._free_slots.extend(range(new_capacity - 1, capacity - 1, -1))
+        for key in new_keys:
+            self._cache[key] = self._free_slots.pop()
+
+    def to_timestamp(self, value: int) -> pd.Timestamp:
+        """
+        convert a timestamp in int64 nanoseconds to pd.Timestamp in the time zone of cache
+        """
+        if self._tz is None:
+            return pd.Timestamp(value)
+        return pd.Timestamp(value, tz="UTC").tz_convert(self._tz)
+
+    def get_value(self, key, default=None):
+        slot = self._cache.get(key)
+        if slot is None:
+            return default
+        return self.to_timestamp(self._watermarks[slot])
+
+    def set_value(self, key, data: pd.Timestamp):
+        self.set_watermarks([key], pd.Timestamp(data))
+
+    def update(self, cache_dict: dict):
+        for key, data in cache_dict.items():
+            self.set_value(key, data)
+
+    def items(self):
+        return [(key, self.get_value(key)) for key in list(self.keys())]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        with self._lock:
+            self._cache = dict()
+            self._watermarks[:] = _NO_TIME
+            self._free_slots = list(range(len(self._watermarks) - 1, -1, -1))
+
+    def remove_values_skip_keys(self, keys):
+        self.remove_values_by_keys([key for key in self.keys() if key not in keys])
+
+    def remove_values_by_keys(self, keys: list):
+        with self._lock:
+            for key in keys:
+                slot = self._cache.pop(key, None)
+                if slot is not None:
+                    self._watermarks[slot] = _NO_TIME
+                    self._free_slots.append(slot)
+
+
+class StackedStates(PostfixCache):
+    """
+    The fixed-size states of all series of an algorithm, e.g. the rolling max and min
+    of IncrementalAD, held in arrays stacked by the row of series, so that the states
+    of many series are get and set at once. A state is a tuple of arrays, and all of
+    the states have the same shapes, setting the states of other shapes drops the
+    states kept. The rows of expired series are reused, and the series are expired
+    by the postfix of their keys as PostfixCache.
+    The state of a series is get and set as a tuple, so that it can be used as the
+    other caches of StateStore.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._states = ()
+        self._free_rows = []
+
+    def get_rows(self, keys: List[str]) -> np.ndarray:
+        """
+        :return: the rows of keys, -1 for the keys not in cache
+        """
+        cache = self._cache
+        return np.fromiter(
+            (cache.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def _fits(self, states: tuple) -> bool:
+        # the states of one series are compared with the states kept
+        return len(states) == len(self._states) and all(
+            np.shape(state) == kept.shape[1:]
+            for state, kept in zip(states, self._states)
+        )
+
+    def gather(self, keys: List[str], defaults: tuple) -> tuple:
+        """
+        get the states of keys stacked along the first axis
+        :param keys: the keys of series
+        :param defaults: the state of the series not in cache, which gives the shapes
+            and dtypes of the state of one series
+        :return: a tuple of arrays of shape (n_keys, ...)
+        """
+        rows = self.get_rows(keys)
+        found = rows >= 0
+        fits = found.any() and self._fits(defaults)
+        states = []
+        for i, default in enumerate(defaults):
+            default = np.asarray(default)
+            state = np.empty((len(keys),) + default.shape, dtype=default.dtype)
+            state[...] = default
+            if fits:
+                state[found] = self._states[i][rows[found]]
+            states.append(state)
+        return tuple(states)
+
+    def scatter(self, keys: List[str], states: tuple) -> None:
+        """
+        set the states of keys
+        :param keys: the keys of series
+        :param states: a tuple of arrays of shape (n_keys, ...)
+        """
+        if not len(keys):
+            return
+        with self._lock:
+            if not self._fits(tuple(state[0] for state in states)):
+                self._cache = dict()
+                self._free_rows = []
+                self._states = tuple(
+                    np.empty((0,) + state.shape[1:], dtype=state.dtype)
+                    for state in states
+                )
+            self._add_rows(keys)
+            rows = self.get_rows(keys)
+            for kept, state in zip(self._states, states):
+                kept[rows] = state
+
+    def _add_rows(self, keys: List[str]) -> None:
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        missing = len(new_keys) - len(self._free_rows)
+        if missing > 0:
+            capacity = len(self._states[0])
+            new_capacity = max(capacity * 2, capacity + missing)
+            states = []
+            for kept in self._states:
+                state = np.zeros((new_capacity,) + kept.shape[1:], dtype=kept.dtype)
+                state[:capacity] = kept
+                states.append(state)
+            self._states = tuple(states)
+            self._free_rows.extend(range(new_capacity - 1, capacity - 1, -1))
+        for key in new_keys:
+            self._cache[key] = self._free_rows.pop()
+
+    def get_value(self, key, default=None):
+        row = self._cache.get(key)
+        if row is None:
+            return default
+        return tuple(state[row] for state in self._states)
+
+    def set_value(self, key, data: tuple):
+        self.scatter([key], tuple(np.asarray(state)[np.newaxis] for state in data))
+
+    def update(self, cache_dict: dict):
+        for key, data in cache_dict.items():
+            self.set_value(key, data)
+
+    def items(self):
+        return [(key, self.get_value(key)) for key in list(self.keys())]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        with self._lock:
+            self._cache = dict()
+            capacity = len(self._states[0]) if self._states else 0
+            self._free_rows = list(range(capacity - 1, -1, -1))
+
+    def remove_values_skip_keys(self, keys):
+        self._free_keys(
+            [key for key in self.keys() if all(not key.endswith(v) for v in keys)]
+        )
+
+    def remove_values_by_keys(self, keys: list):
+        self._free_keys(
+            [key for key in self.keys() if any(key.endswith(v) for v in keys)]
+        )
+
+    def _free_keys(self, keys: list) -> None:
+        with self._lock:
+            for key in keys:
+                row = self._cache.pop(key, None)
+                if row is not None:
+                    self._free_rows.append(row)
+
+
+class PendingPoints(KeyValueCache):
+    """
+    The points held by the reorder buffer of stream filter. Every series keeps
+    its points in a pair of arrays of int64 timestamps and values ordered by time,
+    and the number of points held by all series is bounded by capacity.
+    The points of a series are get and set as a pd.Series,
+    so that it can be used as the other caches of StateStore.
+    """
+
+    def __init__(self, capacity: int = None):
+        """
+        :param capacity: the maximum number of points held by all series, None for no bound
+        """
+        super().__init__()
+        self.capacity = capacity
+        self._size = 0
+        self._tz = None
+
+    def get_points(self, key: str) -> (np.ndarray, np.ndarray):
+        """
+        :return: the timestamps in int64 nanoseconds and the values of the points of key
+        """
+        return self._cache.get(key, _NO_POINTS)
+
+    def set_points(
+        self, key: str, times: np.ndarray, values: np.ndarray, tz=None
+    ) -> None:
+        """
+        replace the points of key, the series without points is removed
+        :param times: the timestamps in int64 nanoseconds ordered by time
+        :param values: the values of the points
+        :param tz: the time zone of the timestamps
+        """
+        with self._lock:
+            held = self._cache.pop(key, None)
+            if held is not None:
+                self._size -= len(held[0])
+            if len(times):
+                self._cache[key] = (times, values)
+                self._size += len(times)
+            self._tz = tz
+
+    def shrink(self) -> int:
+        """
+        drop the oldest points of all series beyond the capacity
+        :return: the number of points dropped
+        """
+        with self._lock:
+            excess = self._size - (self.capacity or self._size)
+            if excess <= 0:
+                return 0
+            times = np.concatenate([held[0] for held in self._cache.values()])
+            # drop the points up to the excess-th oldest timestamp
+            cut = np.partition(times, excess - 1)[excess - 1]
+            dropped = 0
+            for key, (held_times, held_values) in list(self._cache.items()):
+                count = np.searchsorted(held_times, cut, side="right")
+                count = min(count, excess - dropped)
+                if count:
+                    self.set_points(
+                        key, held_times[count:], held_values[count:], self._tz
+                    )
+                    dropped += count
+            return dropped
+
+    def get_value(self, key, default=None):
+        points = self._cache.get(key)
+        if points is None:
+            return default
+        times, values = points
+        index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+        if self._tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self._tz)
+        return pd.Series(values, index=index)
+
+    def set_value(self, key, data: pd.Series):
+        data = data.dropna().sort_index()
+        data = data[~data.index.duplicated()]
+        self.set_points(
+            key,
+            data.index.asi8.copy(),
+            data.to_numpy(dtype=np.float64),
+            getattr(data.index, "tz", None),
+        )
+
+    def update(self, cache_dict: dict):
+        for key, data in cache_dict.items():
+            self.set_value(key, data)
+
+    def items(self):
+        return [(key, self.get_value(key)) for key in list(self.keys())]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        with self._lock:
+            self._cache = dict()
+            self._size = 0
+
+    def remove_values_skip_keys(self, keys):
+        self.remove_values_by_keys([key for key in self.keys() if key not in keys])
+
+    def remove_values_by_keys(self, keys: list):
+        with self._lock:
+            for key in keys:
+                held = self._cache.pop(key, None)
+                if held is not None:
+                    self._size -= len(held[0])
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class StateStore:
+    """
+    A namespace holding one cache of every cache type.
+    Each PipelineDetector owns a StateStore, so that the caches of series with the
+    same column name in different detectors don't corrupt each other.
+    """
+
+    def __init__(self, cache: dict = None, key_cache: KeySet = None):
         self._cache = {
-            con.DATA_CACHE: KeyValueCache(),
+            con.DATA_CACHE: SeriesHistory(),
             con.SIGMA_EWM_THRESHOLD_CACHE: PostfixCache(),
-            con.STREAM_FILTER_CACHE: KeyValueCache(),
+            con.WELFORD_THRESHOLD_CACHE: PostfixCache(),
+            con.WELFORD_WINDOW_CACHE: StackedStates(),
+            con.STREAM_FILTER_CACHE: WatermarkCache(),
+            con.REORDER_CACHE: PendingPoints(),
             con.SUPPRESS_CACHE: PostfixCache(),
             con.SEVERITY_LEVEL_CACHE: PostfixCache(),
+            con.EVENT_CACHE: PostfixCache(),
+            con.INCREMENTAL_AD_CACHE: StackedStates(),
+            con.VALUE_CHANGE_CACHE: PostfixCache(),
             con.ERROR_INFO: PostfixCache(),
         }
         if cache is not None:
             self._cache.update(cache)
+        # keys of the series which have appeared since the last expiring
+        self.key_cache = key_cache if key_cache is not None else KeySet()
+        # the period of the last expiring, see remove_status_cache_with_symbol
+        self.expiry_period = 0
+        _STATE_STORES.add(self)
 
     def get_cache(self, cache_type):
         return self._cache.get(cache_type)
@@ -123,3 +710,73 @@ class CacheSet:
 
     def items(self):
         return self._cache.items()
+
+    def remove_expired_values(self) -> None:
+        """
+        remove caches of the series which haven't appeared since the last expiring
+        """
+        keys = self.key_cache.get_key()
+        for values in self._cache.values():
+            if len(values) > 0:
+                values.remove_values_skip_keys(keys)
+        self.key_cache.clear()
+
+    def dump_state(self) -> dict:
+        """
+        get the values of all caches, which can be pickled and restored by load_state
+        """
+        return {
+            "cache": {
+                cache_type: dict(cache.items()) for cache_type, cache in self.items()
+            },
+            "key": set(self.key_cache.get_key()),
+        }
+
+    def load_state(self, state: dict) -> None:
+        """
+        restore the values of caches dumped by dump_state.
+        The cache objects are updated in place, because modules keep references of them.
+        """
+        for cache_type, values in state.get("cache", {}).items():
+            cache = self.get_cache(cache_type)
+            if cache is None:
+                self.add_cache(cache_type, values)
+            else:
+                cache.clear()
+                cache.update(values)
+        self.key_cache.clear()
+        for key in state.get("key", set()):
+            self.key_cache.add_key(key)
+
+
+@Singleton
+class CacheSet(StateStore):
+    """
+    The default state store, shared by the components created without a state store.
+    """
+
+    def __init__(self, cache: dict = None):
+        super().__init__(cache, key_cache=KeyCache())
+
+
+def get_cache_set(cache_set: StateStore = None) -> StateStore:
+    return cache_set if cache_set is not None else CacheSet()
+
+
+def get_state_stores() -> list:
+    return list(_STATE_STORES)
+
+
+def get_cache_sizes() -> dict:
+    """
+    get the number of values of every cache type in all state stores
+    """
+    sizes = {}
+    for store in get_state_stores():
+        for cache_type, cache in store.items():
+            sizes[cache_type] = sizes.get(cache_type, 0) + len(cache)
+    return sizes
+
+
+Instrumentation().add_gauge("cache_sizes", get_cache_sizes)
+Instrumentation().add_gauge("state_stores", lambda: len(_STATE_STORES))
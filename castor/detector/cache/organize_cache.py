@@ -15,29 +15,47 @@ limitations under the License.
 """
 
 from __future__ import absolute_import
+import threading
 from typing import Union
 
 from ...utils.logger import logger
 from ...utils.globalSymbol import Symbol
-from ...detector.cache.cache import KeyCache, CacheSet
+from ...detector.cache.cache import KeyCache, StateStore, get_state_stores
 
+# the number of periods started by the symbol, every state store is expired once a period
+_expiry = {"period": 0}
+_expiry_lock = threading.Lock()
 
-def remove_status_cache_with_symbol():
+
+def remove_status_cache_with_symbol(cache_set: StateStore = None) -> bool:
+    """
+    remove caches that hasn't appeared in a period, return whether caches are removed
+    :param cache_set: the state store to expire, which is owned by the caller,
+        so that the caches read by the other detectors are never removed.
+        If it is None, all of the state stores are expired.
+    """
     symbol = Symbol()
-    del_symbol = symbol.get_symbol("del_cache")
-    if del_symbol:
-        cache_key = KeyCache()
-        cache_set = CacheSet()
-        for values in cache_set.values():
-            if len(values) > 0:
-                values.remove_values_skip_keys(cache_key.get_key())
-        symbol.set_symbol("del_cache", False)
-        cache_key.clear()
+    with _expiry_lock:
+        if symbol.get_symbol("del_cache"):
+            symbol.set_symbol("del_cache", False)
+            _expiry["period"] += 1
+        period = _expiry["period"]
+    cache_sets = get_state_stores() if cache_set is None else [cache_set]
+    removed = False
+    for store in cache_sets:
+        if store.expiry_period < period:
+            store.expiry_period = period
+            store.remove_expired_values()
+            removed = True
+    if removed:
         logger.info("remove caches that hasn't appeared in a period")
+    return removed
 
 
-def record_status_cache(measurement: Union[list, str]) -> None:
-    cache = KeyCache()
+def record_status_cache(
+    measurement: Union[list, str], cache_set: StateStore = None
+) -> None:
+    cache = cache_set.key_cache if cache_set is not None else KeyCache()
     if isinstance(measurement, list):
         for value in measurement:
             cache.add_key(str(value))
@@ -46,7 +64,7 @@ def record_status_cache(measurement: Union[list, str]) -> None:
 
 
 def clear_cache():
-    cache_key = KeyCache()
-    cache_set = CacheSet()
-    cache_set.clear()
-    cache_key.clear()
+    KeyCache().clear()
+    for cache_set in get_state_stores():
+        cache_set.clear()
+        cache_set.key_cache.clear()
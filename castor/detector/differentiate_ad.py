@@ -16,42 +16,59 @@ limitations under the License.
 
 from __future__ import absolute_import
 
+import numpy as np
 import pandas as pd
 
-from .stream_filter.get_latest_data_module import LatestData, get_latest_index
+from .stream_filter.get_latest_data_module import LatestData
+from .cache.cache import StateStore
 from .thresholder.thresholder import ThresholderModule
-from ..utils import common, const as con
+from ..utils import const as con
 from ..utils.common import TimeSeriesType
+from ..utils.instrumentation import instrument
 
 
 class DIFFERENTIATEAD:
-    def __init__(self, name, hyper_parameters):
+    def __init__(self, name, hyper_parameters, cache_set: StateStore = None):
         self.name = name
         self._hyper_params = hyper_parameters
         self.thresholder = ThresholderModule(
-            self.name, hyper_parameters.get(con.DYNAMIC_THRESHOLD)
+            self.name, hyper_parameters.get(con.DYNAMIC_THRESHOLD), cache_set
         )
-        common.ALGO_WINDOW.append(self._hyper_params.get(con.WINDOW))
-        self.latest_data = LatestData()
+        # the number of history points stitched before the input data
+        self.window = self._hyper_params.get(con.WINDOW)
+        self.latest_data = LatestData(cache_set)
 
     @staticmethod
     def fit(data: pd.DataFrame) -> None:
         return None
 
+    @instrument()
     def detect(self, time_series: TimeSeriesType) -> TimeSeriesType:
         # get anomaly scores
-        data = time_series.get(con.ORIGIN)
-        latest_index = get_latest_index(data.columns)
-        data = self.latest_data.get_data(
-            data, latest_index, self._hyper_params.get(con.WINDOW)
-        )
+        data = self.latest_data.get_window_data(time_series, self.window)
         score = self._get_score(data)
         time_series[con.LABEL] = self.thresholder.thresholder(score)
         return time_series
 
-    def _get_score(self, s):
-        window_list = list(range(1, self._hyper_params[con.WINDOW] + 1))
-        score_multi_dim = sum((s.diff(i).abs() for i in window_list)).dropna()
+    def _get_score(self, s: pd.DataFrame) -> pd.DataFrame:
+        """
+        the score of a point is the sum of its absolute differences from the window
+        points before it. The first window points of s are the history stitched by
+        latest data, so only the points after them are scored, the points with nan
+        scores in any column are dropped.
+        """
+        window = self.window
+        values = s.to_numpy(dtype=np.float64)
+        new_values = values[window:]
+        score = np.zeros_like(new_values)
+        diff = np.empty_like(new_values)
+        for i in range(1, window + 1):
+            np.subtract(new_values, values[window - i : len(values) - i], out=diff)
+            score += np.abs(diff, out=diff)
+        score_multi_dim = pd.DataFrame(score, index=s.index[window:], columns=s.columns)
+        valid = ~np.isnan(score).any(axis=1)
+        if not valid.all():
+            score_multi_dim = score_multi_dim[valid]
         return score_multi_dim
 
     def dump_model(self):
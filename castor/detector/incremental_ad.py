@@ -14,26 +14,39 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import functools
+
 import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 from .threshold_ad import ThresholdAD
+from .cache.cache import StateStore, get_cache_set
 from ..utils import const as con
 from ..utils.exceptions import ValueNotEnoughError
 
 
 class IncrementalAD(ThresholdAD):
-    def __init__(self, name, hyper_parameters):
+    def __init__(self, name, hyper_parameters, cache_set: StateStore = None):
         self.window_size = hyper_parameters.get("window_size")
         self.window_number = hyper_parameters.get("window_number")
-        hyper_parameters[con.WINDOW] = (self.window_number + 1) * self.window_size - 1
+        # in streaming mode, the rolling max and min of the history are kept in cache
+        # instead of stitching the history points
+        self.streaming = hyper_parameters.get("streaming", False)
+        hyper_parameters[con.WINDOW] = (
+            0 if self.streaming else (self.window_number + 1) * self.window_size - 1
+        )
 
-        super().__init__(name, hyper_parameters)
+        super().__init__(name, hyper_parameters, cache_set)
         self.name = name + con.INCREMENTAL_AD
+        self.cache = get_cache_set(cache_set).get_cache(con.INCREMENTAL_AD_CACHE)
 
     def set_name(self, name: str) -> None:
         self.name = name + con.INCREMENTAL_AD
 
     def _get_label(self, data, ub, lb):
+        if self.streaming:
+            return self._get_streaming_label(data, ub, lb)
         if len(data) < self.window_size * (self.window_number + 1):
             raise ValueNotEnoughError(
                 "in incremental detection, %s with sampling freq: %s"
@@ -53,35 +66,150 @@ class IncrementalAD(ThresholdAD):
             label = data.iloc[start_index:, :] * 0
         return label.astype(bool)
 
+    @staticmethod
+    def _sampled_reduce(values, ufunc, window_size, window_number, start_index):
+        """
+        reduce the rows i, i - window_size, ..., i - (window_number - 1) * window_size
+        of values by ufunc for every row i from start_index, all columns at once
+        """
+        length = len(values)
+        result = values[start_index:length].copy()
+        for k in range(1, window_number):
+            offset = k * window_size
+            ufunc(result, values[start_index - offset : length - offset], out=result)
+        return result
+
     @staticmethod
     def _incremental_bound(data, window_size, window_number, ub, lb):
         label_ub = None
         label_lb = None
         data_max = data.rolling(window_size).max().diff(window_size)
         data_min = data.rolling(window_size).min().diff(window_size)
+        data_max = data_max.to_numpy(dtype=np.float64)
+        data_min = data_min.to_numpy(dtype=np.float64)
         start_index = window_size * (window_number + 1) - 1
-        sampler = np.array([0 - i * window_size for i in range(window_number)])
-        if ub is not None:
-            label_ub = data.copy()
-            for i in range(start_index, len(data)):
-                label_ub.iloc[i, :] = np.logical_and(
-                    data_max.iloc[sampler + i, :].min(axis=0) > 0,
-                    data_min.iloc[sampler + i, :].min(axis=0) > 0,
+        # np.fmin and np.fmax skip nan as the min and max of DataFrame do,
+        # the comparisons with nan of all nan samples are False
+        sampled = functools.partial(
+            IncrementalAD._sampled_reduce,
+            window_size=window_size,
+            window_number=window_number,
+            start_index=start_index,
+        )
+        with np.errstate(invalid="ignore"):
+            if ub is not None:
+                increasing = (sampled(data_max, np.fmin) > 0) & (
+                    sampled(data_min, np.fmin) > 0
                 )
-            label_ub = np.logical_and(
-                label_ub.iloc[start_index:, :],
-                ((data - ub).rolling(window_size).min() > 0).iloc[start_index:, :],
-            )
-        if lb is not None:
-            label_lb = data.copy()
-            for i in range(start_index, len(data)):
-                label_lb.iloc[i, :] = np.logical_and(
-                    data_max.iloc[sampler + i, :].max(axis=0) < 0,
-                    data_min.iloc[sampler + i, :].max(axis=0) < 0,
+                label_ub = np.logical_and(
+                    increasing,
+                    ((data - ub).rolling(window_size).min() > 0).iloc[start_index:, :],
+                )
+            if lb is not None:
+                decreasing = (sampled(data_max, np.fmax) < 0) & (
+                    sampled(data_min, np.fmax) < 0
+                )
+                label_lb = np.logical_and(
+                    decreasing,
+                    ((data - lb).rolling(window_size).max() < 0).iloc[start_index:, :],
                 )
-            label_lb = np.logical_and(
-                label_lb.iloc[start_index:, :],
-                ((data - lb).rolling(window_size).max() < 0).iloc[start_index:, :],
-            )
 
         return label_ub, label_lb, start_index
+
+    def _get_cache_values(
+        self, columns
+    ) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        """
+        get the state of columns from cache, the state of a new column is filled by nan.
+        :return: the last window_size - 1 values, shape (window_size - 1, n_columns),
+            the rolling max and min of the last window_number * window_size points,
+            shape (window_number * window_size, n_columns),
+            the number of points seen, shape (n_columns,)
+        """
+        history_length = self.window_number * self.window_size
+        defaults = (
+            np.full(self.window_size - 1, np.nan),
+            np.full(history_length, np.nan),
+            np.full(history_length, np.nan),
+            np.int64(0),
+        )
+        tail, rolling_max, rolling_min, count = self.cache.gather(
+            self._cache_keys(columns), defaults
+        )
+        return tail.T, rolling_max.T, rolling_min.T, count
+
+    def _update_cache_values(self, columns, tail, rolling_max, rolling_min, count):
+        self.cache.scatter(
+            self._cache_keys(columns), (tail.T, rolling_max.T, rolling_min.T, count)
+        )
+
+    def _cache_keys(self, columns) -> list:
+        return [self.name + "_" + str(col) for col in columns]
+
+    @staticmethod
+    def _to_array(bound, columns) -> np.ndarray:
+        # the bound is a scalar, or an array of the bounds of columns
+        return np.broadcast_to(np.asarray(bound, dtype=np.float64), (len(columns),))
+
+    def _get_streaming_label(self, data, ub, lb) -> pd.DataFrame:
+        """
+        label the new points with the rolling max and min of the history in cache,
+        which gives the same labels as _incremental_bound on the stitched data.
+        Only the points after window_size * (window_number + 1) - 1 points of
+        their series are labeled.
+        """
+        window_size = self.window_size
+        start_index = window_size * (self.window_number + 1) - 1
+        values = data.to_numpy(dtype=np.float64)
+        tail, rolling_max, rolling_min, count = self._get_cache_values(data.columns)
+
+        # the rolling windows of the new points, shape (n_points, n_columns, window_size)
+        extended = np.vstack([tail, values])
+        windows = sliding_window_view(extended, window_size, axis=0)
+        rolling_max = np.vstack([rolling_max, windows.max(axis=-1)])
+        rolling_min = np.vstack([rolling_min, windows.min(axis=-1)])
+        history_length = self.window_number * window_size
+        self._update_cache_values(
+            data.columns,
+            extended[len(extended) - window_size + 1 :],
+            rolling_max[-history_length:],
+            rolling_min[-history_length:],
+            count + len(values),
+        )
+
+        sampled = functools.partial(
+            self._sampled_reduce,
+            window_size=window_size,
+            window_number=self.window_number,
+            start_index=history_length - window_size,
+        )
+        diff_max = rolling_max[window_size:] - rolling_max[:-window_size]
+        diff_min = rolling_min[window_size:] - rolling_min[:-window_size]
+        label = np.zeros(values.shape, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if ub is not None:
+                ub = self._to_array(ub, data.columns)
+                label |= (
+                    (sampled(diff_max, np.fmin) > 0)
+                    & (sampled(diff_min, np.fmin) > 0)
+                    & ((windows - ub[:, np.newaxis]).min(axis=-1) > 0)
+                )
+            if lb is not None:
+                lb = self._to_array(lb, data.columns)
+                label |= (
+                    (sampled(diff_max, np.fmax) < 0)
+                    & (sampled(diff_min, np.fmax) < 0)
+                    & ((windows - lb[:, np.newaxis]).max(axis=-1) < 0)
+                )
+
+        ready = count + np.arange(len(values))[:, np.newaxis] >= start_index
+        rows = ready.any(axis=1)
+        if not rows.any():
+            raise ValueNotEnoughError(
+                "in incremental detection, %s with sampling freq: %s"
+                "does not have enough value for detection"
+                % (self.name, data.index.inferred_freq)
+            )
+        return pd.DataFrame(
+            (label & ready)[rows], index=data.index[rows], columns=data.columns
+        )
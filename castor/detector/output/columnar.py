@@ -0,0 +1,169 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Encoding the detection results into compact columnar arrays
+
+from __future__ import absolute_import
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ...utils import const as con
+from ...utils.common import TimeSeriesType
+
+# levels are stored as int8 in percent, e.g. 0.85 is 85 and no anomaly (-1) is -100
+LEVEL_SCALE = 100
+_INT8_MAX = np.iinfo(np.int8).max
+
+
+def get_level_scale(severity_params: dict = None) -> int:
+    """
+    get the scale of levels, so that the maximum level configured fits into int8.
+    It is LEVEL_SCALE unless a level above 1 is configured, e.g. 25 for level 5.
+    :param severity_params: the parameters of severity level
+    """
+    levels = [1.0]
+    if severity_params:
+        levels += [
+            abs(float(v)) for v in (severity_params.get(con.ALGO) or {}).values()
+        ]
+    max_level = max(levels)
+    if max_level > _INT8_MAX:
+        raise ValueError(
+            "the severity level %s is too large for the columnar output" % max_level
+        )
+    return min(LEVEL_SCALE, int(_INT8_MAX // max_level))
+
+
+def _locate(times: np.ndarray, target_times: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    locate target_times in the sorted times
+    :return: the positions in times, and the mask of target_times found in times
+    """
+    if len(times) == 0:
+        return np.array([], dtype=np.intp), np.zeros(len(target_times), dtype=bool)
+    positions = np.searchsorted(times, target_times)
+    positions[positions >= len(times)] = 0
+    mask = times[positions] == target_times
+    return positions[mask], mask
+
+
+def encode_results(
+    results: List[TimeSeriesType],
+    algo: List[str],
+    time_index: pd.DatetimeIndex,
+    columns: pd.Index,
+    level_scale: int = LEVEL_SCALE,
+) -> dict:
+    """
+    encode the results of PipelineDetector into NumPy arrays sharing time and columns.
+    The labels and levels outside time_index and columns are dropped,
+    the points not detected by an algorithm are not anomalous for it.
+    :param results: the results of PipelineDetector, in the order of algo
+    :param algo: the detection algorithms
+    :param time_index: the shared time index, which is sorted
+    :param columns: the shared columns
+    :param level_scale: the scale of levels, see get_level_scale
+    :return: a dict of arrays
+        {
+            'time': int64 array of nanoseconds, shape (n_times,)
+            'columns': array of the column names, shape (n_columns,)
+            'algorithms': array of the algorithms, shape (n_algorithms,)
+            'anomalyLabel': labels packed by np.packbits along the columns,
+                uint8 array of shape (n_algorithms, n_times, ceil(n_columns / 8))
+            'anomalyLevel': int8 array of the levels multiplied by levelScale,
+                shape (n_algorithms, n_times, n_columns)
+            'levelScale': level_scale, 100 by default
+        }
+    """
+    times = np.asarray(time_index.asi8, dtype=np.int64)
+    shape = (len(algo), len(times), len(columns))
+    labels = np.zeros(shape, dtype=bool)
+    levels = np.full(shape, -level_scale, dtype=np.int8)
+
+    for ind, time_series in enumerate(results):
+        label = time_series.get(con.LABEL)
+        if label is None or label.empty:
+            continue
+        rows, row_mask = _locate(times, label.index.asi8)
+        cols = columns.get_indexer(label.columns)
+        col_mask = cols >= 0
+        target = np.ix_(rows, cols[col_mask])
+        labels[ind][target] = label.to_numpy(dtype=bool)[row_mask][:, col_mask]
+
+        level = time_series.get(con.LEVEL)
+        if level is None or level.empty:
+            continue
+        level_values = level.to_numpy(dtype=np.float64)[row_mask][:, col_mask]
+        levels[ind][target] = np.clip(
+            np.rint(level_values * level_scale), -_INT8_MAX, _INT8_MAX
+        ).astype(np.int8)
+
+    return {
+        con.TIME_COLUMN: times,
+        con.COLUMNS: np.asarray(columns, dtype=object),
+        con.ALGORITHMS: np.asarray(algo, dtype=object),
+        con.LABEL: np.packbits(labels, axis=-1),
+        con.LEVEL: levels,
+        con.LEVEL_SCALE: level_scale,
+    }
+
+
+def decode_labels(columnar: dict) -> np.ndarray:
+    """
+    unpack the labels of the columnar result into bool array of shape
+    (n_algorithms, n_times, n_columns)
+    """
+    n_columns = len(columnar[con.COLUMNS])
+    return np.unpackbits(columnar[con.LABEL], axis=-1, count=n_columns).astype(bool)
+
+
+def to_record_batch(columnar: dict) -> pa.RecordBatch:
+    """
+    convert the columnar result into a pyarrow RecordBatch with one row for every
+    algorithm and time. The labels are fixed size binary of the packed bits,
+    the levels are fixed size lists of int8, and the columns and levelScale are
+    kept in the metadata of schema. The arrays are not copied except time and algorithm.
+    """
+    times = columnar[con.TIME_COLUMN]
+    algorithms = columnar[con.ALGORITHMS]
+    labels = np.ascontiguousarray(columnar[con.LABEL])
+    levels = np.ascontiguousarray(columnar[con.LEVEL])
+    n_rows = len(algorithms) * len(times)
+
+    label_array = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(labels.shape[-1]), n_rows, [None, pa.py_buffer(labels)]
+    )
+    level_array = pa.FixedSizeListArray.from_arrays(
+        pa.array(levels.reshape(-1), type=pa.int8()), levels.shape[-1]
+    )
+    algorithm_array = pa.DictionaryArray.from_arrays(
+        pa.array(np.repeat(np.arange(len(algorithms), dtype=np.int32), len(times))),
+        pa.array([str(algorithm) for algorithm in algorithms], type=pa.string()),
+    )
+    time_array = pa.array(np.tile(times, len(algorithms)), type=pa.timestamp("ns"))
+    metadata = {
+        con.COLUMNS: json.dumps([str(col) for col in columnar[con.COLUMNS]]),
+        con.LEVEL_SCALE: str(columnar[con.LEVEL_SCALE]),
+    }
+    return pa.RecordBatch.from_arrays(
+        [time_array, algorithm_array, label_array, level_array],
+        names=[con.TIME_COLUMN, con.ALGO, con.LABEL, con.LEVEL],
+        metadata=metadata,
+    )
@@ -0,0 +1,115 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Encoding the detection results into sparse anomaly events, emitted only once
+
+from __future__ import absolute_import
+from typing import Hashable, List
+
+import numpy as np
+
+from ...utils import const as con
+from ...utils.common import TimeSeriesType
+from ..cache.cache import StateStore, get_cache_set
+
+# the watermark of a series which has never emitted an event
+_NO_WATERMARK = np.iinfo(np.int64).min
+
+
+def _series_name(column: Hashable, key: Hashable = None) -> str:
+    # the same name as the one recorded by record_status_cache, so the watermark
+    # expires with the other caches of the series
+    return str(column) if key is None else str((key, column))
+
+
+def encode_events(
+    results: List[TimeSeriesType],
+    algo: List[str],
+    names: List[str],
+    cache_set: StateStore = None,
+    key: Hashable = None,
+) -> List[dict]:
+    """
+    encode the results of PipelineDetector into the anomaly events newer than the
+    watermark of their series and algorithm, then move the watermarks to the latest
+    events. So the anomalies detected again in overlapping windows are emitted once.
+    :param results: the results of PipelineDetector, in the order of algo
+    :param algo: the detection algorithms
+    :param names: the names of the sub-pipelines of algo, which key the watermarks
+    :param cache_set: the state store keeping the watermarks
+    :param key: the key of measurement of run_batch, None for run
+    :return: the events sorted by time
+        example:
+            [
+                {
+                    'series': 'field1',
+                    'time': Timestamp('2020-01-01 10:21:00'),
+                    'algo': 'ThresholdAD',
+                    'anomalyLevel': 0.85
+                },
+                ...
+            ]
+            The anomalyLevel is None if the algorithm has no severity level.
+    """
+    cache = get_cache_set(cache_set).get_cache(con.EVENT_CACHE)
+    events = []
+    for algorithm, name, time_series in zip(algo, names, results):
+        label = time_series.get(con.LABEL)
+        if label is None or label.empty:
+            continue
+        times = label.index.asi8
+        cache_keys = [
+            "%s_%s" % (name, _series_name(column, key)) for column in label.columns
+        ]
+        watermarks = np.array(
+            [cache.get_value(cache_key, _NO_WATERMARK) for cache_key in cache_keys],
+            dtype=np.int64,
+        )
+        anomalies = label.to_numpy(dtype=bool) & (times[:, None] > watermarks)
+        rows, cols = np.nonzero(anomalies)
+        if len(rows) == 0:
+            continue
+
+        level = time_series.get(con.LEVEL)
+        if level is not None and not level.empty:
+            level = level.reindex(index=label.index, columns=label.columns)
+            levels = level.to_numpy(dtype=np.float64)[rows, cols]
+        else:
+            levels = np.full(len(rows), np.nan)
+
+        event_times = times[rows]
+        new_watermarks = watermarks.copy()
+        np.maximum.at(new_watermarks, cols, event_times)
+        cache.update(
+            {
+                cache_keys[col]: int(new_watermarks[col])
+                for col in np.flatnonzero(new_watermarks != watermarks)
+            }
+        )
+
+        # taken from the index, so the timestamps keep its time zone
+        timestamps = label.index[rows]
+        events.extend(
+            {
+                con.SERIES: label.columns[col],
+                con.TIME_COLUMN: timestamp,
+                con.ALGO: algorithm,
+                con.LEVEL: None if np.isnan(value) else float(value),
+            }
+            for col, timestamp, value in zip(cols, timestamps, levels)
+        )
+    events.sort(key=lambda event: event[con.TIME_COLUMN])
+    return events
@@ -0,0 +1,218 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Executing the sub-pipelines of PipelineDetector
+
+from __future__ import absolute_import
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+import pandas as pd
+
+from .pipeline import Pipeline
+from ..cache.cache import StateStore
+from ..cache.organize_cache import record_status_cache
+from ..stream_filter.get_latest_data_module import LatestData, LatestDataContext
+from ...utils import const as con
+from ...utils.common import TimeSeriesType
+
+
+class PipelineExecutor(ABC):
+    """
+    Base class of running the sub-pipelines. The results are in the order of pipes.
+    """
+
+    def __init__(self, pipes: List[Pipeline]):
+        self.pipes = pipes
+
+    @abstractmethod
+    def run(
+        self, data: pd.DataFrame, context: LatestDataContext = None
+    ) -> List[TimeSeriesType]:
+        """
+        :param data: the data to detect
+        :param context: the latest data shared by the sub-pipelines
+        """
+        pass
+
+    def fit(self, data: pd.DataFrame) -> None:
+        for sub_pipe in self.pipes:
+            sub_pipe.fit(data)
+
+    def load_model(self, model_params: dict) -> None:
+        for ind, sub_pipe in enumerate(self.pipes):
+            sub_pipe.load_model(model_params.get(ind))
+
+    def dump_model(self) -> dict:
+        return {ind: sub_pipe.dump_model() for ind, sub_pipe in enumerate(self.pipes)}
+
+    def remove_expired_values(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SerialExecutor(PipelineExecutor):
+    """run the sub-pipelines one after another"""
+
+    def run(
+        self, data: pd.DataFrame, context: LatestDataContext = None
+    ) -> List[TimeSeriesType]:
+        return [
+            sub_pipe.run({con.ORIGIN: data, con.LATEST_DATA_CONTEXT: context})
+            for sub_pipe in self.pipes
+        ]
+
+
+class ThreadExecutor(PipelineExecutor):
+    """
+    run the sub-pipelines concurrently in a thread pool.
+    The sub-pipelines only read the shared input data and write their own cache keys.
+    """
+
+    def __init__(self, pipes: List[Pipeline], max_workers: int = None):
+        super().__init__(pipes)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or len(pipes) or 1,
+            thread_name_prefix="castor-pipeline",
+        )
+
+    def run(
+        self, data: pd.DataFrame, context: LatestDataContext = None
+    ) -> List[TimeSeriesType]:
+        futures = [
+            self._pool.submit(
+                sub_pipe.run, {con.ORIGIN: data, con.LATEST_DATA_CONTEXT: context}
+            )
+            for sub_pipe in self.pipes
+        ]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+# the sub-pipeline living in a worker process of ProcessExecutor
+_worker = {}
+
+
+def _init_worker(algo: str, params: dict, name: str, max_window: int) -> None:
+    cache_set = StateStore()
+    _worker["cache_set"] = cache_set
+    _worker["pipe"] = Pipeline(algo=algo, params=params, name=name, cache_set=cache_set)
+    _worker["latest_data"] = LatestData(cache_set)
+    _worker["max_window"] = max_window
+
+
+def _run_in_worker(data: pd.DataFrame) -> TimeSeriesType:
+    record_status_cache(list(data.columns), _worker["cache_set"])
+    # the worker keeps its own copy of the data cache, so it builds its own context
+    context = LatestDataContext(_worker["latest_data"], data, _worker["max_window"])
+    time_series = _worker["pipe"].run(
+        {con.ORIGIN: data, con.LATEST_DATA_CONTEXT: context}
+    )
+    _worker["latest_data"].update(_worker["max_window"], data)
+    # the input data is kept by the caller, don't send it back
+    time_series.pop(con.ORIGIN, None)
+    time_series.pop(con.LATEST_DATA_CONTEXT, None)
+    return time_series
+
+
+def _fit_in_worker(data: pd.DataFrame) -> None:
+    _worker["pipe"].fit(data)
+
+
+def _load_model_in_worker(model_params: dict) -> None:
+    _worker["pipe"].load_model(model_params)
+
+
+def _dump_model_in_worker() -> dict:
+    return _worker["pipe"].dump_model()
+
+
+def _remove_expired_values_in_worker() -> None:
+    _worker["cache_set"].remove_expired_values()
+
+
+class ProcessExecutor(PipelineExecutor):
+    """
+    run the sub-pipelines concurrently in worker processes.
+    Every sub-pipeline lives in its own long-lived worker process together with
+    its caches and a copy of the data cache, so that the caches stay in the worker.
+    """
+
+    def __init__(self, pipes: List[Pipeline], params: dict, max_window: int):
+        super().__init__(pipes)
+        self._pools = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(sub_pipe.algo, params, sub_pipe.name, max_window),
+            )
+            for sub_pipe in pipes
+        ]
+
+    def _submit_all(self, fn, *args) -> list:
+        futures = [pool.submit(fn, *args) for pool in self._pools]
+        return [future.result() for future in futures]
+
+    def run(
+        self, data: pd.DataFrame, context: LatestDataContext = None
+    ) -> List[TimeSeriesType]:
+        results = self._submit_all(_run_in_worker, data)
+        for time_series in results:
+            time_series[con.ORIGIN] = data
+        return results
+
+    def fit(self, data: pd.DataFrame) -> None:
+        self._submit_all(_fit_in_worker, data)
+
+    def load_model(self, model_params: dict) -> None:
+        futures = [
+            pool.submit(_load_model_in_worker, model_params.get(ind))
+            for ind, pool in enumerate(self._pools)
+        ]
+        for future in futures:
+            future.result()
+
+    def dump_model(self) -> dict:
+        return dict(enumerate(self._submit_all(_dump_model_in_worker)))
+
+    def remove_expired_values(self) -> None:
+        self._submit_all(_remove_expired_values_in_worker)
+
+    def close(self) -> None:
+        for pool in self._pools:
+            pool.shutdown(wait=True)
+
+
+def get_executor(
+    executor: str,
+    pipes: List[Pipeline],
+    params: dict,
+    max_window: int,
+    max_workers: int = None,
+) -> PipelineExecutor:
+    if executor is None:
+        return SerialExecutor(pipes)
+    elif executor == con.THREAD_EXECUTOR:
+        return ThreadExecutor(pipes, max_workers)
+    elif executor == con.PROCESS_EXECUTOR:
+        return ProcessExecutor(pipes, params, max_window)
+    else:
+        raise ValueError("%s is not a supported executor" % executor)
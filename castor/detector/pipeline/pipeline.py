@@ -30,7 +30,7 @@ from ...utils.exceptions import ValueNotEnoughError
 from ...utils.common import TimeSeriesType
 from ...utils.exceptions import ParameterError
 from ...utils.logger import logger
-from ..cache.cache import CacheSet
+from ..cache.cache import StateStore, get_cache_set
 
 
 class Pipeline:
@@ -39,21 +39,29 @@ class Pipeline:
         algo,
         params,
         name,
+        cache_set: StateStore = None,
     ):
         self.name = name
         self._params = params
         self.algo = algo
+        self.cache_set = get_cache_set(cache_set)
         self.pipeline = self._construct_pipe()
 
     def _construct_pipe(self):
 
         if self.algo in con.NON_TRAINABLE_AD:
             return NonTrainablePipelineAD(
-                params=self._params, name=self.name, algo=self.algo
+                params=self._params,
+                name=self.name,
+                algo=self.algo,
+                cache_set=self.cache_set,
             )
         elif self.algo in con.TRAINABLE_AD:
             return TrainablePipelineAD(
-                params=self._params, name=self.name, algo=self.algo
+                params=self._params,
+                name=self.name,
+                algo=self.algo,
+                cache_set=self.cache_set,
             )
         else:
             raise ValueError(
@@ -77,6 +85,12 @@ class Pipeline:
         self.name = name
         self.pipeline.set_name(name)
 
+    def get_window(self) -> int:
+        """
+        get the number of history points the detector of this pipeline requires
+        """
+        return self.pipeline.detector.window or 0
+
 
 class BaseModel(ABC):
     def __init__(
@@ -84,10 +98,12 @@ class BaseModel(ABC):
         algo,
         params,
         name,
+        cache_set: StateStore = None,
     ):
         super().__init__()
         self.name = name
         self._params = params
+        self.cache_set = get_cache_set(cache_set)
         self.detector_dict = {}
         self.check_parameter(algo)
         self.detector = self.get_detector(algo)
@@ -96,9 +112,11 @@ class BaseModel(ABC):
             if algo in self._params[con.ANOMALY_SUPPRESS]
             else self._params[con.ANOMALY_SUPPRESS].get("common")
         )
-        self.suppressor = SuppressorPipeline(self.name, suppressor_param)
+        self.suppressor = SuppressorPipeline(
+            self.name, suppressor_param, self.cache_set
+        )
         self.severity_level_combiner = SeverityLevelCombiner(
-            name, self._params.get(con.SEVERITY_LEVEL)
+            name, self._params.get(con.SEVERITY_LEVEL), self.cache_set
         )
         self.algo = algo
 
@@ -132,7 +150,7 @@ class BaseModel(ABC):
         except ValueNotEnoughError as error:
             err_info_str = "%s algorithm catch exception: %s" % (self.algo, error)
             logger.info(err_info_str)
-            error_info_cache = CacheSet().get_cache(con.ERROR_INFO)
+            error_info_cache = self.cache_set.get_cache(con.ERROR_INFO)
             error_info_cache.update({self.name: err_info_str})
             return time_series
         time_series = self.suppressor.suppress(time_series)
@@ -162,7 +180,9 @@ class NonTrainablePipelineAD(BaseModel):
             con.BATCH_DIFFERENTIATE_AD: DIFFERENTIATEAD,
         }
 
-        detector = self.detector_dict.get(algo)(self.name, self._params.get(algo))
+        detector = self.detector_dict.get(algo)(
+            self.name, self._params.get(algo), self.cache_set
+        )
         return detector
 
     def fit(self, data: pd.DataFrame):
@@ -188,7 +208,9 @@ class TrainablePipelineAD(BaseModel):
             if self._params.get(algo) is not None
             else self._params
         )
-        detector = self.detector_dict.get(algo)(self.name, detector_algo)
+        detector = self.detector_dict.get(algo)(
+            self.name, detector_algo, self.cache_set
+        )
         return detector
 
     def fit(self, data: pd.DataFrame):
@@ -15,33 +15,92 @@ limitations under the License.
 """
 
 from __future__ import absolute_import
-from typing import List
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from ..utils.base_functions import load_model_file_from_disk, dump_model_file_to_disk
 from ..preprocessing.processing import PreProcess
 from .pipeline.pipeline import Pipeline
-from ..utils import common, const as con
-from .stream_filter.get_latest_data_module import LatestData
+from .pipeline.executor import ProcessExecutor, get_executor
+from ..utils import const as con
+from .stream_filter.get_latest_data_module import LatestData, LatestDataContext
+from .stream_filter.reorder_buffer import ReorderBuffer
 from .cache.organize_cache import record_status_cache, remove_status_cache_with_symbol
-from ..utils.common import TimeSeriesType
+from .cache.cache import StateStore
+from .output.columnar import encode_results, get_level_scale, to_record_batch
+from .output.events import encode_events
+from ..utils.common import (
+    TimeSeriesType,
+    arrow_to_frame,
+    concat_results,
+    stack_frames,
+    split_frame,
+)
+from ..utils.exceptions import NoNewDataError, ValueMissError
+from ..utils.instrumentation import instrument
+from ..utils.logger import logger
 
 
 class PipelineDetector:
-    def __init__(self, algo: List[str], params: dict = None):
+    def __init__(
+        self,
+        algo: List[str],
+        params: dict = None,
+        cache_set: StateStore = None,
+        executor: str = None,
+        max_workers: int = None,
+        output_format: str = None,
+    ):
+        """
+        :param algo: the detection algorithms
+        :param params: parameters of the algorithms and other modules
+        :param cache_set: the state store keeping caches of this detector.
+            If it is None, the detector owns a new state store.
+        :param executor: how to run the sub-pipelines of algorithms.
+            None: one after another.
+            "thread": concurrently in a thread pool with max_workers threads.
+            "process": concurrently, every sub-pipeline lives in its own worker
+                process with its caches. call close to stop the workers.
+        :param max_workers: the number of threads of the "thread" executor.
+            default: the number of algorithms.
+        :param output_format: the format of the results of run and run_batch.
+            None: a list of TimeSeriesType, one for every algorithm.
+            "numpy": a dict of NumPy arrays sharing time and columns,
+                see castor.detector.output.columnar.encode_results.
+            "arrow": the same arrays in a pyarrow RecordBatch.
+            "event": a list of the anomaly events newer than the last event emitted
+                for their series, see castor.detector.output.events.encode_events.
+        """
+        if output_format is not None and output_format not in con.OUTPUT_FORMATS:
+            raise ValueError("%s is not a supported output format" % output_format)
+        self.output_format = output_format
+        self.level_scale = None
+        if output_format in (con.NUMPY_OUTPUT, con.ARROW_OUTPUT):
+            self.level_scale = get_level_scale(params.get(con.SEVERITY_LEVEL))
         self.freq = None
         self.algo = algo
         self.pipe = []
         self._params = params
+        self.cache_set = cache_set if cache_set is not None else StateStore()
         self.preprocess_module = PreProcess(
             self._params.get(con.DATA_VALIDATE), self._params.get(con.DATA_PREPROCESS)
         )
         self.name_algorithm = []
-        common.ALGO_WINDOW.clear()
         self._construct_pipe()
-        self.max_window = max(common.ALGO_WINDOW) if common.ALGO_WINDOW else 0
-        self.latest_data = LatestData()
+        # collected from the pipes of this detector, so that detectors can be
+        # constructed in several threads at once
+        self.max_window = max((pipe.get_window() for pipe in self.pipe), default=0)
+        self.latest_data = LatestData(self.cache_set)
+        self.reorder_buffer = ReorderBuffer(
+            self._params.get(con.STREAM_FILTER), self.cache_set
+        )
+        self.executor = get_executor(
+            executor, self.pipe, self._params, self.max_window, max_workers
+        )
 
     def _construct_pipe(self):
         for ind, sub_algo in enumerate(self.algo):
@@ -50,20 +109,31 @@ class PipelineDetector:
                     algo=sub_algo,
                     name=str(ind),
                     params=self._params,
+                    cache_set=self.cache_set,
                 )
             )
             self.name_algorithm.append(str(ind))
 
-    def fit(self, data: pd.DataFrame):
+    @staticmethod
+    def _to_frame(data: Union[pd.DataFrame, pa.Table, pa.RecordBatch]) -> pd.DataFrame:
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            return arrow_to_frame(data)
+        return data
+
+    def fit(self, data: Union[pd.DataFrame, pa.Table, pa.RecordBatch]):
+        data = self._to_frame(data)
         data = self.preprocess_module.validate_preprocess(data, flag="fit")
-        for sub_pipe in self.pipe:
-            sub_pipe.fit(data)
+        self.executor.fit(data)
 
-    def run(self, data: pd.DataFrame) -> List[TimeSeriesType]:
+    def run(
+        self, data: Union[pd.DataFrame, pa.Table, pa.RecordBatch]
+    ) -> Union[List[TimeSeriesType], dict, pa.RecordBatch, List[dict]]:
         """
         detect anomaly by multiple algorithm
-        :param data: the data to detect
-        :return: a list of TimeSeriesType. One element presents data information for one algorithm
+        :param data: the data to detect, a DataFrame indexed by time,
+            or a pyarrow Table or RecordBatch with the timestamp column "time"
+        :return: the results in output_format, by default,
+            a list of TimeSeriesType. One element presents data information for one algorithm
             example:
                 [
                     {
@@ -81,34 +151,195 @@ class PipelineDetector:
                      ....
                 ]
         """
-        record_status_cache(list(data.columns))
+        data = self._to_frame(data)
+        record_status_cache(list(data.columns), self.cache_set)
+        # the series released up to different watermarks are detected apart
+        results = [self._run(frame) for frame in self.reorder_buffer.reorder(data)]
+        results = concat_results(results, data.columns)
+        return self._format_results(results, results[0][con.ORIGIN])
+
+    @instrument("PipelineDetector.run")
+    def _run(self, data: pd.DataFrame) -> List[TimeSeriesType]:
         data = self.preprocess_module.validate_preprocess(data, flag="detect")
         data = self.latest_data.filter_disorder_data(data)
 
-        results = []
-        for sub_pipe in self.pipe:
-            time_series = {con.ORIGIN: data}
-            algo_result = sub_pipe.run(time_series)
-            results.append(algo_result)
+        # stitch the history and the new data once for all algorithms
+        context = None
+        if not isinstance(self.executor, ProcessExecutor):
+            context = LatestDataContext(self.latest_data, data, self.max_window)
+        results = self.executor.run(data, context)
+        for time_series in results:
+            time_series.pop(con.LATEST_DATA_CONTEXT, None)
         self.latest_data.update(self.max_window, data)
-        remove_status_cache_with_symbol()
+        if remove_status_cache_with_symbol(self.cache_set):
+            self.executor.remove_expired_values()
         self.freq = data.index.inferred_freq
         return results
 
-    def fit_run(self, data: pd.DataFrame) -> List[TimeSeriesType]:
+    def _format_results(
+        self, results: List[TimeSeriesType], data: pd.DataFrame, key: Hashable = None
+    ) -> Union[List[TimeSeriesType], dict, pa.RecordBatch, List[dict]]:
+        if self.output_format is None:
+            return results
+        if self.output_format == con.EVENT_OUTPUT:
+            return encode_events(
+                results, self.algo, self.name_algorithm, self.cache_set, key
+            )
+        columnar = encode_results(
+            results, self.algo, data.index, data.columns, self.level_scale
+        )
+        if self.output_format == con.ARROW_OUTPUT:
+            return to_record_batch(columnar)
+        return columnar
+
+    @instrument()
+    def run_batch(
+        self, batch: Dict[Hashable, Union[pd.DataFrame, pa.Table, pa.RecordBatch]]
+    ) -> Dict[Hashable, Union[List[TimeSeriesType], dict, pa.RecordBatch, List[dict]]]:
+        """
+        detect anomaly for many measurements sharing the parameters in one call.
+        The frames with the same time index are stacked into one block, whose columns
+        are (key, field) pairs, and every block is detected by one call of run.
+        Only the measurements in the same state are stacked, i.e. all of their series
+        have the same latest index and the same length of history, so that the
+        results are the same as the ones of calling run for every measurement.
+        :param batch: a dict of the data to detect, keyed by the key of measurement.
+            The data is in the same format as the one of run.
+        :return: a dict of the results, keyed by the key of measurement.
+            The result of one measurement is in the same format as the one returned by run.
+            The measurements without new data or with too many missing values
+            are not in the results.
+        """
+        frames = {}
+        columns = {}
+        for key, data in batch.items():
+            data = self._to_frame(data)
+            columns[key] = data.columns
+            record_status_cache([(key, col) for col in data.columns], self.cache_set)
+            try:
+                frames[key] = self._reorder_measurement(key, data)
+            except NoNewDataError as error:
+                logger.info("no new data for %s: %s", key, error)
+
+        # the series of a measurement released up to different watermarks
+        # are detected apart, one frame of every measurement at a time
+        results = {}
+        for position in range(max(map(len, frames.values()), default=0)):
+            stacked_results = self._run_stacked(
+                {
+                    key: key_frames[position]
+                    for key, key_frames in frames.items()
+                    if position < len(key_frames)
+                }
+            )
+            for key, key_results in stacked_results.items():
+                results.setdefault(key, []).append(key_results)
+        results = {
+            key: concat_results(key_results, columns[key])
+            for key, key_results in results.items()
+        }
+        return {
+            key: self._format_results(key_results, key_results[0][con.ORIGIN], key)
+            for key, key_results in results.items()
+        }
+
+    def _run_stacked(
+        self, frames: Dict[Hashable, pd.DataFrame]
+    ) -> Dict[Hashable, List[TimeSeriesType]]:
+        """
+        detect the frames of measurements, the ones in the same state are stacked
+        """
+        signatures = {
+            key: self._get_signature(key, data) for key, data in frames.items()
+        }
+        results = {}
+        blocks = deque(stack_frames(frames, signatures))
+        while blocks:
+            keys, block = blocks.popleft()
+            try:
+                block_results = self._run(block)
+            except NoNewDataError as error:
+                logger.info("no new data for %s: %s", keys, error)
+                continue
+            except ValueMissError as error:
+                # the missing values are validated for the whole block,
+                # so detect the measurements one by one to find the invalid ones
+                logger.error("the data of %s is invalid: %s", keys, error)
+                if len(keys) > 1:
+                    blocks.extend(
+                        stack_frames(
+                            {key: frames[key] for key in keys}, dict.fromkeys(keys)
+                        )
+                    )
+                continue
+            for algo_result in block_results:
+                split_results = {
+                    name: split_frame(frame) for name, frame in algo_result.items()
+                }
+                for key in split_results.get(con.ORIGIN, {}):
+                    key_result = {
+                        name: key_frames[key]
+                        for name, key_frames in split_results.items()
+                        if key in key_frames
+                    }
+                    # the level is only given to the measurement with anomalies
+                    labels = key_result.get(con.LABEL)
+                    if labels is None or not labels.to_numpy().any():
+                        key_result.pop(con.LEVEL, None)
+                    results.setdefault(key, []).append(key_result)
+        return results
+
+    def _reorder_measurement(
+        self, key: Hashable, data: pd.DataFrame
+    ) -> List[pd.DataFrame]:
+        """
+        reorder the data of one measurement, the series keyed by (key, field) pairs
+        """
+        if self.reorder_buffer.lateness is None:
+            return [data]
+        columns = pd.MultiIndex.from_tuples([(key, col) for col in data.columns])
+        released = self.reorder_buffer.reorder(data.set_axis(columns, axis=1))
+        return [frame.droplevel(0, axis=1) for frame in released]
+
+    def _get_signature(
+        self, key: Hashable, data: pd.DataFrame
+    ) -> Optional[Tuple[int, int]]:
+        """
+        get the state shared by the series of one measurement, which is the latest
+        index and the length of history, so that only the measurements in the same
+        state are stacked. None if the measurement is detected alone.
+        """
+        if data.empty or not self.preprocess_module.is_stackable(data):
+            return None
+        keys = [str((key, col)) for col in data.columns]
+        watermarks = self.latest_data.stream_filter_cache.get_watermarks(keys)
+        rows = self.latest_data.data_cache.get_rows(keys)
+        lengths = np.where(rows >= 0, self.latest_data.data_cache.get_lengths(rows), -1)
+        if (watermarks != watermarks[0]).any() or (lengths != lengths[0]).any():
+            return None
+        return int(watermarks[0]), int(lengths[0])
+
+    def fit_run(
+        self, data: Union[pd.DataFrame, pa.Table, pa.RecordBatch]
+    ) -> Union[List[TimeSeriesType], dict, pa.RecordBatch, List[dict]]:
+        data = self._to_frame(data)
         self.fit(data)
         result = self.run(data)
         return result
 
     def dump_model_file(self, model_file):
         model_params = dict()
-        for ind, sub_pipe in enumerate(self.pipe):
-            sub_model_dict = sub_pipe.dump_model()
+        for ind, sub_model_dict in self.executor.dump_model().items():
             if sub_model_dict:
                 model_params[ind] = sub_model_dict
         dump_model_file_to_disk(model_file=model_file, model_params=model_params)
 
     def load_model_file(self, model_file):
         model_params = load_model_file_from_disk(model_file)
-        for ind, sub_pipe in enumerate(self.pipe):
-            sub_pipe.load_model(model_params.get(ind))
+        self.executor.load_model(model_params)
+
+    def close(self):
+        """
+        stop the threads or worker processes of the executor
+        """
+        self.executor.close()
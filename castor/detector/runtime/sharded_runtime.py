@@ -0,0 +1,256 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Detecting series in a pool of worker processes, each series always goes to the same worker
+
+from __future__ import absolute_import
+import multiprocessing
+import os
+import pickle as pkl
+import stat
+import zlib
+from typing import Dict, Hashable, List, Optional
+
+import pandas as pd
+
+from ..pipeline_detector import PipelineDetector
+from ...utils.base_functions import load_model_file_from_disk
+from ...utils.common import TimeSeriesType
+from ...utils.logger import logger
+
+_RUN = "run"
+_CHECKPOINT = "checkpoint"
+_STOP = "stop"
+
+
+def _dump_state_file(state_file: str, state: dict) -> None:
+    # write a temporary file and replace, so that a crash never leaves a broken shard
+    tmp_file = state_file + ".tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    modes = stat.S_IWUSR | stat.S_IRUSR
+    with os.fdopen(os.open(tmp_file, flags, modes), "wb") as f:
+        pkl.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+
+def _worker_main(connection, algo: List[str], params: dict, state_file: str) -> None:
+    detector = PipelineDetector(algo=algo, params=params)
+    if state_file is not None and os.path.exists(state_file):
+        detector.cache_set.load_state(load_model_file_from_disk(state_file))
+
+    while True:
+        command, payload = connection.recv()
+        try:
+            result = None
+            if command == _RUN:
+                result = detector.run_batch(payload)
+            elif command in (_CHECKPOINT, _STOP) and state_file is not None:
+                _dump_state_file(state_file, detector.cache_set.dump_state())
+            connection.send((True, result))
+        except Exception as error:
+            connection.send((False, error))
+        if command == _STOP:
+            break
+    detector.close()
+    connection.close()
+
+
+class ShardedRuntime:
+    """
+    Detect series in a pool of worker processes.
+    The key of series is hashed to one worker, which keeps a long-lived PipelineDetector
+    and its caches, so that the state of a series stays local to one worker.
+    If state_dir is given, every worker checkpoints its state shard into the directory
+    when calling checkpoint or close, and a restarted worker reloads its state shard.
+    """
+
+    def __init__(
+        self,
+        algo: List[str],
+        params: dict,
+        workers: int = None,
+        state_dir: Optional[str] = None,
+        checkpoint_interval: int = 0,
+    ):
+        """
+        :param algo: the detection algorithms
+        :param params: parameters of the algorithms and other modules
+        :param workers: the number of worker processes. default: the number of CPUs
+        :param state_dir: the directory to keep the state shards of workers.
+            If it is None, the state is lost when a worker restarts.
+        :param checkpoint_interval: checkpoint the state shards every
+            checkpoint_interval runs. Every checkpoint pickles the whole state of
+            all workers and blocks the run until it is written, so a small interval
+            adds the cost of dumping the state to the runs. The state since the last
+            checkpoint is lost when a worker restarts.
+            default: 0, checkpointing only by calling checkpoint or close.
+        """
+        self.algo = algo
+        self._params = params
+        self.workers = workers or os.cpu_count() or 1
+        self.state_dir = state_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.number_run = 0
+        # the errors of the series whose shard failed in the last run
+        self.errors: Dict[Hashable, Exception] = {}
+        self._context = multiprocessing.get_context()
+        self._processes = [None] * self.workers
+        self._connections = [None] * self.workers
+        if self.state_dir is not None:
+            os.makedirs(self.state_dir, exist_ok=True)
+        for shard in range(self.workers):
+            self._start_worker(shard)
+
+    def get_shard(self, key: Hashable) -> int:
+        # crc32 is stable between processes, unlike the salted hash of str
+        return zlib.crc32(str(key).encode()) % self.workers
+
+    def _state_file(self, shard: int) -> Optional[str]:
+        if self.state_dir is None:
+            return None
+        return os.path.join(self.state_dir, "shard_%d.pkl" % shard)
+
+    def _start_worker(self, shard: int) -> None:
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_connection, self.algo, self._params, self._state_file(shard)),
+            name="castor-shard-%d" % shard,
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        self._processes[shard] = process
+        self._connections[shard] = parent_connection
+
+    def restart_worker(self, shard: int) -> None:
+        """
+        restart the worker of shard, which reloads the latest checkpoint of its state shard
+        """
+        logger.info("restart the worker of shard %s", shard)
+        process = self._processes[shard]
+        if process is not None and process.is_alive():
+            process.terminate()
+        if process is not None:
+            process.join()
+        self._connections[shard].close()
+        self._start_worker(shard)
+
+    def _send(self, shard: int, message: tuple) -> None:
+        if not self._processes[shard].is_alive():
+            self.restart_worker(shard)
+        try:
+            self._connections[shard].send(message)
+        except (BrokenPipeError, EOFError, OSError):
+            self.restart_worker(shard)
+            self._connections[shard].send(message)
+
+    def _receive(self, shard: int, message: tuple):
+        try:
+            success, result = self._connections[shard].recv()
+        except (EOFError, OSError):
+            # the worker died while handling the message, retry once with a new worker
+            self.restart_worker(shard)
+            self._connections[shard].send(message)
+            success, result = self._connections[shard].recv()
+        if not success:
+            raise result
+        return result
+
+    def _request_all(
+        self, messages: Dict[int, tuple]
+    ) -> (Dict[int, object], Dict[int, Exception]):
+        """
+        send the messages to the workers at once and wait for all of them
+        :return: the results of the shards succeeded and the errors of the shards failed
+        """
+        results = {}
+        errors = {}
+        for shard, message in messages.items():
+            try:
+                self._send(shard, message)
+            except Exception as e:
+                errors[shard] = e
+        for shard, message in messages.items():
+            if shard in errors:
+                continue
+            try:
+                results[shard] = self._receive(shard, message)
+            except Exception as e:
+                errors[shard] = e
+        for shard, error in errors.items():
+            logger.error("the worker of shard %s catch exception: %s", shard, error)
+        return results, errors
+
+    def run(
+        self, batch: Dict[Hashable, pd.DataFrame]
+    ) -> Dict[Hashable, List[TimeSeriesType]]:
+        """
+        detect anomaly for a batch of series in the workers
+        :param batch: a dict of the data to detect, keyed by the key of series
+        :return: a dict of the results, keyed by the key of series,
+            the same as PipelineDetector.run_batch. The series of the shards failed
+            are not in the results, their errors are kept in errors until the next run,
+            so that the results of the other shards are not lost.
+        """
+        sub_batches = {}
+        for key, data in batch.items():
+            sub_batches.setdefault(self.get_shard(key), {})[key] = data
+        shard_results, shard_errors = self._request_all(
+            {shard: (_RUN, sub_batch) for shard, sub_batch in sub_batches.items()}
+        )
+        results = {}
+        for shard_result in shard_results.values():
+            results.update(shard_result)
+        self.errors = {
+            key: error
+            for shard, error in shard_errors.items()
+            for key in sub_batches[shard]
+        }
+
+        self.number_run += 1
+        if self.checkpoint_interval and self.number_run % self.checkpoint_interval == 0:
+            self.checkpoint()
+        return results
+
+    def checkpoint(self) -> None:
+        """
+        dump the state shards of all workers into state_dir
+        """
+        if self.state_dir is not None:
+            _, errors = self._request_all(
+                {shard: (_CHECKPOINT, None) for shard in range(self.workers)}
+            )
+            if errors:
+                raise next(iter(errors.values()))
+
+    def close(self) -> None:
+        """
+        checkpoint and stop all workers
+        """
+        for shard in range(self.workers):
+            process = self._processes[shard]
+            if process is None:
+                continue
+            if process.is_alive():
+                try:
+                    self._connections[shard].send((_STOP, None))
+                    self._connections[shard].recv()
+                except (BrokenPipeError, EOFError, OSError) as e:
+                    logger.info("the worker of shard %s stopped: %s", shard, e)
+            process.join()
+            self._connections[shard].close()
+            self._processes[shard] = None
@@ -22,7 +22,7 @@ from abc import ABC
 import numpy as np
 import pandas as pd
 
-from ..cache.cache import CacheSet
+from ..cache.cache import StateStore, get_cache_set
 from ...utils.logger import logger
 from ...utils import const as con
 
@@ -32,13 +32,15 @@ class SeverityLevelBase(ABC):
     Base class of determining anomaly severity level.
     """
 
-    def __init__(self, name: str, params: dict):
+    def __init__(self, name: str, params: dict, cache_set: StateStore = None):
         """
         :param name: series key
         :param params: parameter to define anomaly severity level method.
+        :param cache_set: the state store to keep caches in.
         """
         self.name = name
         self.params = params
+        self.cache_set = get_cache_set(cache_set)
 
     def run(self, anomaly_indexes: pd.DatetimeIndex, kwargs: dict) -> np.array:
         """Determine anomaly severity level and return the anomaly severity level results.
@@ -53,6 +55,30 @@ class SeverityLevelBase(ABC):
             example: [level1, level2]
         """
 
+    def run_block(
+        self,
+        indexes: pd.DatetimeIndex,
+        labels: np.ndarray,
+        columns: pd.Index,
+        kwargs: dict,
+    ) -> np.ndarray:
+        """Determine anomaly severity level for all of the fields in one call.
+
+        :param indexes: time index of the anomaly label results
+        :param labels: 2-D anomaly label results, one column for one field
+        :param columns: the field names of the columns in labels
+        :param kwargs: other information to determine the the anomaly severity level.
+
+        :return: 2-D anomaly severity level, in the same shape of labels.
+            Only the values where the label is True are meaningful.
+        """
+        levels = np.zeros(labels.shape)
+        for i, col in enumerate(columns):
+            if labels[:, i].any():
+                kwargs["field"] = str(col)
+                levels[labels[:, i], i] = self.run(indexes[labels[:, i]], kwargs)
+        return levels
+
 
 class SeverityLevelByAlgo(SeverityLevelBase):
     """determining the anomaly severity according to detection algorithm"""
@@ -63,14 +89,24 @@ class SeverityLevelByAlgo(SeverityLevelBase):
         severity_level_result = value * np.ones(len(anomaly_indexes))
         return severity_level_result
 
+    def run_block(
+        self,
+        indexes: pd.DatetimeIndex,
+        labels: np.ndarray,
+        columns: pd.Index,
+        kwargs: dict,
+    ) -> np.ndarray:
+        algo = kwargs.get(con.ALGO)
+        return np.full(labels.shape, float(self.params.get(algo, 0)))
+
 
 class SeverityLevelByHistoryAnomaly(SeverityLevelBase):
     """determining the anomaly severity according to frequency of history anomaly."""
 
-    def __init__(self, name: str, params: dict):
-        super().__init__(name, params)
+    def __init__(self, name: str, params: dict, cache_set: StateStore = None):
+        super().__init__(name, params, cache_set)
         self.cache_name = self.name + "_" + self.__class__.__name__
-        self.cache = CacheSet().get_cache(con.SEVERITY_LEVEL_CACHE)
+        self.cache = self.cache_set.get_cache(con.SEVERITY_LEVEL_CACHE)
         self.gap = self.params[con.GAP]
         try:
             self.gap = pd.Timedelta(self.gap)
@@ -89,3 +125,39 @@ class SeverityLevelByHistoryAnomaly(SeverityLevelBase):
         self.cache.set_value(self.cache_name + field_name, anomaly_indexes[-1])
 
         return severity_level_result
+
+    def run_block(
+        self,
+        indexes: pd.DatetimeIndex,
+        labels: np.ndarray,
+        columns: pd.Index,
+        kwargs: dict,
+    ) -> np.ndarray:
+        min_time = np.iinfo(np.int64).min
+        anomaly_columns = np.flatnonzero(labels.any(axis=0))
+        labels = labels[:, anomaly_columns]
+        cache_names = [self.cache_name + str(columns[i]) for i in anomaly_columns]
+        last_indexes = np.array(
+            [
+                pd.Timestamp(value).value if value is not None else min_time
+                for value in map(self.cache.get_value, cache_names)
+            ],
+            dtype=np.int64,
+        )
+
+        # the time of the latest anomaly before each row, starting with the cache
+        times = np.broadcast_to(indexes.asi8.reshape(-1, 1), labels.shape)
+        latest = np.vstack((last_indexes, np.where(labels, times, min_time)))
+        latest = np.maximum.accumulate(latest, axis=0)
+        previous = latest[:-1]
+        has_previous = previous != min_time
+        interval = times - np.where(has_previous, previous, times)
+
+        severity_level_result = np.zeros((len(indexes), len(columns)))
+        severity_level_result[:, anomaly_columns] = np.where(
+            has_previous & (interval <= self.gap.value), 0.0, 1.0
+        )
+        self.cache.update(
+            {name: pd.Timestamp(value) for name, value in zip(cache_names, latest[-1])}
+        )
+        return severity_level_result
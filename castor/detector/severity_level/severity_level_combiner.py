@@ -20,26 +20,32 @@ from __future__ import absolute_import
 from functools import reduce
 
 import numpy as np
+import pandas as pd
 
 from .severity_level import SeverityLevelByAlgo, SeverityLevelByHistoryAnomaly
+from ..cache.cache import StateStore
 from ...utils import const as con
 from ...utils.common import TimeSeriesType
+from ...utils.instrumentation import instrument
 
 
 class SeverityLevelCombiner:
-    def __init__(self, name: str, params: dict):
+    def __init__(self, name: str, params: dict, cache_set: StateStore = None):
         """
         :param name: series key
         :param params: parameters to select method and give the special method parameters
+        :param cache_set: the state store to keep caches in.
         """
         self.name = name
         self.params = params
+        self.cache_set = cache_set
         self.severity_level_dict = {
             con.ALGO: SeverityLevelByAlgo,
             con.HIS_ANOMALY: SeverityLevelByHistoryAnomaly,
         }
         self.pipe = self._construct_pipe()
 
+    @instrument()
     def run(self, time_series: TimeSeriesType, kwargs: dict) -> TimeSeriesType:
         """
         combine different methods to determining the anomaly severity level.
@@ -62,26 +68,21 @@ class SeverityLevelCombiner:
         if not self.pipe:
             return time_series
         labels = time_series.get(con.LABEL)
-        indexes = labels.index
-        columns = labels.columns
-        labels_np = labels.values
-        detect_result_columns_with_anomaly = np.any(labels_np, axis=0)
-        columns = columns[detect_result_columns_with_anomaly]
-        levels = labels.copy().astype(float) - 1
-        if not columns.empty:
-            labels_np = labels_np[:, detect_result_columns_with_anomaly].copy()
-            transpose = labels_np.transpose()
-            for col, value in zip(columns, transpose):
-                indexes_tmp = indexes[value]
-                kwargs["field"] = str(col)
-                level_result = reduce(
-                    lambda x, y: np.maximum(
-                        x.run(indexes_tmp, kwargs), y.run(indexes_tmp, kwargs)
-                    ),
-                    self.pipe,
-                )
-                levels.loc[indexes_tmp, col] = level_result
-            time_series[con.LEVEL] = levels
+        labels_np = labels.values.astype(bool)
+        if not labels_np.any():
+            return time_series
+        level_result = reduce(
+            np.maximum,
+            (
+                pipe.run_block(labels.index, labels_np, labels.columns, kwargs)
+                for pipe in self.pipe
+            ),
+        )
+        time_series[con.LEVEL] = pd.DataFrame(
+            np.where(labels_np, level_result, -1.0),
+            index=labels.index,
+            columns=labels.columns,
+        )
 
         return time_series
 
@@ -93,5 +94,9 @@ class SeverityLevelCombiner:
         if self.params is not None:
             for key, value in self.params.items():
                 if key in self.severity_level_dict.keys():
-                    pipe.append(self.severity_level_dict.get(key)(self.name, value))
+                    pipe.append(
+                        self.severity_level_dict.get(key)(
+                            self.name, value, self.cache_set
+                        )
+                    )
         return pipe
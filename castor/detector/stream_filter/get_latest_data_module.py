@@ -19,16 +19,18 @@ from __future__ import absolute_import
 import pandas as pd
 import numpy as np
 
-from ..cache.cache import CacheSet
+from ..cache.cache import StateStore, get_cache_set
 from ...utils.exceptions import NoNewDataError, ValueNotEnoughError
 from ...utils import const as con
-from ...utils.common import FIFOData
+from ...utils.common import TimeSeriesType
 from ...utils.logger import logger
+from ...utils.instrumentation import instrument
 
 
 class LatestData:
-    def __init__(self):
-        cache = CacheSet()
+    def __init__(self, cache_set: StateStore = None):
+        cache = get_cache_set(cache_set)
+        self.cache_set = cache
         self.stream_filter_cache = cache.get_cache(con.STREAM_FILTER_CACHE)
         self.data_cache = cache.get_cache(con.DATA_CACHE)
 
@@ -50,17 +52,6 @@ class LatestData:
         indexes = indexes.append(input_index)
         return indexes
 
-    @staticmethod
-    def _align_data_to_end(fifo_data: FIFOData, data_length: int) -> np.ndarray:
-        """
-        get data, which is shifted to end of array when data is not full
-        """
-        data = fifo_data.get_data()
-        if not fifo_data.is_full():
-            data = data.copy()
-            data[-data_length:] = data[:data_length]
-        return data
-
     def get_data(
         self, data: pd.DataFrame, latest_index: pd.Timestamp, window: int
     ) -> pd.DataFrame:
@@ -99,7 +90,11 @@ class LatestData:
         # window + 1 is the minimum length of algorithm require
         min_length_of_required_cache = max(window + 1 - new_data_len, 0)
         try:
-            cache_data_total, valid_col_list = self._get_enough_length_cache_data(
+            (
+                cache_data_total,
+                valid_col_list,
+                cache_times,
+            ) = self._get_enough_length_cache_data(
                 min_length_of_required_cache, data.columns, window
             )
         except ValueNotEnoughError as error:
@@ -119,10 +114,14 @@ class LatestData:
             # if return detect, there are some points which won't be detected
             self.not_detected_log(new_indexes[0], data.index[window])
             return data
-        # construct index of the data which concat the cache data and new data
-        indexes = self._construct_index_by_inferred_freq(
-            data.index, latest_index, cache_data_len
-        )
+        # the index of the data which concat the cache data and new data,
+        # which is constructed by inferred freq if the cache has no timestamps
+        if cache_times is not None:
+            indexes = self._to_index(cache_times, data.index.tz).append(data.index)
+        else:
+            indexes = self._construct_index_by_inferred_freq(
+                data.index, latest_index, cache_data_len
+            )
         result = pd.DataFrame(result, index=indexes, columns=data.columns)
 
         # if cache_data_len < window, there are some points which won't be detected
@@ -138,92 +137,150 @@ class LatestData:
             end,
         )
 
+    @staticmethod
+    def _to_index(times: np.ndarray, tz) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        return index
+
     def _get_enough_length_cache_data(
         self, required_cache_length: int, columns: pd.Index, window: int
-    ) -> (np.array, list):
+    ) -> (np.array, list, np.array):
+        """
+        get the latest cache data of the columns with enough cache, aligned to the end
+        :return: the cache data, the columns with enough cache,
+            and the timestamps of the cache data, None if they are not kept
+        """
         if window == 0:
-            return np.array([]), None
-        data_cache = self.data_cache
-        cache_data_list = []
-        col_list = []
-        min_index = window
-        for col in columns:
-            col_cache_data = data_cache.get_value(str(col))
-            if col_cache_data is not None:
-                real_data_length = col_cache_data.get_length()
-                if real_data_length >= required_cache_length:
-                    col_data = self._align_data_to_end(col_cache_data, real_data_length)
-                    cache_data_list.append(col_data)
-                    col_list.append(col)
-                    min_index = min(real_data_length, min_index)
-        if cache_data_list:
-            return np.stack(cache_data_list, axis=1)[-min_index:, :], col_list
-        else:
+            return np.array([]), None, None
+        rows = self.data_cache.get_rows([str(col) for col in columns])
+        lengths = self.data_cache.get_lengths(rows)
+        valid = (rows >= 0) & (lengths >= required_cache_length)
+        if not valid.any():
             raise ValueNotEnoughError("not enough data for detection")
 
+        min_index = min(window, lengths[valid].min())
+        cache_data, cache_times = self.data_cache.gather(rows[valid], min_index)
+        return cache_data, list(columns[valid]), cache_times
+
+    @instrument()
     def update(self, window: int, data: pd.DataFrame) -> None:
         """
         update data cache and Stream Filter cache by input data
         """
         if window > 0:
-            latest_index = get_latest_index(data.columns)
+            latest_index = self.get_latest_index(data.columns)
             if latest_index is not None:
                 data = data.loc[data.index > latest_index, :]
-            data_cache = self.data_cache
-            stream_filter_cache = self.stream_filter_cache
-            index = data.index[-1]
-            columns = data.columns
-            col_number = list(range(len(columns)))
-            data = data.values
-            for col, number_index in zip(columns, col_number):
-                col_cache_data = data_cache.get_value(str(col))
-                if col_cache_data is None:
-                    col_cache_data = FIFOData(window)
-                    data_cache.set_value(str(col), col_cache_data)
-                col_cache_data.update(data[:, number_index])
-                stream_filter_cache.set_value(str(col), index)
+            keys = [str(col) for col in data.columns]
+            self.data_cache.append(
+                keys, data.to_numpy(dtype=np.float64), data.index.asi8, window
+            )
+            self.stream_filter_cache.set_watermarks(keys, data.index[-1])
 
+    @instrument()
     def filter_disorder_data(self, data: pd.DataFrame) -> pd.DataFrame:
-        """ "
-        filter the data of field, which latest index in cache is more than newest index of input data
         """
+        filter the data of field, which latest index in cache is more than newest index of input data.
+        The input data is not changed, the data of the other fields is returned.
+        """
+        watermarks = self.stream_filter_cache.get_watermarks(
+            [str(col) for col in data.columns]
+        )
+        disorder = watermarks >= data.index[-1].value
+        if disorder.all():
+            raise NoNewDataError("no new data for detection")
+
+        if disorder.any():
+            return data.iloc[:, np.flatnonzero(~disorder)]
+        return data
+
+    def get_latest_index(self, columns: pd.Index) -> pd.Timestamp:
+        return get_latest_index(columns, self.cache_set)
+
+    def get_window_data(self, time_series: TimeSeriesType, window: int) -> pd.DataFrame:
+        """
+        get the input data with the latest window points before it,
+        through the context shared by the algorithms of one run if it exists
+        """
+        data = time_series.get(con.ORIGIN)
+        context = time_series.get(con.LATEST_DATA_CONTEXT)
+        if context is None or context.data is not data:
+            context = LatestDataContext(self, data)
+        return context.get_data(window)
 
-        disorder_cols = []
-        index = data.index[-1]
-        for col, series in data.items():
-            latest_index = self.stream_filter_cache.get_value(str(col))
-            if latest_index is not None and latest_index >= index:
-                disorder_cols.append(col)
 
-        if len(disorder_cols) == len(data.columns):
-            raise NoNewDataError("no new data for detection")
+class LatestDataContext:
+    """
+    The latest data shared by the algorithms in one run of PipelineDetector.
+    The history in cache and the input data are stitched once for the maximum window,
+    and every algorithm takes a slice of the tail it needs.
+    """
 
-        if disorder_cols:
-            data.drop(columns=disorder_cols, inplace=True)
+    def __init__(self, latest_data: LatestData, data: pd.DataFrame, window: int = 0):
+        """
+        :param latest_data: the LatestData holding the history
+        :param data: the input data of this run
+        :param window: the maximum window of the algorithms
+        """
+        self.latest_data = latest_data
+        self.data = data
+        self.window = window
+        self.latest_index = latest_data.get_latest_index(data.columns)
+        self.new_data_len = len(data)
+        self.stitched = None
+        if self.latest_index is not None:
+            self.new_data_len = int(np.count_nonzero(data.index > self.latest_index))
+        old_data_len = len(data) - self.new_data_len
+        if self.latest_index is not None and window > old_data_len:
+            try:
+                stitched = latest_data.get_data(data, self.latest_index, window)
+            except ValueNotEnoughError:
+                stitched = None
+            # only keep the data stitched with the cache of all columns
+            if stitched is not data and stitched is not None:
+                if len(stitched.columns) == len(data.columns):
+                    self.stitched = stitched
 
-        return data
+    def get_data(self, window: int) -> pd.DataFrame:
+        """
+        get the input data with the latest window points before it,
+        the same as LatestData.get_data
+        """
+        old_data_len = len(self.data) - self.new_data_len
+        if not window:
+            # the new points only, without looking up the history
+            if old_data_len == 0 or self.new_data_len == 0:
+                return self.data
+            return self.data.iloc[old_data_len:, :]
+        if self.stitched is None or window > self.window or old_data_len >= window:
+            return self.latest_data.get_data(self.data, self.latest_index, window)
+
+        cache_data_len = min(window, len(self.stitched) - self.new_data_len)
+        if cache_data_len <= old_data_len:
+            return self.latest_data.get_data(self.data, self.latest_index, window)
+        result = self.stitched.iloc[-(self.new_data_len + cache_data_len) :, :]
+        if cache_data_len < window:
+            self.latest_data.not_detected_log(
+                result.index[cache_data_len], result.index[window]
+            )
+        return result
 
 
-def get_latest_index(columns: pd.Index) -> pd.Timestamp:
+def get_latest_index(columns: pd.Index, cache_set: StateStore = None) -> pd.Timestamp:
     """
     get latest index for all columns of dataframe through counting the maximum
     in batch detection, the latest indexes of all columns must be the same.
     """
-    stream_filter_cache = CacheSet().get_cache(con.STREAM_FILTER_CACHE)
-    latest_indexes = [
-        stream_filter_cache.get_value(str(col))
-        for col in columns
-        if stream_filter_cache.get_value(str(col)) is not None
-    ]
-    if not latest_indexes:
-        latest_index = None
-    else:
-        latest_index = max(latest_indexes)
-    return latest_index
-
-
-def get_latest_multi_timestamps_data(data: pd.DataFrame, tag) -> pd.DataFrame:
-    stream_filter_cache = CacheSet().get_cache(con.STREAM_FILTER_CACHE)
+    stream_filter_cache = get_cache_set(cache_set).get_cache(con.STREAM_FILTER_CACHE)
+    return stream_filter_cache.get_latest([str(col) for col in columns])
+
+
+def get_latest_multi_timestamps_data(
+    data: pd.DataFrame, tag, cache_set: StateStore = None
+) -> pd.DataFrame:
+    stream_filter_cache = get_cache_set(cache_set).get_cache(con.STREAM_FILTER_CACHE)
     latest_index = stream_filter_cache.get_value(tag)
     stream_filter_cache.set_value(tag, np.max(data.index))
     if latest_index is not None and latest_index >= np.max(data.index):
@@ -0,0 +1,145 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from ..cache.cache import StateStore, get_cache_set
+from ...utils import const as con
+from ...utils.exceptions import NoNewDataError
+from ...utils.instrumentation import instrument
+from ...utils.logger import logger
+
+DEFAULT_BUFFER_SIZE = 100
+DEFAULT_MAX_PENDING = 100000
+
+
+class ReorderBuffer:
+    """
+    The buffer holding the points arriving within the lateness, so that the points
+    arriving out of order are detected in time order instead of being dropped.
+    Every series is released up to its own watermark, which is its latest timestamp
+    minus the lateness, so a lagging series never holds back the others.
+    The points of a series not later than its latest index detected are too late
+    and dropped.
+    """
+
+    def __init__(self, params: dict = None, cache_set: StateStore = None):
+        """
+        :param params: the parameters of stream filter
+            lateness: how late a point may arrive, a pandas offset string as "2T".
+                default: None, the points are detected as they arrive.
+            buffer_size: the maximum number of timestamps held for a series, the oldest
+                ones are released beyond it even if they are within the lateness.
+                default: 100
+            max_pending: the maximum number of points held for all series, the oldest
+                ones are dropped beyond it. default: 100000
+        :param cache_set: the state store keeping the points held
+        """
+        params = params or {}
+        lateness = params.get(con.LATENESS)
+        self.lateness = pd.Timedelta(lateness) if lateness else None
+        self.buffer_size = params.get(con.BUFFER_SIZE, DEFAULT_BUFFER_SIZE)
+        self.cache_set = get_cache_set(cache_set)
+        self.pending_cache = self.cache_set.get_cache(con.REORDER_CACHE)
+        self.pending_cache.capacity = params.get(con.MAX_PENDING, DEFAULT_MAX_PENDING)
+        self.stream_filter_cache = self.cache_set.get_cache(con.STREAM_FILTER_CACHE)
+
+    @instrument()
+    def reorder(self, data: pd.DataFrame) -> List[pd.DataFrame]:
+        """
+        merge the input data with the points held, hold the points within the lateness
+        and release the others in time order
+        :return: the points released, one frame for the series released up to the same
+            watermark, ordered by the watermark. The series without any point released
+            are dropped.
+        """
+        if self.lateness is None:
+            return [data]
+        keys = [str(col) for col in data.columns]
+        data = data.sort_index(kind="stable")
+        data = data[~data.index.duplicated()]
+        times = data.index.asi8
+        values = data.to_numpy(dtype=np.float64)
+        tz = data.index.tz
+        latest_indexes = self.stream_filter_cache.get_watermarks(keys)
+
+        late_count = 0
+        released = {}
+        for col, key in enumerate(keys):
+            valid = ~np.isnan(values[:, col])
+            late = valid & (times <= latest_indexes[col])
+            late_count += int(np.count_nonzero(late))
+            valid &= ~late
+            held_times, held_values = self.pending_cache.get_points(key)
+            # the points held first are kept for the duplicated timestamps
+            series_times, first = np.unique(
+                np.concatenate((held_times, times[valid])), return_index=True
+            )
+            series_values = np.concatenate((held_values, values[valid, col]))[first]
+            if not len(series_times):
+                continue
+
+            watermark = series_times[-1] - self.lateness.value
+            # release the oldest timestamps beyond the buffer size
+            if np.count_nonzero(series_times > watermark) > self.buffer_size:
+                watermark = series_times[len(series_times) - self.buffer_size - 1]
+            count = np.searchsorted(series_times, watermark, side="right")
+            self.pending_cache.set_points(
+                key, series_times[count:], series_values[count:], tz
+            )
+            if count:
+                released.setdefault(watermark, []).append(
+                    (col, series_times[:count], series_values[:count])
+                )
+
+        if late_count:
+            logger.info(
+                "%s points not later than the latest index detected arrived too late "
+                "and are dropped",
+                late_count,
+            )
+        dropped = self.pending_cache.shrink()
+        if dropped:
+            logger.warning(
+                "%s points held are dropped beyond the maximum of points held", dropped
+            )
+        if not released:
+            raise NoNewDataError("no data released by the reorder buffer")
+        return [
+            self._to_frame(data.columns, released[watermark], tz)
+            for watermark in sorted(released)
+        ]
+
+    @staticmethod
+    def _to_frame(columns: pd.Index, series: list, tz) -> pd.DataFrame:
+        # the points of the series aligned by time, nan for no point
+        times = np.unique(
+            np.concatenate([series_times for _, series_times, _ in series])
+        )
+        block = np.full((len(times), len(series)), np.nan)
+        for ind, (_, series_times, series_values) in enumerate(series):
+            block[np.searchsorted(times, series_times), ind] = series_values
+        index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        return pd.DataFrame(
+            block, index=index, columns=columns[[col for col, _, _ in series]]
+        )
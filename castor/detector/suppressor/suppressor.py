@@ -16,21 +16,24 @@ limitations under the License.
 
 from __future__ import absolute_import, division
 from abc import abstractmethod, ABC
-from typing import Hashable, Dict, Union, Tuple
+from typing import Dict, Union
 
 import numpy as np
 import pandas as pd
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
 
 from ...utils.logger import logger
-from ..cache.cache import CacheSet
+from ..cache.cache import StateStore, get_cache_set
 from ...utils import const as con
 from ...utils.common import FIFOData, get_bound, TimeSeriesType
+from ...utils.instrumentation import instrument
 
 
 class SuppressorPipeline:
-    def __init__(self, name, params):
+    def __init__(self, name, params, cache_set: StateStore = None):
         self.name = name
         self.params = params
+        self.cache_set = get_cache_set(cache_set)
         self.suppressor_dict = {
             "ContinuousAnomalySuppressor": ContinuousAnomalySuppressor,
             "TransientAnomalySuppressor": TransientAnomalySuppressor,
@@ -44,7 +47,9 @@ class SuppressorPipeline:
         if self.params is not None:
             for key, value in self.params.items():
                 if key in self.suppressor_dict.keys():
-                    pipe.append(self.suppressor_dict.get(key)(self.name, value))
+                    pipe.append(
+                        self.suppressor_dict.get(key)(self.name, value, self.cache_set)
+                    )
         return pipe
 
     def suppress(self, time_series: TimeSeriesType) -> TimeSeriesType:
@@ -66,9 +71,10 @@ class SuppressorPipeline:
 
 
 class LabelSuppressor(ABC):
-    def __init__(self, name, params):
+    def __init__(self, name, params, cache_set: StateStore = None):
         self.name = name
         self.params = params
+        self.cache_set = get_cache_set(cache_set)
 
     @abstractmethod
     def suppress(self, label_df: pd.DataFrame):
@@ -79,76 +85,87 @@ class LabelSuppressor(ABC):
 
 
 class ContinuousAnomalySuppressor(LabelSuppressor):
-    def __init__(self, name, params):
-        super().__init__(name, params)
+    def __init__(self, name, params, cache_set: StateStore = None):
+        super().__init__(name, params, cache_set)
         self.gap = self.params[con.GAP]
         try:
             self.gap = pd.Timedelta(self.gap)
         except ValueError as e:
             logger.error("%s, invalid gap parameter in ContinuousAnomalySuppressor", e)
             raise e
-        self.cache = CacheSet().get_cache(con.SUPPRESS_CACHE)
+        self.cache = self.cache_set.get_cache(con.SUPPRESS_CACHE)
         self.cache_name = self.name + "_" + self.__class__.__name__
 
+    @instrument()
     def suppress(self, label_df: pd.DataFrame):
         if not self.gap:
             return label_df
-        target_columns = label_df.columns[label_df.any()]
-
-        start_index = label_df.index[0]
-        if target_columns.empty:
+        labels = label_df.to_numpy(dtype=bool, copy=True)
+        target = labels.any(axis=0)
+        if not target.any():
             return label_df
-        target_label_df: pd.DataFrame = label_df.loc[:, target_columns]
-        last_anomaly_index_dict = self._get_cache_values(target_columns)
-        total_suppress_anomaly_len = 0
-        all_suppress_anomaly_titles = []
-        for title, value in target_label_df.items():
-            cache_title_name = self.cache_name + str(title)
-            last_anomaly_index = last_anomaly_index_dict.get(cache_title_name)
-            last_anomaly_index, suppress_anomaly_len = self._suppress_single(
-                label_series=value, last_anomaly_index=last_anomaly_index
-            )
-
-            if suppress_anomaly_len:
-                total_suppress_anomaly_len += suppress_anomaly_len
-                all_suppress_anomaly_titles.append(str(title))
-
-            last_anomaly_index_dict[cache_title_name] = last_anomaly_index
+        target_columns = label_df.columns[target]
+        keys = [self.cache_name + str(col) for col in target_columns]
+        target_labels = labels[:, target]
+        before_suppress = np.count_nonzero(target_labels, axis=0)
+        last_rows = self._suppress_block(
+            target_labels, label_df.index.asi8, *self._get_cache_values(keys)
+        )
+        self._update_cache_values(
+            {
+                keys[i]: label_df.index[last_rows[i]]
+                for i in np.flatnonzero(last_rows >= 0)
+            }
+        )
+        labels[:, target] = target_labels
 
-        self._update_cache_values(last_anomaly_index_dict)
-        label_df.loc[:, target_columns] = target_label_df
+        suppressed = before_suppress - np.count_nonzero(target_labels, axis=0)
+        total_suppress_anomaly_len = int(suppressed.sum())
         if total_suppress_anomaly_len:
             logger.debug(
                 "In [%s] algorithm, [%s] totally suppress continuous anomalies: %s",
                 self.name,
-                ", ".join(all_suppress_anomaly_titles),
+                ", ".join(map(str, target_columns[suppressed > 0])),
                 total_suppress_anomaly_len,
             )
 
-        return label_df.loc[start_index:, :]
-
-    def _suppress_single(
-        self, label_series: pd.Series, last_anomaly_index: pd.Timestamp
-    ) -> Tuple[pd.Timestamp, int]:
+        return pd.DataFrame(labels, index=label_df.index, columns=label_df.columns)
 
-        suppress_anomaly_len = 0
-        indexes = label_series.index[label_series]
-        for index in indexes:
-            if last_anomaly_index is not None and (
-                index - last_anomaly_index <= self.gap
-            ):
-                label_series[index] = False
-                suppress_anomaly_len += 1
-            else:
-                last_anomaly_index = index
-
-        return last_anomaly_index, suppress_anomaly_len
-
-    def _get_cache_values(self, columns):
-        return {
-            self.cache_name + str(col): self.cache.get_value(self.cache_name + str(col))
-            for col in columns
-        }
+    def _suppress_block(
+        self, labels: np.ndarray, times: np.ndarray, last: np.ndarray, seen: np.ndarray
+    ) -> np.ndarray:
+        """
+        suppress the anomalies within gap after the last anomaly kept, in place,
+        row by row for all columns at once
+        :param labels: the labels, shape (n_points, n_columns)
+        :param times: the timestamps of points in int64 nanoseconds
+        :param last: the timestamps of the last anomaly kept of columns
+        :param seen: whether columns have an anomaly kept
+        :return: the rows of the last anomaly kept in labels of columns, -1 for none
+        """
+        gap = self.gap.value
+        last_rows = np.full(labels.shape[1], -1, dtype=np.int64)
+        for row in np.flatnonzero(labels.any(axis=1)):
+            keep = labels[row] & ~(seen & (times[row] - last <= gap))
+            labels[row] = keep
+            last = np.where(keep, times[row], last)
+            seen = seen | keep
+            last_rows[keep] = row
+        return last_rows
+
+    def _get_cache_values(self, keys) -> (np.ndarray, np.ndarray):
+        """
+        :return: the timestamps of the last anomaly kept of keys in int64 nanoseconds,
+            and whether they are in cache
+        """
+        values = [self.cache.get_value(key) for key in keys]
+        seen = np.array([value is not None for value in values], dtype=bool)
+        last = np.fromiter(
+            (pd.Timestamp(value).value if value is not None else 0 for value in values),
+            dtype=np.int64,
+            count=len(values),
+        )
+        return last, seen
 
     def _update_cache_values(self, sub_cache_dict):
         self.cache.update(sub_cache_dict)
@@ -159,91 +176,69 @@ class ContinuousAnomalySuppressor(LabelSuppressor):
 
 
 class TransientAnomalySuppressor(LabelSuppressor):
-    def __init__(self, name, params):
-        super().__init__(name, params)
+    def __init__(self, name, params, cache_set: StateStore = None):
+        super().__init__(name, params, cache_set)
         self.window = self.params[con.WINDOW]
         self.anomalies = self.params["anomalies"]
-        self.cache = CacheSet().get_cache(con.SUPPRESS_CACHE)
+        self.cache = self.cache_set.get_cache(con.SUPPRESS_CACHE)
         self.cache_name = self.name + "_" + self.__class__.__name__
 
-    def _update_cache_values_for_normal_columns(self, df_label, target_columns):
-        titles = df_label.columns
-        data = df_label.values
-        transpose = data.transpose()
-
-        for col, value in zip(titles, transpose):
-            if col not in target_columns:
-                self._update_cache(value, col)
-
-    def _get_value_with_cache(self, data: np.array, title):
-        """
-        concat data and cache
-        the structure of cache is dict: {self.name + str(title): np.array}
-        """
-        his_data = self.cache.get_value(self.cache_name + str(title))
-        if his_data is not None:
-            return np.append(his_data.get_filling_data(), data)
-        else:
-            return data
-
+    @instrument()
     def suppress(self, label_df: pd.DataFrame) -> pd.DataFrame:
         if self.anomalies <= 1 or self.window <= 1:
             return label_df
-        target_columns = label_df.columns[label_df.any()]
-        self._update_cache_values_for_normal_columns(label_df, target_columns)
-        if target_columns.empty:
-            return label_df
-        start_index = label_df.index[0]
-        indexes = label_df.index
-        target_label_df = label_df.loc[:, target_columns]
-        target_result_label_list = []
-        before_suppress: pd.Series = target_label_df.sum()
-        for title, data in target_label_df.items():
-            concat_data = self._get_value_with_cache(data.values, title)
-            target_result_label_list.append(self._suppress_single(concat_data, indexes))
-            self._set_cache(concat_data, title)
-
-        target_result_label = pd.concat(target_result_label_list, axis=1)
-        target_result_label.columns = target_columns
-
-        after_suppress: pd.Series = target_result_label.loc[start_index:].sum()
-
-        diff_suppress = before_suppress - after_suppress
-        total_suppress_anomaly_len = diff_suppress.sum()
-        diff_index = diff_suppress.index[diff_suppress.astype(bool)]
-        label_df.loc[start_index:, target_columns] = target_result_label
+        labels = label_df.to_numpy(dtype=bool, copy=True)
+        keys = [self.cache_name + str(col) for col in label_df.columns]
+        history = self._get_cache_values(keys)
+
+        # the number of anomalies in the window ending at every point, all columns at once
+        extended = np.vstack([history, labels])
+        counts = np.cumsum(extended, axis=0, dtype=np.int64)
+        counts[self.window :] -= counts[: -self.window].copy()
+        counts = counts[self.window - 1 :]
+        self._update_cache_values(keys, extended[len(extended) - len(history) :])
+
+        suppressed = labels & (counts < self.anomalies)
+        labels &= ~suppressed
+        suppressed_count = np.count_nonzero(suppressed, axis=0)
+        total_suppress_anomaly_len = int(suppressed_count.sum())
         if total_suppress_anomaly_len:
             logger.debug(
                 "In [%s] algorithm, [%s] totally suppress transient anomalies: %s",
                 self.name,
-                ", ".join(map(str, diff_index)),
+                ", ".join(map(str, label_df.columns[suppressed_count > 0])),
                 total_suppress_anomaly_len,
             )
 
-        return label_df.loc[start_index:, :]
-
-    def _suppress_single(self, data: np.array, indexes):
-        roll_data = np.convolve(data, np.ones(self.window, dtype=int))[
-            : -self.window + 1
-        ]
-        result = pd.Series(data & (roll_data >= self.anomalies))[-len(indexes) :]
-        result.index = indexes
-        return result
-
-    def _update_cache(self, label_np: np.array, title: Hashable):
-        col_data = self._get_cache(self.cache_name + str(title))
-        col_data.update(label_np)
+        return pd.DataFrame(labels, index=label_df.index, columns=label_df.columns)
 
-    def _set_cache(self, label_np: np.array, title: Hashable):
-        col_data = self._get_cache(self.cache_name + str(title))
-        col_data.set_data(label_np)
+    def _get_cache_values(self, keys) -> np.ndarray:
+        """
+        get the latest window - 1 labels of keys from cache, False for the labels not
+        in cache. The labels of a series are cached as the bytes packed by np.packbits.
+        :return: the labels, shape (window - 1, n_keys)
+        """
+        history_length = self.window - 1
+        empty = bytes((history_length + 7) // 8)
+        packed = []
+        for key in keys:
+            value = self.cache.get_value(key)
+            if isinstance(value, FIFOData):
+                # the labels cached by the old versions
+                data = value.get_filling_data()[-history_length:]
+                value = np.zeros(history_length, dtype=bool)
+                value[history_length - len(data) :] = data
+                value = np.packbits(value).tobytes()
+            packed.append(
+                value if value is not None and len(value) == len(empty) else empty
+            )
+        packed = np.frombuffer(b"".join(packed), dtype=np.uint8)
+        packed = packed.reshape(len(keys), len(empty))
+        return np.unpackbits(packed, axis=1, count=history_length).T.astype(bool)
 
-    def _get_cache(self, key):
-        data = self.cache.get_value(key)
-        if data is None:
-            data = FIFOData(self.window + 1, array_type=bool)
-            self.cache.set_value(key, data)
-        return data
+    def _update_cache_values(self, keys, history: np.ndarray):
+        packed = np.packbits(history.T, axis=1)
+        self.cache.update(dict(zip(keys, map(bytes, packed))))
 
     def set_name(self, name: str) -> None:
         self.name = name
@@ -251,9 +246,10 @@ class TransientAnomalySuppressor(LabelSuppressor):
 
 
 class NumberSuppressor(ABC):
-    def __init__(self, name, params):
+    def __init__(self, name, params, cache_set: StateStore = None):
         self.name = name
         self.params = params
+        self.cache_set = get_cache_set(cache_set)
 
     @abstractmethod
     def suppress(self, label_df: pd.DataFrame, ori_data: pd.DataFrame):
@@ -264,11 +260,12 @@ class NumberSuppressor(ABC):
 
 
 class VariationRatioSuppressor(NumberSuppressor):
-    def __init__(self, name, params):
-        super().__init__(name, params)
+    def __init__(self, name, params, cache_set: StateStore = None):
+        super().__init__(name, params, cache_set)
         self.history_length = self.params["history_length"]
         self.threshold = self.params["threshold"]
 
+    @instrument()
     def suppress(self, label_df: pd.DataFrame, ori_data: pd.DataFrame) -> pd.DataFrame:
         target_columns = label_df.columns[label_df.any()]
 
@@ -281,87 +278,92 @@ class VariationRatioSuppressor(NumberSuppressor):
             )
             return label_df
 
-        target_label_df: pd.DataFrame = label_df.loc[:, target_columns]
-
         try:
             ori_data = ori_data[target_columns]
         except KeyError as e:
             logger.info("%s, target_columns not exist in original data", e)
             return label_df
 
-        total_suppress_anomaly_len = 0
-        all_suppress_anomaly_titles = []
-        for col, value in target_label_df.items():
-            anomaly_len = self._variation_portion_suppress(value, ori_data, col)
-            if anomaly_len:
-                total_suppress_anomaly_len += anomaly_len
-                all_suppress_anomaly_titles.append(str(col))
+        labels = label_df.to_numpy(dtype=bool, copy=True)
+        target = label_df.columns.isin(target_columns)
+        target_labels = labels[:, target]
 
+        # the positions of the labels in original data
+        positions = ori_data.index.searchsorted(label_df.index)
+        found = positions < len(ori_data)
+        found[found] = ori_data.index[positions[found]] == label_df.index[found]
+        anomalies = target_labels & found[:, np.newaxis]
+        if anomalies[positions == 0].any():
+            logger.info(
+                "in variation ratio suppressing, empty history data is encountered"
+            )
+
+        variation = self._variation_portion(
+            ori_data.to_numpy(dtype=np.float64), self.history_length
+        )[np.minimum(positions, len(ori_data) - 1)]
+        with np.errstate(invalid="ignore"):
+            suppressed = anomalies & (variation < self.threshold)
+        target_labels &= ~suppressed
+        labels[:, target] = target_labels
+
+        suppressed_count = np.count_nonzero(suppressed, axis=0)
+        total_suppress_anomaly_len = int(suppressed_count.sum())
         if total_suppress_anomaly_len:
             logger.debug(
                 "In [%s] algorithm, [%s] totally suppress variation ratio anomalies: %s",
                 self.name,
-                ", ".join(all_suppress_anomaly_titles),
+                ", ".join(map(str, target_columns[suppressed_count > 0])),
                 total_suppress_anomaly_len,
             )
 
-        label_df.loc[:, target_columns] = target_label_df
-        return label_df
+        return pd.DataFrame(labels, index=label_df.index, columns=label_df.columns)
 
     @staticmethod
-    def _variation_portion(history: np.ndarray, target: np.float64) -> np.ndarray:
-        # history: (time, dim), max, min array: (1, dim)
-        max_array = np.max(history)
-        min_array = np.min(history)
+    def _variation_portion(values: np.ndarray, history_length: int) -> np.ndarray:
+        """
+        the relative variation of every point to the max and min of the history_length
+        points before it, all columns at once.
+        The variation is nan if the history is empty or has nan.
+        :param values: the original data, shape (time, dim)
+        :return: the variation, shape (time, dim)
+        """
+        nan = np.isnan(values)
+        # the max and min of the history_length points ending at every point
+        origin = (history_length - 1) // 2
+        max_array = maximum_filter1d(
+            np.where(nan, -np.inf, values),
+            size=history_length,
+            axis=0,
+            origin=origin,
+            mode="nearest",
+        )
+        min_array = minimum_filter1d(
+            np.where(nan, np.inf, values),
+            size=history_length,
+            axis=0,
+            origin=origin,
+            mode="nearest",
+        )
+        nan_count = np.cumsum(nan, axis=0)
+        history_nan = (
+            nan_count
+            - np.vstack([np.zeros((history_length, values.shape[1])), nan_count])[
+                : len(values)
+            ]
+        )
 
-        return np.max(
-            (
+        # the history of a point ends at the point before it
+        variation = np.full(values.shape, np.nan)
+        max_array = max_array[:-1]
+        min_array = min_array[:-1]
+        target = values[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variation[1:] = np.maximum(
                 np.abs(target - max_array) / (np.abs(max_array) + 1e-9),
                 np.abs(target - min_array) / (np.abs(min_array) + 1e-9),
             )
-        )
-
-    def _variation_portion_suppress(
-        self, label_series: pd.Series, ori_data: pd.DataFrame, title
-    ) -> int:
-        """
-        this function takes in the pandas dataframe consisting of original data
-        anomaly score, and label along with other columns.
-
-        it suppresses anomaly label if the original data's point's relative variation
-        percentage corresponding to that label is smaller than a threshold.
-        """
-        # data pandas dataframe, (time, columns: [original data, label])
-        # for data columns, the columns title are tuples with "value" in them
-        anomaly_indexes = label_series.index[label_series].values
-        pos_indexes_bool = [
-            ori_data_index in anomaly_indexes
-            for ori_data_index in ori_data.index.values
-        ]
-        pos_indexes = np.where(pos_indexes_bool)[0]
-
-        anomaly_length = 0
-        ori_series = ori_data[title].values
-        for pos_index, time_index in zip(pos_indexes, anomaly_indexes):
-            try:
-
-                history = ori_series[
-                    max(pos_index - self.history_length, 0) : pos_index
-                ]
-
-                target = ori_series[pos_index]
-                if history.size > 0:
-                    variation = self._variation_portion(history, target)
-                    if variation < self.threshold:
-                        label_series[time_index] = False
-                        anomaly_length += 1
-                else:
-                    logger.info(
-                        "in variation ratio suppressing, empty history data is encountered"
-                    )
-            except KeyError as e:
-                logger.info("%s, time index not exist in original data", e)
-        return anomaly_length
+        variation[1:][history_nan[:-1] > 0] = np.nan
+        return variation
 
 
 class LowerBoundSuppressor(NumberSuppressor):
@@ -371,8 +373,8 @@ class LowerBoundSuppressor(NumberSuppressor):
     suppressed
     """
 
-    def __init__(self, name, params):
-        super().__init__(name, params)
+    def __init__(self, name, params, cache_set: StateStore = None):
+        super().__init__(name, params, cache_set)
         self.lb_scalar = self.params.get(con.LOWER_BOUND)
         self.lb_dict = self.params.get(con.LOWER_BOUND_KV)
         self.ub_scalar = self.params.get(con.UPPER_BOUND)
@@ -400,6 +402,7 @@ class LowerBoundSuppressor(NumberSuppressor):
                 bound = {}
         return bound
 
+    @instrument()
     def suppress(self, label_df: pd.DataFrame, ori_data: pd.DataFrame):
 
         target_columns = label_df.columns[label_df.any()]
@@ -19,32 +19,35 @@ from typing import Union
 import numpy as np
 import pandas as pd
 
-from .stream_filter.get_latest_data_module import LatestData, get_latest_index
-from ..utils import const as con, common
+from .stream_filter.get_latest_data_module import LatestData
+from .cache.cache import StateStore
+from ..utils import const as con
 from ..utils.common import TimeSeriesType, get_bound
+from ..utils.instrumentation import instrument
 
 
 class ThresholdAD:
-    def __init__(self, name, hyper_parameters):
+    def __init__(self, name, hyper_parameters, cache_set: StateStore = None):
         self.name = name + con.THRESHOLD_AD
         self._hyper_params = hyper_parameters
         self.ub_scalar = self._hyper_params.get(con.UPPER_BOUND)
         self.lb_scalar = self._hyper_params.get(con.LOWER_BOUND)
         self.ub_dict: Union[dict, None] = self._hyper_params.get(con.UPPER_BOUND_KV)
         self.lb_dict: Union[dict, None] = self._hyper_params.get(con.LOWER_BOUND_KV)
-        common.ALGO_WINDOW.append(self._hyper_params.get(con.WINDOW))
-        self.latest_data = LatestData()
+        # the bounds of the last set of columns
+        self._bound_columns = None
+        self._bounds = None
+        # the number of history points stitched before the input data
+        self.window = self._hyper_params.get(con.WINDOW)
+        self.latest_data = LatestData(cache_set)
 
     @staticmethod
     def fit(self, data: pd.DataFrame) -> None:
         return None
 
+    @instrument()
     def detect(self, time_series: TimeSeriesType) -> TimeSeriesType:
-        data = time_series.get(con.ORIGIN)
-        latest_index = get_latest_index(data.columns)
-        data = self.latest_data.get_data(
-            data, latest_index, self._hyper_params.get(con.WINDOW)
-        )
+        data = self.latest_data.get_window_data(time_series, self.window)
         ub, lb = self._get_bound(data)
         label = self._get_label(data, ub, lb)
         time_series[con.LABEL] = label
@@ -54,28 +57,57 @@ class ThresholdAD:
         self.name = name + con.THRESHOLD_AD
 
     def _get_bound(self, data: pd.DataFrame):
-        ub = (
-            get_bound(
-                threshold_dict=self.ub_dict,
-                title=data.columns,
-                threshold_scalar=self.ub_scalar,
-            )
-            if self.ub_dict
-            else self.ub_scalar
+        """
+        get the upper and lower bounds, which are the scalars or the arrays of the
+        bounds of columns if the bounds of columns are given.
+        The arrays are built once for a set of columns.
+        """
+        if self.ub_dict or self.lb_dict:
+            columns = data.columns
+            if columns is not self._bound_columns and not columns.equals(
+                self._bound_columns
+            ):
+                self._bounds = (
+                    self._bound_array(self.ub_dict, self.ub_scalar, columns),
+                    self._bound_array(self.lb_dict, self.lb_scalar, columns),
+                )
+                self._bound_columns = columns
+            return self._bounds
+        return self.ub_scalar, self.lb_scalar
+
+    @staticmethod
+    def _bound_array(threshold_dict, threshold_scalar, columns):
+        if not threshold_dict:
+            return threshold_scalar
+        bound = get_bound(
+            threshold_dict=threshold_dict,
+            title=columns,
+            threshold_scalar=threshold_scalar,
         )
-        lb = (
-            get_bound(
-                threshold_dict=self.lb_dict,
-                title=data.columns,
-                threshold_scalar=self.lb_scalar,
-            )
-            if self.lb_dict
-            else self.lb_scalar
+        # the columns without bound are never anomalous, as nan is never exceeded
+        return np.array(
+            [np.nan if value is None else value for value in bound.values()],
+            dtype=np.float64,
         )
-        return ub, lb
 
     def _get_label(self, data, ub, lb):
-        if None not in (ub, lb):
+        values = data.to_numpy()
+        if values.dtype.kind not in "fiub":
+            return self._get_frame_label(data, ub, lb)
+        with np.errstate(invalid="ignore"):
+            if ub is not None and lb is not None:
+                label = (values > ub) | (values < lb)
+            elif ub is not None:
+                label = values > ub
+            elif lb is not None:
+                label = values < lb
+            else:
+                label = np.zeros(values.shape, dtype=bool)
+        return pd.DataFrame(label, index=data.index, columns=data.columns)
+
+    @staticmethod
+    def _get_frame_label(data, ub, lb):
+        if ub is not None and lb is not None:
             label = np.logical_or(data > ub, data < lb)
         elif ub is not None:
             label = data > ub
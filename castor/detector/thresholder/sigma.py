@@ -20,12 +20,17 @@ from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
 
+from ..cache.cache import StateStore, get_cache_set
+from ...utils.instrumentation import instrument
+
 
 class SigmaBase(ABC):
-    def __init__(self, name, **params):
+    def __init__(self, name, cache_set: StateStore = None, **params):
         self.name = name
+        self.cache_set = get_cache_set(cache_set)
         self._sigma = params.get("sigma", 4)
 
+    @instrument()
     def threshold(self, score: pd.DataFrame) -> pd.DataFrame:
         return self._sigma_detector(data=score)
 
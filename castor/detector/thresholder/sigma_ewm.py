@@ -18,17 +18,18 @@ from __future__ import absolute_import
 
 import numpy as np
 import pandas as pd
+from scipy.signal import lfilter
 
-from ..cache.cache import CacheSet
+from ..cache.cache import StateStore
 from ...utils import const as con
 from .sigma import SigmaBase
 
 
 class SigewmThresholder(SigmaBase):
-    def __init__(self, name, **params):
-        super().__init__(name, **params)
+    def __init__(self, name, cache_set: StateStore = None, **params):
+        super().__init__(name, cache_set, **params)
         self._window = params.get(con.WINDOW, 100)
-        self.cache = CacheSet().get_cache(con.SIGMA_EWM_THRESHOLD_CACHE)
+        self.cache = self.cache_set.get_cache(con.SIGMA_EWM_THRESHOLD_CACHE)
 
     def get_cache_values(self, columns, tmp_data):
         # his_status stores history (mu, sigma, length counter)
@@ -57,27 +58,36 @@ class SigewmThresholder(SigmaBase):
         ema: np.ndarray-1d, counter: np.ndarray-1d, counter: np.ndarray-1d
         """
         # get ema, emvar, counter cache for dataframe columns. If the cache is None, get value from first row data.
-        tmp_data = data.iloc[0, :].values
-        ema, emvar, counter = self.get_cache_values(data.columns, tmp_data)
+        values = np.asarray(data.values, dtype=np.float64)
+        ema, emvar, counter = self.get_cache_values(data.columns, values[0, :])
 
-        upper_threshold = np.empty_like(data.values)
-        lower_threshold = np.empty_like(data.values)
+        # the recurrences of all rows and columns are first order linear filters:
+        # ema[t] = (1 - alpha) * ema[t - 1] + alpha * x[t]
+        # emvar[t] = (1 - alpha) * emvar[t - 1] + (1 - alpha) * alpha * delta[t] ** 2
+        # where delta[t] = x[t] - ema[t - 1]
         alpha = 2 / float(self._window + 1)
-        for s in range(len(data)):
-            delta = data.iloc[s, :].values - ema
-            ema = ema + alpha * delta
-            emvar = (1 - alpha) * (emvar + alpha * delta**2)
-            counter = np.minimum(np.array([self._window] * len(counter)), counter + 1)
-            tmp = self._sigma * np.sqrt(emvar)
-            upper_threshold[s, :] = np.where(
-                counter == self._window,
-                ema + tmp,
-                float("inf"),
-            )
-            lower_threshold[s, :] = np.where(
-                counter == self._window,
-                ema - tmp,
-                float("-inf"),
-            )
-        self.update_cache_values(data.columns, ema, emvar, counter)
+        decay = [1, alpha - 1]
+        ema_rows, _ = lfilter(
+            [alpha], decay, values, axis=0, zi=((1 - alpha) * ema)[np.newaxis, :]
+        )
+        previous_ema = np.vstack([ema[np.newaxis, :], ema_rows[:-1]])
+        delta = values - previous_ema
+        emvar_rows, _ = lfilter(
+            [(1 - alpha) * alpha],
+            decay,
+            delta**2,
+            axis=0,
+            zi=((1 - alpha) * emvar)[np.newaxis, :],
+        )
+        counter_rows = np.minimum(
+            self._window, counter + np.arange(1, len(values) + 1)[:, np.newaxis]
+        )
+
+        tmp = self._sigma * np.sqrt(emvar_rows)
+        ready = counter_rows == self._window
+        upper_threshold = np.where(ready, ema_rows + tmp, float("inf"))
+        lower_threshold = np.where(ready, ema_rows - tmp, float("-inf"))
+        self.update_cache_values(
+            data.columns, ema_rows[-1], emvar_rows[-1], counter_rows[-1]
+        )
         return upper_threshold, lower_threshold
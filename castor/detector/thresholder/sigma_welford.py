@@ -0,0 +1,169 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+
+from ..cache.cache import StateStore
+from ...utils import const as con
+from .sigma import SigmaBase
+
+
+class WelfordThresholder(SigmaBase):
+    """
+    The sigma thresholder with the moments of the scores of every series kept in cache,
+    so that the threshold of a point doesn't depend on the size of its batch.
+    The threshold of a point is computed with the moments of the scores up to it.
+    If window is None, the moments are the running (Welford) moments of all scores,
+    otherwise, the moments of the latest window scores, which are updated with
+    the running sums of the scores in the window.
+    nan scores are not counted.
+    """
+
+    def __init__(self, name, cache_set: StateStore = None, **params):
+        super().__init__(name, cache_set, **params)
+        self._window = params.get(con.WINDOW)
+        self.cache = self.cache_set.get_cache(con.WELFORD_THRESHOLD_CACHE)
+        self.window_cache = self.cache_set.get_cache(con.WELFORD_WINDOW_CACHE)
+
+    def _get_threshold(self, data: pd.DataFrame) -> (np.ndarray, np.ndarray):
+        values = np.asarray(data.values, dtype=np.float64)
+        keys = [self.name + "_" + str(col) for col in data.columns]
+        if self._window is None:
+            mean, std = self._running_moments(keys, values)
+        else:
+            mean, std = self._window_moments(keys, values)
+        tmp = self._sigma * std
+        return mean + tmp, mean - tmp
+
+    def _running_moments(
+        self, keys: list, values: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
+        """
+        merge the cached (count, mean, m2) with the prefixes of the new scores.
+        The scores are shifted by the cached mean, or the first score of a new series,
+        to keep the sums of squares small.
+        """
+        state = np.empty((3, len(keys)))
+        for i, key in enumerate(keys):
+            col_cache = self.cache.get_value(key)
+            if col_cache is None:
+                observed = values[~np.isnan(values[:, i]), i]
+                col_cache = (0, observed[0] if len(observed) else 0.0, 0.0)
+            state[:, i] = col_cache
+        count, shift, m2 = state
+
+        valid = ~np.isnan(values)
+        shifted = np.where(valid, values - shift, 0.0)
+        counts = count + np.cumsum(valid, axis=0)
+        sums = np.cumsum(shifted, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            m2s = np.maximum(m2 + np.cumsum(shifted**2, axis=0) - sums**2 / counts, 0)
+            mean = shift + sums / counts
+            std = np.sqrt(m2s / counts)
+
+        if len(values):
+            self.cache.update(
+                {
+                    key: (counts[-1, i], mean[-1, i], m2s[-1, i])
+                    for i, key in enumerate(keys)
+                    if counts[-1, i] > 0
+                }
+            )
+        return mean, std
+
+    def _window_moments(
+        self, keys: list, values: np.ndarray
+    ) -> (np.ndarray, np.ndarray):
+        """
+        the moments of the latest window scores, computed with the count, sum and sum
+        of squares of the scores in the window. The scores are kept in a ring buffer
+        of every series, so that the scores leaving the window are subtracted from
+        the sums and the cost doesn't depend on the window.
+        The scores are shifted by the mean of the window to keep the sums small.
+        """
+        window = self._window
+        n_points, n_series = values.shape
+        self._restore_window_states(keys)
+        defaults = (np.full(window, np.nan), np.int64(0), 0.0, np.int64(0), 0.0, 0.0)
+        ring, seen, shift, count, sums, squares = self.window_cache.gather(
+            keys, defaults
+        )
+
+        valid = ~np.isnan(values)
+        if n_points:
+            first = values[valid.argmax(axis=0), np.arange(n_series)]
+            shift = np.where((count == 0) & valid.any(axis=0), first, shift)
+        # the score leaving the window at every new point, i.e. the one window
+        # points before it, nan if there is none
+        leaving = min(n_points, window)
+        positions = (seen[:, np.newaxis] + np.arange(leaving)) % window
+        rows = np.arange(n_series)[:, np.newaxis]
+        outgoing = np.vstack([ring[rows, positions].T, values[: n_points - leaving]])
+        out_valid = ~np.isnan(outgoing)
+        shifted = np.where(valid, values - shift, 0.0)
+        out_shifted = np.where(out_valid, outgoing - shift, 0.0)
+
+        counts = count + np.cumsum(valid.astype(np.int64) - out_valid, axis=0)
+        window_sums = sums + np.cumsum(shifted - out_shifted, axis=0)
+        window_squares = squares + np.cumsum(shifted**2 - out_shifted**2, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            shifted_mean = np.where(counts > 0, window_sums / counts, np.nan)
+            variance = window_squares / counts - shifted_mean**2
+        mean = shift + shifted_mean
+        std = np.sqrt(np.maximum(variance, 0))
+
+        if n_points:
+            positions = seen[:, np.newaxis] + n_points - leaving + np.arange(leaving)
+            ring[rows, positions % window] = values[n_points - leaving :].T
+            count = counts[-1]
+            new_shift = np.where(count > 0, mean[-1], shift)
+            delta = new_shift - shift
+            squares = window_squares[-1] - 2 * delta * window_sums[-1]
+            squares = np.where(count > 0, squares + count * delta**2, 0.0)
+            sums = np.where(count > 0, window_sums[-1] - count * delta, 0.0)
+            self.window_cache.scatter(
+                keys, (ring, seen + n_points, new_shift, count, sums, squares)
+            )
+        return mean, std
+
+    def _restore_window_states(self, keys: list) -> None:
+        """
+        copy the latest window scores kept by the old versions in cache into
+        the ring buffers of window_cache
+        """
+        missing = [
+            key for key, row in zip(keys, self.window_cache.get_rows(keys)) if row < 0
+        ]
+        restored = {}
+        for key in missing:
+            scores = self.cache.get_value(key)
+            if isinstance(scores, np.ndarray) and scores.shape == (self._window,):
+                restored[key] = scores
+        if not restored:
+            return
+        ring = np.vstack(list(restored.values()))
+        valid = ~np.isnan(ring)
+        count = valid.sum(axis=1)
+        shift = np.nansum(ring, axis=1) / np.maximum(count, 1)
+        shifted = np.where(valid, ring - shift[:, np.newaxis], 0.0)
+        seen = np.full(len(ring), self._window, dtype=np.int64)
+        self.window_cache.scatter(
+            list(restored),
+            (ring, seen, shift, count, shifted.sum(axis=1), (shifted**2).sum(axis=1)),
+        )
@@ -21,19 +21,22 @@ import pandas as pd
 
 from .sigma_ewm import SigewmThresholder
 from .sigma import SigmaThresholder
+from .sigma_welford import WelfordThresholder
+from ..cache.cache import StateStore
 from ...utils import const as con
 
 
 class ThresholderModule:
-    def __init__(self, name, params):
+    def __init__(self, name, params, cache_set: StateStore = None):
         thresholder_dict = {
             con.SIGEWM_THRESHOLDER: SigewmThresholder,
             con.SIGMA_THRESHOLDER: SigmaThresholder,
+            con.WELFORD_THRESHOLDER: WelfordThresholder,
         }
         self.name = name
         self.threshold_choice = params.get("CHOICE")
         self.thresholder_core = thresholder_dict.get(self.threshold_choice)(
-            name=self.name, **params.get(self.threshold_choice)
+            name=self.name, cache_set=cache_set, **params.get(self.threshold_choice)
         )
 
     def thresholder(self, score_multidim: pd.DataFrame = None):
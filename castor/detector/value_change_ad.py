@@ -14,33 +14,94 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import numpy as np
 import pandas as pd
 
-from .stream_filter.get_latest_data_module import LatestData, get_latest_index
-from ..utils import const as con, common
+from .stream_filter.get_latest_data_module import LatestData
+from .cache.cache import StateStore, get_cache_set
+from ..utils import const as con
 from ..utils.common import TimeSeriesType
+from ..utils.instrumentation import instrument
+
+# the last value of a series never seen
+_NO_VALUE = object()
 
 
 class ValueChangeAD:
-    def __init__(self, name, hyper_parameters):
+    """
+    Label the points whose values differ from the previous points of their series.
+    Every point is compared with the one before it, so the window is always 1.
+    The last value of every series is kept in cache instead of stitching the history.
+    """
+
+    def __init__(self, name, hyper_parameters, cache_set: StateStore = None):
         self.name = name + con.VALUE_CHANGE_AD
         self._hyper_params = hyper_parameters
-        common.ALGO_WINDOW.append(self._hyper_params.get(con.WINDOW))
-        self.latest_data = LatestData()
+        window = self._hyper_params.get(con.WINDOW)
+        if window is not None and window != 1:
+            raise ValueError(
+                "the window of ValueChangeAD must be 1, but it is %s" % window
+            )
+        self.window = 1
+        self.latest_data = LatestData(cache_set)
+        self.cache = get_cache_set(cache_set).get_cache(con.VALUE_CHANGE_CACHE)
 
     @staticmethod
     def fit(self, data: pd.DataFrame) -> None:
         return None
 
+    @instrument()
     def detect(self, time_series: TimeSeriesType) -> TimeSeriesType:
-        data = time_series.get(con.ORIGIN)
-        latest_index = get_latest_index(data.columns)
-        data = self.latest_data.get_data(
-            data, latest_index, self._hyper_params.get(con.WINDOW)
+        """
+        label the points whose values differ from the previous values of their series.
+        The numeric columns are compared as float, the other columns, e.g. the
+        categorical status codes, are compared by their dictionary codes.
+        nan is always a change. The first point of a series without a previous value
+        is not a change, and the first row is dropped if no series has a previous
+        value, as the first point of the history of window 1.
+        """
+        data = self.latest_data.get_window_data(time_series, 0)
+        keys = [self.name + "_" + str(col) for col in data.columns]
+        last_values = [self.cache.get_value(key, _NO_VALUE) for key in keys]
+        first_values = np.array(
+            [value is _NO_VALUE for value in last_values], dtype=bool
         )
-        labels = ~data.eq(data.shift()).iloc[self._hyper_params.get(con.WINDOW) :]
-        time_series[con.LABEL] = labels
+        last_values = [
+            np.nan if first else value
+            for first, value in zip(first_values, last_values)
+        ]
+
+        labels = np.empty(data.shape, dtype=bool)
+        numeric = np.array([dtype.kind in "fiub" for dtype in data.dtypes], dtype=bool)
+        if numeric.any():
+            positions = np.flatnonzero(numeric)
+            values = data.iloc[:, positions].to_numpy(dtype=np.float64)
+            previous = np.array([last_values[i] for i in positions], dtype=np.float64)
+            labels[:, positions] = self._changed(values, previous)
+        for i in np.flatnonzero(~numeric):
+            values = data.iloc[:, i].to_numpy(dtype=object)
+            codes, _ = pd.factorize(np.append([last_values[i]], values))
+            codes = np.where(codes < 0, np.nan, codes)
+            labels[:, i] = self._changed(codes[1:, np.newaxis], codes[:1])[:, 0]
+
+        if len(data):
+            self.cache.update(
+                {key: value for key, value in zip(keys, data.iloc[-1].tolist())}
+            )
+            labels[0, first_values] = False
+        label = pd.DataFrame(labels, index=data.index, columns=data.columns)
+        if first_values.all():
+            label = label.iloc[1:]
+        time_series[con.LABEL] = label
         return time_series
 
+    @staticmethod
+    def _changed(values: np.ndarray, previous: np.ndarray) -> np.ndarray:
+        # compare every row with the row before it, the first row with previous
+        before = np.empty_like(values)
+        before[0] = previous
+        before[1:] = values[:-1]
+        return ~(values == before)
+
     def set_name(self, name: str) -> None:
         self.name = name + con.VALUE_CHANGE_AD
@@ -25,6 +25,7 @@ from adtk.data import validate_series
 from ..utils import const as con
 from ..transform.smoothing import peak_smoothing_with_quantile, smoothing
 from ..utils.exceptions import ValueMissError
+from ..utils.instrumentation import instrument
 
 
 class PreProcess:
@@ -36,6 +37,7 @@ class PreProcess:
         self._validate_params = validate_params
         self._preprocess_params = preprocess_params
 
+    @instrument()
     def validate_preprocess(self, s: pd.DataFrame, flag):
         # data validation
         s = self.validate(
@@ -102,8 +104,20 @@ class PreProcess:
 
         """
 
-        # check adtk to remove the duplicate data and sort by timestamp
-        ts = validate_series(ts)
+        # check adtk to remove the duplicate data and sort by timestamp,
+        # which copies the data, so skip it when the index is already sorted and unique
+        if (
+            isinstance(ts, (pd.Series, pd.DataFrame))
+            and isinstance(ts.index, pd.DatetimeIndex)
+            and ts.index.is_monotonic_increasing
+            and ts.index.is_unique
+        ):
+            ts = ts.copy(deep=False)
+            inferred_freq = ts.index.inferred_freq
+            if ts.index.freq is None and inferred_freq is not None:
+                ts.index = pd.DatetimeIndex(ts.index, freq=inferred_freq)
+        else:
+            ts = validate_series(ts)
 
         data_length = len(ts)
 
@@ -167,12 +181,15 @@ class PreProcess:
         s = self.resample(ts, interval)
 
         # Replace NaN with zero and infinity with large finite numbers
+        values = s.values
+        if values.dtype.kind not in "iub" and not (
+            values.dtype.kind == "f" and np.isfinite(values).all()
+        ):
+            values = np.nan_to_num(values)
         if isinstance(s, pd.Series):
-            s = pd.Series(data=np.nan_to_num(s.values), index=s.index, name=s.name)
+            s = pd.Series(data=values, index=s.index, name=s.name)
         else:
-            s = pd.DataFrame(
-                data=np.nan_to_num(s.values), index=s.index, columns=s.columns
-            )
+            s = pd.DataFrame(data=values, index=s.index, columns=s.columns)
 
         # Smooth extremes by percentile  5% 95%
         # Check stable of the data series by adf
@@ -182,12 +199,63 @@ class PreProcess:
 
         return s
 
+    @staticmethod
+    def _is_resampled(ts: pd.DataFrame, interval: str) -> bool:
+        """
+        whether ts is float without missing values,
+        and its index is on the time grid of resample with interval
+        """
+        values = ts.values
+        if values.dtype.kind != "f" or np.isnan(values).any():
+            return False
+        if ts.shape[1] == 1 and interval == "asitis":
+            return True
+        return PreProcess._is_on_grid(ts.index, interval)
+
+    @staticmethod
+    def _is_on_grid(index: pd.DatetimeIndex, interval: str) -> bool:
+        """
+        whether index is on the time grid of resample with interval
+        """
+        times = index.asi8
+        if len(times) < 2:
+            return False
+        if interval and interval != "asitis":
+            try:
+                step = pd.Timedelta(interval).value
+            except ValueError:
+                return False
+        else:
+            step = times[1] - times[0]
+        if step <= 0 or not (np.diff(times) == step).all():
+            return False
+        # the bins of resample start from the midnight of the first day
+        return (times[0] - index[0].normalize().value) % step == 0
+
+    def is_stackable(self, ts: pd.DataFrame) -> bool:
+        """
+        whether ts is preprocessed the same alone and stacked with other series
+        of the same index. A single variate is not resampled "asitis" alone,
+        so it is only stackable if the stacked block is not resampled either.
+        """
+        interval = self._preprocess_params.get("interval")
+        if ts.shape[1] != 1 or interval != "asitis" or ts.shape[0] == 1:
+            return True
+        values = ts.values
+        if values.dtype.kind != "f" or np.isnan(values).any():
+            return False
+        return self._is_on_grid(ts.index, interval)
+
     @staticmethod
     def resample(ts: pd.DataFrame, interval: str) -> pd.DataFrame:
         # if length of ts is 1, do nothing
         if ts.shape[0] == 1:
             return ts
 
+        # if the data has been resampled, resampling changes nothing
+        if PreProcess._is_resampled(ts, interval):
+            return ts
+
         if ts.shape[1] == 1 and interval == "asitis":
             # single variate, and don't resample
             # some algorithms like the ones in adtk might go wrong if the
@@ -0,0 +1,370 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Asyncio server ingesting line protocol and detecting anomaly in micro-batches
+
+from __future__ import absolute_import
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .line_protocol import LineProtocolError, MeasurementBuffer, parse_line
+from ..detector.pipeline_detector import PipelineDetector
+from ..utils import const as con
+from ..utils import logger as llogger
+from ..utils.base_functions import load_params_from_yaml
+from ..utils.common import TimeSeriesType
+from ..utils.logger import logger
+
+AnomalyWriter = Callable[[List[str]], Awaitable[None]]
+
+_READ_SIZE = 64 * 1024
+
+
+def _escape_tag(text: str) -> str:
+    for char in ("\\", ",", "=", " "):
+        text = text.replace(char, "\\" + char)
+    return text
+
+
+def format_anomalies(
+    series_key: str, algo: List[str], results: List[TimeSeriesType]
+) -> List[str]:
+    """
+    format the anomalies of one series as line protocol
+    :param series_key: the series key, the measurement and the tags as line protocol
+    :param algo: the algorithms in the order of results
+    :param results: the results of the series returned by PipelineDetector
+    :return: one line for every anomalous point of every field and algorithm, e.g.
+        cpu,host=a,algorithm=ThresholdAD,field=usage anomalyLevel=1,originalValue=95 1661299200000000000
+    """
+    lines = []
+    for sub_algo, time_series in zip(algo, results):
+        label = time_series.get(con.LABEL)
+        if label is None or label.empty:
+            continue
+        values = label.to_numpy(dtype=bool)
+        if not values.any():
+            continue
+        times = label.index.asi8
+        fields = {
+            name: time_series[name].reindex(index=label.index, columns=label.columns)
+            for name in (con.LEVEL, con.SCORE, con.ORIGIN)
+            if isinstance(time_series.get(name), pd.DataFrame)
+        }
+        rows, cols = np.nonzero(values)
+        for row, col in zip(rows, cols):
+            pairs = ["%s=%s" % (con.LABEL, "true")]
+            for name, frame in fields.items():
+                value = frame.iat[row, col]
+                if isinstance(value, (int, float, np.number)) and np.isfinite(value):
+                    pairs.append("%s=%s" % (name, float(value)))
+            lines.append(
+                "%s,algorithm=%s,field=%s %s %d"
+                % (
+                    series_key,
+                    _escape_tag(str(sub_algo)),
+                    _escape_tag(str(label.columns[col])),
+                    ",".join(pairs),
+                    times[row],
+                )
+            )
+    return lines
+
+
+async def log_anomalies(lines: List[str]) -> None:
+    for line in lines:
+        logger.info("anomaly: %s", line)
+
+
+class IngestServer:
+    """
+    Ingest line protocol over TCP or Unix socket and detect anomaly in micro-batches.
+    The points are coalesced per measurement into columnar buffers, and a buffer is
+    dispatched to the PipelineDetector of the measurement when it holds max_batch_points
+    points or its first point has waited for max_delay seconds.
+    Detection runs in a thread pool so that the event loop never blocks,
+    and the anomalies are passed to anomaly_writer by a background task.
+    """
+
+    def __init__(
+        self,
+        algo: List[str],
+        params: dict,
+        max_batch_points: int = 10000,
+        max_delay: float = 1.0,
+        precision: str = "ns",
+        anomaly_writer: Optional[AnomalyWriter] = None,
+        max_pending_batches: int = 64,
+        max_workers: int = None,
+        detector_options: Optional[dict] = None,
+    ):
+        """
+        :param algo: the detection algorithms
+        :param params: parameters of the algorithms and other modules
+        :param max_batch_points: dispatch a measurement when its buffer holds so many points
+        :param max_delay: dispatch a measurement at most max_delay seconds
+            after its first buffered point arrives, it bounds the latency of detection
+        :param precision: precision of the timestamps, one of ns, us, ms and s
+        :param anomaly_writer: coroutine function receiving the anomalies as lines of
+            line protocol. default: log the anomalies
+        :param max_pending_batches: stop reading from the connections while so many
+            batches are waiting for detection
+        :param max_workers: the number of threads running detection
+        :param detector_options: other keyword arguments of PipelineDetector
+        """
+        self.algo = algo
+        self._params = params
+        self.max_batch_points = max_batch_points
+        self.max_delay = max_delay
+        self.precision = precision
+        self.anomaly_writer = anomaly_writer or log_anomalies
+        self.max_pending_batches = max_pending_batches
+        self.detector_options = detector_options or {}
+        self.detectors: Dict[str, PipelineDetector] = {}
+        self.buffers: Dict[str, MeasurementBuffer] = {}
+        self.number_points = 0
+        self.number_errors = 0
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="castor-ingest"
+        )
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._pending = set()
+        self._anomalies: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._servers = []
+
+    def _get_detector(self, measurement: str) -> PipelineDetector:
+        detector = self.detectors.get(measurement)
+        if detector is None:
+            detector = PipelineDetector(
+                algo=self.algo, params=self._params, **self.detector_options
+            )
+            self.detectors[measurement] = detector
+        return detector
+
+    def _detect(
+        self, measurement: str, buffer: MeasurementBuffer
+    ) -> Dict[Hashable, List[TimeSeriesType]]:
+        batch = buffer.to_batch()
+        if not batch:
+            return {}
+        return self._get_detector(measurement).run_batch(batch)
+
+    def ingest_line(self, line: str) -> None:
+        """
+        parse one line of line protocol and buffer the point
+        """
+        measurement, series_key, fields, timestamp = parse_line(line, self.precision)
+        if timestamp is None:
+            timestamp = time.time_ns()
+        buffer = self.buffers.get(measurement)
+        if buffer is None:
+            buffer = MeasurementBuffer()
+            self.buffers[measurement] = buffer
+            loop = asyncio.get_running_loop()
+            buffer.first_arrival = loop.time()
+            loop.call_later(self.max_delay, self._flush_expired, measurement, buffer)
+        buffer.append(series_key, timestamp, fields)
+        self.number_points += 1
+        if buffer.size >= self.max_batch_points:
+            self.flush(measurement)
+
+    def _flush_expired(self, measurement: str, buffer: MeasurementBuffer) -> None:
+        # the buffer may be dispatched by size before the timer fires
+        if self.buffers.get(measurement) is buffer:
+            self.flush(measurement)
+
+    def flush(self, measurement: str) -> None:
+        """
+        dispatch the buffered points of measurement for detection
+        """
+        buffer = self.buffers.pop(measurement, None)
+        if buffer is None or buffer.size == 0:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._dispatch(measurement, buffer)
+        )
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def flush_all(self) -> None:
+        for measurement in list(self.buffers):
+            self.flush(measurement)
+
+    async def _dispatch(self, measurement: str, buffer: MeasurementBuffer) -> None:
+        # the batches of one measurement are detected one by one in arrival order,
+        # since the detector keeps the state of the measurement
+        lock = self._locks.setdefault(measurement, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(
+                    self._pool, self._detect, measurement, buffer
+                )
+            except Exception as e:
+                logger.error(
+                    "detect measurement %s catch exception: %s", measurement, e
+                )
+                return
+        lines = []
+        for series_key, series_results in results.items():
+            lines.extend(format_anomalies(series_key, self.algo, series_results))
+        if lines:
+            await self._anomalies.put(lines)
+
+    async def _write_anomalies(self) -> None:
+        while True:
+            lines = await self._anomalies.get()
+            try:
+                await self.anomaly_writer(lines)
+            except Exception as e:
+                logger.error("write anomalies catch exception: %s", e)
+            finally:
+                self._anomalies.task_done()
+
+    async def _wait_pending(self) -> None:
+        # backpressure: stop reading while too many batches wait for detection
+        while len(self._pending) >= self.max_pending_batches:
+            await asyncio.wait(list(self._pending), return_when=asyncio.FIRST_COMPLETED)
+
+    def ingest_chunk(self, chunk: bytes) -> None:
+        """
+        ingest complete lines of line protocol, malformed lines are logged and skipped
+        """
+        for line in chunk.decode("utf-8", errors="replace").splitlines():
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                self.ingest_line(line)
+            except LineProtocolError as e:
+                self.number_errors += 1
+                logger.warning("skip malformed line: %s", e)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        remainder = b""
+        try:
+            while True:
+                chunk = await reader.read(_READ_SIZE)
+                if not chunk:
+                    break
+                chunk = remainder + chunk
+                end = chunk.rfind(b"\n") + 1
+                remainder = chunk[end:]
+                self.ingest_chunk(chunk[:end])
+                await self._wait_pending()
+            if remainder:
+                self.ingest_chunk(remainder)
+        except ConnectionError as e:
+            logger.info("connection closed: %s", e)
+        finally:
+            writer.close()
+
+    async def start(self, host: str = None, port: int = None, path: str = None) -> None:
+        """
+        start listening on host and port over TCP, or on path over Unix socket
+        """
+        self._anomalies = asyncio.Queue()
+        self._writer_task = asyncio.get_running_loop().create_task(
+            self._write_anomalies()
+        )
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, host=host or "127.0.0.1", port=port
+            )
+        self._servers.append(server)
+        logger.info(
+            "castor ingest server listening on %s",
+            [sock.getsockname() for sock in server.sockets],
+        )
+
+    async def serve_forever(self) -> None:
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self) -> None:
+        """
+        stop listening, detect the buffered points and write all anomalies
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        self.flush_all()
+        while self._pending:
+            await asyncio.wait(list(self._pending))
+        if self._anomalies is not None:
+            await self._anomalies.join()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._pool.shutdown(wait=True)
+        for detector in self.detectors.values():
+            detector.close()
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="detect anomaly in the line protocol received over TCP or Unix socket"
+    )
+    parser.add_argument("--config", required=True, help="the yaml file of parameters")
+    parser.add_argument(
+        "--algo", nargs="+", required=True, help="the detection algorithms"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--unix", default=None, help="listen on the Unix socket path")
+    parser.add_argument("--max-batch-points", type=int, default=10000)
+    parser.add_argument("--max-delay", type=float, default=1.0)
+    parser.add_argument("--precision", default="ns", choices=["ns", "us", "ms", "s"])
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    llogger.basic_config(level=args.log_level)
+    server = IngestServer(
+        algo=args.algo,
+        params=load_params_from_yaml(config_file=args.config),
+        max_batch_points=args.max_batch_points,
+        max_delay=args.max_delay,
+        precision=args.precision,
+    )
+
+    async def serve():
+        await server.start(host=args.host, port=args.port, path=args.unix)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("castor ingest server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Parsing openGemini/InfluxDB line protocol into columnar buffers
+
+from __future__ import absolute_import
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import logger
+
+FieldValue = Union[float, int, bool, str]
+
+PRECISION = {"ns": 1, "us": 1000, "ms": 1000 * 1000, "s": 1000 * 1000 * 1000}
+
+_TRUE = {"t", "T", "true", "True", "TRUE"}
+_FALSE = {"f", "F", "false", "False", "FALSE"}
+
+
+class LineProtocolError(ValueError):
+    """This exception is triggered when a line is not valid line protocol."""
+
+
+def _split(text: str, sep: str, max_split: int = -1) -> List[str]:
+    """
+    split text by sep, skipping the escaped characters and the double quoted strings
+    """
+    if "\\" not in text and '"' not in text:
+        return text.split(sep, max_split)
+    parts = []
+    start = 0
+    quoted = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif char == sep and not quoted and max_split != 0:
+            parts.append(text[start:i])
+            start = i + 1
+            max_split -= 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    for char in (",", "=", " ", '"', "\\"):
+        text = text.replace("\\" + char, char)
+    return text
+
+
+def _parse_value(text: str) -> FieldValue:
+    if text.startswith('"'):
+        if len(text) < 2 or not text.endswith('"'):
+            raise LineProtocolError("unterminated string value: %s" % text)
+        return _unescape(text[1:-1])
+    if text[-1:] in ("i", "u"):
+        return int(text[:-1])
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return float(text)
+
+
+def parse_line(
+    line: str, precision: str = "ns"
+) -> Tuple[str, str, Dict[str, FieldValue], Optional[int]]:
+    """
+    parse one line of line protocol
+    :param line: measurement[,tag=value...] field=value[,field=value...] [timestamp]
+    :param precision: precision of the timestamp, one of ns, us, ms and s
+    :return: measurement, series key (measurement and sorted tags), fields and
+        timestamp in nanoseconds, timestamp is None if the line doesn't carry one.
+    """
+    sections = _split(line.strip(), " ")
+    sections = [section for section in sections if section]
+    if len(sections) not in (2, 3):
+        raise LineProtocolError("invalid line: %s" % line)
+
+    keys = _split(sections[0], ",")
+    measurement = _unescape(keys[0])
+    if not measurement:
+        raise LineProtocolError("missing measurement: %s" % line)
+    tags = sorted(keys[1:])
+    series_key = ",".join([keys[0]] + tags)
+
+    fields = {}
+    for field in _split(sections[1], ","):
+        key_value = _split(field, "=", 1)
+        if len(key_value) != 2 or not key_value[0] or not key_value[1]:
+            raise LineProtocolError("invalid field %s: %s" % (field, line))
+        try:
+            fields[_unescape(key_value[0])] = _parse_value(key_value[1])
+        except ValueError as e:
+            raise LineProtocolError("invalid field %s: %s" % (field, e))
+
+    timestamp = None
+    if len(sections) == 3:
+        try:
+            timestamp = int(sections[2]) * PRECISION[precision]
+        except ValueError:
+            raise LineProtocolError("invalid timestamp: %s" % line)
+    return measurement, series_key, fields, timestamp
+
+
+class SeriesBuffer:
+    """
+    Columnar buffer of the points of one series, one list for every field.
+    The fields missing in a point are filled with NaN.
+    """
+
+    def __init__(self):
+        self.times = []
+        self.fields: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, timestamp: int, fields: Dict[str, FieldValue]) -> None:
+        length = len(self.times)
+        for key, value in fields.items():
+            if isinstance(value, str):
+                continue
+            column = self.fields.get(key)
+            if column is None:
+                column = [np.nan] * length
+                self.fields[key] = column
+            column.append(float(value))
+        self.times.append(timestamp)
+        for column in self.fields.values():
+            if len(column) == length:
+                column.append(np.nan)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {key: np.asarray(column) for key, column in self.fields.items()},
+            index=pd.DatetimeIndex(np.asarray(self.times, dtype="datetime64[ns]")),
+        )
+
+
+class MeasurementBuffer:
+    """
+    The points of one measurement waiting for detection, grouped by series.
+    """
+
+    def __init__(self):
+        self.series: Dict[str, SeriesBuffer] = {}
+        self.size = 0
+        # the time when the first point arrives, by the clock of event loop
+        self.first_arrival = None
+
+    def append(
+        self, series_key: str, timestamp: int, fields: Dict[str, FieldValue]
+    ) -> None:
+        buffer = self.series.get(series_key)
+        if buffer is None:
+            buffer = SeriesBuffer()
+            self.series[series_key] = buffer
+        buffer.append(timestamp, fields)
+        self.size += 1
+
+    def to_batch(self) -> Dict[str, pd.DataFrame]:
+        batch = {}
+        for series_key, buffer in self.series.items():
+            frame = buffer.to_frame()
+            if frame.empty:
+                logger.debug("series %s has no numeric fields", series_key)
+                continue
+            batch[series_key] = frame
+        return batch
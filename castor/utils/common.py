@@ -15,11 +15,16 @@ limitations under the License.
 """
 
 from __future__ import absolute_import
-from typing import Dict
+from typing import Dict, Hashable, List, Tuple, Union
 import re
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+
+from . import const as con
+
+TimeSeriesType = Dict[str, pd.DataFrame]
 
 
 def get_freq(freq: str) -> int:
@@ -78,55 +83,275 @@ def monotonic_concatenate(original, adder):
 
 
 def get_bound(title: pd.Index, threshold_dict: dict, threshold_scalar):
-    return {key: threshold_dict.get(key, threshold_scalar) for key in title}
+    # the columns of stacked data are (key, field) pairs, thresholds are given by field
+    fields = title.get_level_values(-1) if isinstance(title, pd.MultiIndex) else title
+    return {
+        key: threshold_dict.get(field, threshold_scalar)
+        for key, field in zip(title, fields)
+    }
+
+
+def stack_frames(
+    frames: Dict[Hashable, pd.DataFrame],
+    signatures: Dict[Hashable, Hashable] = None,
+) -> List[Tuple[list, pd.DataFrame]]:
+    """
+    stack the frames with the same time index into one block,
+    whose columns are (key, field) pairs.
+    :param frames: the frames to stack, keyed by the key of frame
+    :param signatures: the frames are only stacked with the ones of the same
+        signature. The frames whose signature is None are never stacked.
+    """
+    signatures = signatures or {}
+    groups = []
+    for key, frame in frames.items():
+        signature = signatures.get(key, ())
+        for index, group_signature, keys, group_frames in groups:
+            if (
+                signature is not None
+                and group_signature == signature
+                and index.equals(frame.index)
+            ):
+                keys.append(key)
+                group_frames.append(frame)
+                break
+        else:
+            groups.append((frame.index, signature, [key], [frame]))
+
+    blocks = []
+    for index, _, keys, group_frames in groups:
+        columns = pd.MultiIndex.from_tuples(
+            [(key, col) for key, frame in zip(keys, group_frames) for col in frame]
+        )
+        values = np.concatenate([frame.values for frame in group_frames], axis=1)
+        blocks.append((keys, pd.DataFrame(values, index=index, columns=columns)))
+    return blocks
+
+
+def split_frame(frame: pd.DataFrame) -> Dict[Hashable, pd.DataFrame]:
+    """
+    split the block stacked by stack_frames into frames by the key of columns
+    """
+    columns = frame.columns
+    codes = columns.codes[0]
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(columns.levels[0]) + 1))
+    fields = columns.get_level_values(1)
+    values = frame.values
+    frames = {}
+    for code, key in enumerate(columns.levels[0]):
+        positions = order[bounds[code] : bounds[code + 1]]
+        if len(positions):
+            frames[key] = pd.DataFrame(
+                values[:, positions], index=frame.index, columns=fields[positions]
+            )
+    return frames
+
+
+def concat_results(
+    results: List[List[TimeSeriesType]], columns: pd.Index
+) -> List[TimeSeriesType]:
+    """
+    concat the results of the series detected apart into the results of all series,
+    aligned by time. The labels missing are False and the levels missing are -1.
+    :param results: the results of run for every part of the series
+    :param columns: the series in the order of the input data
+    """
+    if len(results) == 1:
+        return results[0]
+    concatenated = []
+    for algo_results in zip(*results):
+        time_series = {}
+        for name in dict.fromkeys(name for result in algo_results for name in result):
+            frame = pd.concat(
+                [result[name] for result in algo_results if name in result],
+                axis=1,
+                sort=True,
+            )
+            time_series[name] = frame.reindex(
+                columns=[col for col in columns if col in frame.columns]
+            )
+        label = time_series.get(con.LABEL)
+        if label is not None:
+            time_series[con.LABEL] = label.fillna(False).astype(bool)
+            if con.LEVEL in time_series:
+                time_series[con.LEVEL] = (
+                    time_series[con.LEVEL]
+                    .reindex(index=label.index, columns=label.columns, fill_value=-1.0)
+                    .fillna(-1.0)
+                )
+        concatenated.append(time_series)
+    return concatenated
+
 
+def _arrow_chunks(column: Union[pa.Array, pa.ChunkedArray]) -> List[pa.Array]:
+    if isinstance(column, pa.ChunkedArray):
+        return column.chunks
+    return [column]
 
-ALGO_WINDOW = []
+
+def _arrow_time_index(column: Union[pa.Array, pa.ChunkedArray]) -> pd.DatetimeIndex:
+    tz = None
+    if pa.types.is_timestamp(column.type):
+        tz = column.type.tz
+        if column.type.unit != "ns":
+            column = column.cast(pa.timestamp("ns", tz))
+    elif pa.types.is_integer(column.type):
+        column = column.cast(pa.int64())
+    else:
+        raise TypeError("the time column of type %s is not timestamp" % column.type)
+    chunks = _arrow_chunks(column)
+    times = [chunk.view(pa.int64()).to_numpy(zero_copy_only=True) for chunk in chunks]
+    if not times:
+        times = np.empty(0, dtype=np.int64)
+    elif len(times) == 1:
+        times = times[0]
+    else:
+        times = np.concatenate(times)
+    # the time is in UTC, the same as the naive DatetimeIndex
+    index = pd.DatetimeIndex(times.view("datetime64[ns]"))
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return index
+
+
+def arrow_to_frame(
+    data: Union[pa.Table, pa.RecordBatch], time_column: str = con.TIME_COLUMN
+) -> pd.DataFrame:
+    """
+    convert a pyarrow Table or RecordBatch into DataFrame indexed by time_column.
+    The numeric columns are read as zero-copy NumPy views of the Arrow buffers, and
+    gathered into the float64 block of the DataFrame by a single copy.
+    The nulls are converted to NaN.
+    :param data: pyarrow Table or RecordBatch with a timestamp column
+    :param time_column: the name of the timestamp column, which is in UTC.
+        integer time column is in nanoseconds.
+        The index is converted to the time zone of the timestamp type if it has one.
+    :return: DataFrame with the other columns as fields
+    """
+    names = data.schema.names
+    if time_column not in names:
+        raise ValueError("the time column %s is not found" % time_column)
+    fields = [name for name in names if name != time_column]
+    index = _arrow_time_index(data.column(names.index(time_column)))
+
+    block = np.empty((len(fields), data.num_rows), dtype=np.float64)
+    for row, name in zip(block, fields):
+        column = data.column(names.index(name))
+        if not (
+            pa.types.is_floating(column.type)
+            or pa.types.is_integer(column.type)
+            or pa.types.is_boolean(column.type)
+        ):
+            raise TypeError(
+                "the column %s of type %s is not numeric" % (name, column.type)
+            )
+        offset = 0
+        for chunk in _arrow_chunks(column):
+            zero_copy = chunk.null_count == 0 and not pa.types.is_boolean(chunk.type)
+            row[offset : offset + len(chunk)] = chunk.to_numpy(zero_copy_only=zero_copy)
+            offset += len(chunk)
+    # the block is transposed, so that every column is contiguous in memory
+    return pd.DataFrame(block.T, index=index, columns=fields, copy=False)
 
 
 class FIFOData:
     def __init__(self, max_len, array_type="float"):
         """
-        The data in the array is ordered by the time
+        A ring buffer keeping the latest max_len values, and optionally their
+        timestamps in int64 nanoseconds.
         The data may be less than array length if the data cache is not enough.
         The data_length means the real length of data
         """
         self._data = np.empty(max_len, dtype=array_type)
+        self._times = None
+        # the position of the oldest value
+        self._start = 0
         self._length = 0
         self.size = max_len
 
     def get_data(self) -> np.array:
-        return self._data
+        """
+        get the values ordered by time, see get_filling_data
+        """
+        return self.get_filling_data()
 
     def get_length(self) -> int:
         return self._length
 
-    def update(self, data):
-        data_length = len(data)
-        free_length = self.size - self._length
-        if self.size <= data_length:
-            self._length = 0
-        elif data_length > free_length:
-            shift_length = data_length - free_length
-            self._data[0 : self._length - shift_length] = self._data[
-                shift_length : self._length
-            ]
-            self._length -= shift_length
-        data_length = min(data_length, self.size)
-        self._data[self._length : self._length + data_length] = data[-data_length:]
-        self._length += data_length
-
-    def get_filling_data(self):
-        return self._data[: self._length]
-
-    def set_data(self, data):
-        data_length = len(data)
-        if data_length < self.size:
-            self._data[0:data_length] = data
-            self._length = data_length
+    def _positions(self) -> (slice, slice):
+        # the positions of the two segments of values ordered by time
+        end = self._start + self._length
+        if end <= self.size:
+            return slice(self._start, end), slice(0, 0)
+        return slice(self._start, self.size), slice(0, end - self.size)
+
+    def update(self, data, times: np.ndarray = None):
+        """
+        append the data, and their timestamps if times is given.
+        The oldest values are overwritten when the buffer is full.
+        """
+        data_length = min(len(data), self.size)
+        if data_length == 0:
+            return
+        data = data[-data_length:]
+        if times is None or (
+            self._times is None and self._length > 0 and data_length < self.size
+        ):
+            # the timestamps are kept only if all of the values have timestamps
+            self._times = None
+            times = None
         else:
-            self._data = data[-self.size :]
-            self._length = self.size
+            if self._times is None:
+                self._times = np.zeros(self.size, dtype=np.int64)
+            times = np.asarray(times, dtype=np.int64)[-data_length:]
+
+        end = (self._start + self._length) % self.size
+        first_length = min(data_length, self.size - end)
+        self._data[end : end + first_length] = data[:first_length]
+        self._data[: data_length - first_length] = data[first_length:]
+        if times is not None:
+            self._times[end : end + first_length] = times[:first_length]
+            self._times[: data_length - first_length] = times[first_length:]
+
+        overflow = max(self._length + data_length - self.size, 0)
+        self._start = (self._start + overflow) % self.size
+        self._length += data_length - overflow
+
+    def get_segments(self) -> (np.ndarray, np.ndarray):
+        """
+        get the values ordered by time as two views of the buffer without copy,
+        the second one is empty unless the values wrap around the end of buffer
+        """
+        first, second = self._positions()
+        return self._data[first], self._data[second]
+
+    def get_filling_data(self) -> np.ndarray:
+        """
+        get the values ordered by time, which is a view of the buffer
+        unless the values wrap around the end of buffer
+        """
+        first, second = self.get_segments()
+        if len(second) == 0:
+            return first
+        return np.concatenate((first, second))
+
+    def get_times(self) -> Union[np.ndarray, None]:
+        """
+        get the timestamps of values ordered by time in int64 nanoseconds,
+        None if the timestamps are not kept
+        """
+        if self._times is None:
+            return None
+        first, second = self._positions()
+        if second.stop == 0:
+            return self._times[first]
+        return np.concatenate((self._times[first], self._times[second]))
+
+    def set_data(self, data, times: np.ndarray = None):
+        self._start = 0
+        self._length = 0
+        self.update(data, times)
 
     def is_full(self):
         return self._length >= self.size
@@ -141,6 +366,3 @@ class Singleton(object):
         if self._cls not in self._instance:
             self._instance[self._cls] = self._cls(*args, **kwargs)
         return self._instance[self._cls]
-
-
-TimeSeriesType = Dict[str, pd.DataFrame]
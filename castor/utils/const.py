@@ -61,13 +61,34 @@ NON_TRAINABLE_AD = [
 
 TRAINABLE_AD = []
 
+# executors of sub-pipelines
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+
+# output formats of PipelineDetector
+NUMPY_OUTPUT = "numpy"
+ARROW_OUTPUT = "arrow"
+EVENT_OUTPUT = "event"
+OUTPUT_FORMATS = {NUMPY_OUTPUT, ARROW_OUTPUT, EVENT_OUTPUT}
+
+# keys of the columnar result
+TIME_COLUMN = "time"
+COLUMNS = "columns"
+ALGORITHMS = "algorithms"
+LEVEL_SCALE = "levelScale"
+
+# keys of the anomaly events
+SERIES = "series"
+
 DATA_VALIDATE = "Data_Validate"
 DATA_PREPROCESS = "Data_Preprocess"
+STREAM_FILTER = "Stream_Filter"
 ANOMALY_SUPPRESS = "Anomaly_Suppress"
 DYNAMIC_THRESHOLD = "DYNAMIC_THRESHOLD"
 SEVERITY_LEVEL = "Severity_Level"
 SIGEWM_THRESHOLDER = "SigewmThresholder"
 SIGMA_THRESHOLDER = "SigmaThresholder"
+WELFORD_THRESHOLDER = "WelfordThresholder"
 
 ALGO = "algo"
 
@@ -80,6 +101,9 @@ LOWER_BOUND = "lower_bound"
 LOWER_BOUND_KV = "lower_bound_dict"
 
 GAP = "gap"
+LATENESS = "lateness"
+BUFFER_SIZE = "buffer_size"
+MAX_PENDING = "max_pending"
 HIS_ANOMALY = "his_anomaly"
 
 
@@ -90,12 +114,20 @@ FREQ = "freq"
 LEVEL = "anomalyLevel"
 LABEL = "anomalyLabel"
 GENERATE_TIME = "generateTime"
+# the latest data shared by the algorithms in one run, never returned
+LATEST_DATA_CONTEXT = "latestDataContext"
 
 DATA_CACHE = "DataCache"
 SIGMA_EWM_THRESHOLD_CACHE = "SigewmThresholderCache"
+WELFORD_THRESHOLD_CACHE = "WelfordThresholderCache"
+WELFORD_WINDOW_CACHE = "WelfordWindowCache"
 STREAM_FILTER_CACHE = "StreamFilterCache"
+REORDER_CACHE = "ReorderCache"
 SUPPRESS_CACHE = "SuppressCache"
 SEVERITY_LEVEL_CACHE = "SeverityLevelCache"
+EVENT_CACHE = "EventCache"
+INCREMENTAL_AD_CACHE = "IncrementalADCache"
+VALUE_CHANGE_CACHE = "ValueChangeCache"
 ERROR_INFO = "ErrorInfo"
 
 KV_PARAM_KEY = {UPPER_BOUND_KV, LOWER_BOUND_KV}
@@ -0,0 +1,198 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Recording the latency and throughput of the stages of detection
+
+from __future__ import absolute_import
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from . import const as con
+from .common import Singleton
+from .logger import logger
+
+# the upper bounds of the latency buckets in seconds: 1us, 2us, 4us, ... about 16s
+_MIN_BUCKET = 1e-6
+_NUMBER_BUCKETS = 25
+BUCKET_BOUNDS = [_MIN_BUCKET * 2**i for i in range(_NUMBER_BUCKETS)]
+
+
+def _bucket(duration: float) -> int:
+    if duration <= _MIN_BUCKET:
+        return 0
+    return min(math.ceil(math.log2(duration / _MIN_BUCKET)), _NUMBER_BUCKETS)
+
+
+class StageStats:
+    """
+    The statistics of one stage: the latency histogram and the rows and columns processed.
+    The last bucket of histogram counts the calls longer than the last bound.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.columns = 0
+        self.histogram = [0] * (_NUMBER_BUCKETS + 1)
+
+    def record(self, duration: float, rows: int, columns: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.rows += rows
+        self.columns += columns
+        self.histogram[_bucket(duration)] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        estimate the quantile of latency by the upper bound of its bucket
+        """
+        target = q * self.count
+        accumulated = 0
+        for bound, number in zip(BUCKET_BOUNDS, self.histogram):
+            accumulated += number
+            if accumulated >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+            "p50_seconds": self.quantile(0.5),
+            "p90_seconds": self.quantile(0.9),
+            "p99_seconds": self.quantile(0.99),
+            "rows": self.rows,
+            "columns": self.columns,
+            "points_per_second": (
+                self.rows * self.columns / self.total if self.total else 0.0
+            ),
+            "histogram": {
+                str(bound): number
+                for bound, number in zip(BUCKET_BOUNDS + [math.inf], self.histogram)
+                if number
+            },
+        }
+
+
+@Singleton
+class Instrumentation(object):
+    """
+    The registry of the statistics of stages, disabled by default.
+    When it is disabled, an instrumented call only costs one attribute check.
+    """
+
+    def __init__(self):
+        self.thread_lock = threading.Lock()
+        self.enabled = False
+        self.stages: Dict[str, StageStats] = {}
+        self.gauges: Dict[str, Callable[[], object]] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.thread_lock:
+            self.stages = {}
+
+    def record(self, stage: str, duration: float, rows: int = 0, columns: int = 0):
+        with self.thread_lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = StageStats()
+                self.stages[stage] = stats
+            stats.record(duration, rows, columns)
+
+    def add_gauge(self, name: str, gauge: Callable[[], object]) -> None:
+        """
+        add a gauge, which is evaluated when taking a snapshot, e.g. the size of caches
+        """
+        self.gauges[name] = gauge
+
+    def snapshot(self) -> dict:
+        """
+        :return: the statistics of all stages and the values of gauges
+            example:
+                {
+                    'enabled': True,
+                    'stages': {
+                        'ThresholdAD.detect': {'count': 3, 'total_seconds': 0.0021, ...},
+                        ...
+                    },
+                    'gauges': {'cache_sizes': {'DataCache': 10, ...}, ...}
+                }
+        """
+        with self.thread_lock:
+            stages = {stage: stats.to_dict() for stage, stats in self.stages.items()}
+        gauges = {}
+        for name, gauge in list(self.gauges.items()):
+            try:
+                gauges[name] = gauge()
+            except Exception as e:
+                logger.error("gauge %s catch exception: %s", name, e)
+        return {"enabled": self.enabled, "stages": stages, "gauges": gauges}
+
+
+def _get_shape(args: tuple, kwargs: dict) -> (int, int):
+    # the shape of the first DataFrame argument, or the original data of time series
+    for arg in list(args) + list(kwargs.values()):
+        if isinstance(arg, dict):
+            arg = arg.get(con.ORIGIN)
+        if isinstance(arg, pd.DataFrame):
+            return arg.shape
+    return 0, 0
+
+
+_instrumentation = Instrumentation()
+
+
+def instrument(stage: Optional[str] = None):
+    """
+    decorator of the methods to instrument.
+    :param stage: the name of stage. default: the name of class and method,
+        e.g. "ThresholdAD.detect", so that the subclasses are recorded separately.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _instrumentation.enabled:
+                return func(*args, **kwargs)
+            # the shape before the call, since some stages drop columns in place
+            rows, columns = _get_shape(args[1:], kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                name = stage or "%s.%s" % (type(args[0]).__name__, func.__name__)
+                _instrumentation.record(name, duration, rows, columns)
+
+        return wrapper
+
+    return decorator
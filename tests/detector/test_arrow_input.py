@@ -0,0 +1,111 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.testing import assert_frame_equal
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.organize_cache import clear_cache
+from castor.preprocessing.processing import PreProcess
+from castor.utils.common import arrow_to_frame
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.INCREMENTAL_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 3)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["cpu", "memory", "disk"],
+    )
+
+
+def to_arrow(data: pd.DataFrame) -> pa.RecordBatch:
+    return pa.RecordBatch.from_arrays(
+        [pa.array(data.index)] + [pa.array(data[col]) for col in data],
+        names=[con.TIME_COLUMN] + list(data.columns),
+    )
+
+
+class TestArrowInput:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.data = data_generation(seed=1)
+        yield
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_arrow_input(self):
+        detector = PipelineDetector(algo=algo, params=self.params)
+        arrow_detector = PipelineDetector(algo=algo, params=self.params)
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            data = self.data.iloc[start:end]
+            expected = detector.run(data)
+            results = arrow_detector.run(to_arrow(data))
+            for actual_kv, expected_kv in zip(results, expected):
+                assert_frame_equal(
+                    actual_kv[con.LABEL], expected_kv[con.LABEL], check_freq=False
+                )
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_arrow_to_frame_time_index(self):
+        data = self.data.iloc[:10].tz_localize("UTC").tz_convert("Asia/Shanghai")
+        frame = arrow_to_frame(to_arrow(data))
+        assert str(frame.index.tz) == "Asia/Shanghai"
+        assert_frame_equal(frame, data, check_freq=False)
+
+        # the table without rows and chunks gives an empty frame
+        table = pa.Table.from_batches([], schema=to_arrow(data).schema)
+        frame = arrow_to_frame(table)
+        assert frame.empty and isinstance(frame.index, pd.DatetimeIndex)
+        assert list(frame.columns) == list(data.columns)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_preprocess_skip_copy(self):
+        preprocess = PreProcess(
+            self.params.get(con.DATA_VALIDATE), self.params.get(con.DATA_PREPROCESS)
+        )
+        data = self.data.copy()
+        data.iloc[5, 1] = np.nan
+        for frame in [self.data, data, self.data.iloc[::2]]:
+            # the shuffled data goes through the validation and resampling of pandas
+            shuffled = frame.sample(frac=1, random_state=0)
+            assert_frame_equal(
+                preprocess.validate_preprocess(frame, flag="detect"),
+                preprocess.validate_preprocess(shuffled, flag="detect"),
+            )
+        result = preprocess.validate_preprocess(self.data, flag="detect")
+        assert np.shares_memory(result.values, self.data.values)
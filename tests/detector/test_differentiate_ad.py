@@ -0,0 +1,51 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.differentiate_ad import DIFFERENTIATEAD
+from castor.utils import const as con
+
+
+@pytest.mark.parametrize("window, length", [(1, 30), (5, 30), (5, 5), (10, 3)])
+def test_differentiate_score(window, length):
+    rng = np.random.default_rng(window)
+    data = pd.DataFrame(
+        rng.normal(size=(length, 4)),
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(4)],
+    )
+    if length > 20:
+        data.iloc[15, 2] = np.nan
+    detector = DIFFERENTIATEAD(
+        "test",
+        {
+            con.WINDOW: window,
+            con.DYNAMIC_THRESHOLD: {
+                "CHOICE": con.SIGMA_THRESHOLDER,
+                con.SIGMA_THRESHOLDER: {},
+            },
+        },
+        StateStore(),
+    )
+    expected = sum(data.diff(i).abs() for i in range(1, window + 1)).dropna()
+    score = detector._get_score(data)
+    pd.testing.assert_frame_equal(score, expected, check_exact=True, check_freq=False)
@@ -0,0 +1,116 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [
+    con.DIFFERENTIATE_AD,
+    con.BATCH_DIFFERENTIATE_AD,
+    con.INCREMENTAL_AD,
+    con.THRESHOLD_AD,
+    con.VALUE_CHANGE_AD,
+]
+
+
+def data_generation(length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(length, 3)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["cpu", "data1", "v"],
+    )
+
+
+class TestExecutor:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.data = data_generation()
+        yield
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    @pytest.mark.parametrize("executor", [con.THREAD_EXECUTOR, con.PROCESS_EXECUTOR])
+    def test_executor(self, executor):
+        detector = PipelineDetector(algo=algo, params=self.params, executor=executor)
+        expected_detector = PipelineDetector(algo=algo, params=self.params)
+        try:
+            for start, end in [(0, 200), (200, 250), (250, 300)]:
+                results = detector.run(self.data.iloc[start:end])
+                expected = expected_detector.run(self.data.iloc[start:end])
+                assert len(results) == len(expected)
+                for actual_kv, expected_kv in zip(results, expected):
+                    assert set(actual_kv) == set(expected_kv)
+                    for name, value in expected_kv.items():
+                        assert_frame_equal(actual_kv.get(name), value)
+        finally:
+            detector.close()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_process_executor_worker_died(self):
+        detector = PipelineDetector(
+            algo=algo[:2], params=self.params, executor=con.PROCESS_EXECUTOR
+        )
+        try:
+            detector.run(self.data.iloc[:200])
+            # the parent gets an error instead of waiting for a dead worker forever
+            for pool in detector.executor._pools:
+                for process in list(pool._processes.values()):
+                    process.kill()
+                    process.join()
+            with pytest.raises(BrokenProcessPool):
+                detector.run(self.data.iloc[200:250])
+        finally:
+            detector.close()
+
+
+def test_construct_detectors_concurrently():
+    params = load_params_from_yaml(
+        config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+    )
+    algos = [[con.DIFFERENTIATE_AD], [con.INCREMENTAL_AD, con.VALUE_CHANGE_AD], algo]
+    expected = [PipelineDetector(algo=a, params=params).max_window for a in algos]
+    assert len(set(expected)) > 1
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [
+            (i % 3, pool.submit(PipelineDetector, algo=algos[i % 3], params=params))
+            for i in range(60)
+        ]
+        for i, future in futures:
+            assert future.result().max_window == expected[i]
@@ -0,0 +1,121 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.incremental_ad import IncrementalAD
+from castor.detector.stream_filter.get_latest_data_module import LatestData
+from castor.utils import const as con
+from castor.utils.exceptions import ValueNotEnoughError
+
+
+def data_generation(seed: int, length: int = 200) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    trend = np.linspace(0, 30, length)[:, np.newaxis] * np.array([1, -1, 1, -1])
+    data = rng.normal(size=(length, 4)).cumsum(axis=0) + trend
+    data[rng.integers(length, size=10), rng.integers(4, size=10)] = np.nan
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(4)],
+    )
+
+
+def incremental_bound_loop(data, window_size, window_number, ub, lb):
+    """the row by row computation of the labels of incremental bounds"""
+    data_max = data.rolling(window_size).max().diff(window_size)
+    data_min = data.rolling(window_size).min().diff(window_size)
+    start_index = window_size * (window_number + 1) - 1
+    sampler = np.array([0 - i * window_size for i in range(window_number)])
+    label_ub = data.copy()
+    label_lb = data.copy()
+    for i in range(start_index, len(data)):
+        label_ub.iloc[i, :] = np.logical_and(
+            data_max.iloc[sampler + i, :].min(axis=0) > 0,
+            data_min.iloc[sampler + i, :].min(axis=0) > 0,
+        )
+        label_lb.iloc[i, :] = np.logical_and(
+            data_max.iloc[sampler + i, :].max(axis=0) < 0,
+            data_min.iloc[sampler + i, :].max(axis=0) < 0,
+        )
+    label_ub = np.logical_and(
+        label_ub.iloc[start_index:, :],
+        ((data - ub).rolling(window_size).min() > 0).iloc[start_index:, :],
+    )
+    label_lb = np.logical_and(
+        label_lb.iloc[start_index:, :],
+        ((data - lb).rolling(window_size).max() < 0).iloc[start_index:, :],
+    )
+    return label_ub, label_lb
+
+
+@pytest.mark.parametrize("window_size, window_number", [(5, 3), (1, 1), (4, 6)])
+def test_incremental_bound(window_size, window_number):
+    data = data_generation(seed=window_size)
+    ub, lb = 5.0, -5.0
+    label_ub, label_lb, start_index = IncrementalAD._incremental_bound(
+        data, window_size, window_number, ub, lb
+    )
+    expected_ub, expected_lb = incremental_bound_loop(
+        data, window_size, window_number, ub, lb
+    )
+    assert start_index == window_size * (window_number + 1) - 1
+    pd.testing.assert_frame_equal(label_ub, expected_ub.astype(bool))
+    pd.testing.assert_frame_equal(label_lb, expected_lb.astype(bool))
+    assert label_ub.values.any() and label_lb.values.any()
+
+
+@pytest.mark.parametrize("window_size, window_number", [(4, 3), (1, 2)])
+def test_streaming_label(window_size, window_number):
+    data = data_generation(seed=3, length=300)
+    params = {
+        "window_size": window_size,
+        "window_number": window_number,
+        con.UPPER_BOUND: 5.0,
+        con.LOWER_BOUND_KV: {"field1": -5.0, "field3": -2.0},
+        con.LOWER_BOUND: -3.0,
+    }
+    cache_set = StateStore()
+    detector = IncrementalAD("test", dict(params), cache_set)
+    latest_data = LatestData(cache_set)
+    streaming_detector = IncrementalAD(
+        "test", dict(params, streaming=True), StateStore()
+    )
+    assert streaming_detector._hyper_params[con.WINDOW] == 0
+
+    chunks = [(0, 40), (40, 41), (41, 100), (100, 103), (103, 300)]
+    for start, end in chunks:
+        chunk = data.iloc[start:end]
+        label = detector.detect({con.ORIGIN: chunk})[con.LABEL]
+        latest_data.update(detector._hyper_params[con.WINDOW], chunk)
+        streaming_label = streaming_detector.detect({con.ORIGIN: chunk})[con.LABEL]
+        pd.testing.assert_frame_equal(streaming_label, label, check_freq=False)
+    assert streaming_label.values.any()
+
+
+def test_streaming_not_enough_value():
+    data = data_generation(seed=4)
+    params = {"window_size": 4, "window_number": 3, con.UPPER_BOUND: 1.0}
+    detector = IncrementalAD("test", dict(params, streaming=True), StateStore())
+    with pytest.raises(ValueNotEnoughError):
+        detector.detect({con.ORIGIN: data.iloc[:10]})
+    label = detector.detect({con.ORIGIN: data.iloc[10:20]})[con.LABEL]
+    assert list(label.index) == list(data.index[15:20])
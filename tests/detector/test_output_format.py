@@ -0,0 +1,227 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import json
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.output.columnar import decode_labels
+from castor.detector.output.events import encode_events
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.INCREMENTAL_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 10)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(10)],
+    )
+
+
+class TestOutputFormat:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.data = data_generation(seed=1)
+        yield
+        clear_cache()
+
+    def expected_arrays(self, results, data):
+        labels = np.zeros((len(algo), len(data), len(data.columns)), dtype=bool)
+        levels = np.full(labels.shape, -1.0)
+        for ind, time_series in enumerate(results):
+            label = time_series[con.LABEL].reindex(
+                index=data.index, columns=data.columns, fill_value=False
+            )
+            labels[ind] = label.to_numpy(dtype=bool)
+            if con.LEVEL in time_series:
+                level = time_series[con.LEVEL].reindex(
+                    index=data.index, columns=data.columns, fill_value=-1.0
+                )
+                levels[ind] = level.to_numpy()
+        return labels, levels
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_numpy_output(self):
+        detector = PipelineDetector(algo=algo, params=self.params)
+        numpy_detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.NUMPY_OUTPUT
+        )
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            data = self.data.iloc[start:end]
+            results = detector.run(data.copy())
+            columnar = numpy_detector.run(data.copy())
+            labels, levels = self.expected_arrays(results, data)
+
+            assert columnar[con.LABEL].dtype == np.uint8
+            assert columnar[con.LABEL].shape == (len(algo), len(data), 2)
+            assert columnar[con.LEVEL].dtype == np.int8
+            np.testing.assert_array_equal(columnar[con.TIME_COLUMN], data.index.asi8)
+            np.testing.assert_array_equal(decode_labels(columnar), labels)
+            np.testing.assert_array_equal(
+                columnar[con.LEVEL], np.rint(levels * columnar[con.LEVEL_SCALE])
+            )
+        assert decode_labels(columnar).any()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_numpy_output_levels_above_one(self):
+        self.params[con.SEVERITY_LEVEL][con.ALGO][con.THRESHOLD_AD] = 5
+        detector = PipelineDetector(algo=algo, params=self.params)
+        numpy_detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.NUMPY_OUTPUT
+        )
+        results = detector.run(self.data.copy())
+        columnar = numpy_detector.run(self.data.copy())
+        _, levels = self.expected_arrays(results, self.data)
+
+        # the levels are scaled to fit into int8 instead of saturated
+        assert levels.max() == 5
+        assert columnar[con.LEVEL_SCALE] == 25
+        np.testing.assert_array_equal(
+            columnar[con.LEVEL] / columnar[con.LEVEL_SCALE], levels
+        )
+
+        self.params[con.SEVERITY_LEVEL][con.ALGO][con.THRESHOLD_AD] = 200
+        with pytest.raises(ValueError):
+            PipelineDetector(
+                algo=algo, params=self.params, output_format=con.NUMPY_OUTPUT
+            )
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_arrow_output(self):
+        detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.NUMPY_OUTPUT
+        )
+        arrow_detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.ARROW_OUTPUT
+        )
+        columnar = detector.run(self.data.copy())
+        batch = arrow_detector.run(self.data.copy())
+
+        assert batch.num_rows == len(algo) * len(self.data)
+        assert json.loads(batch.schema.metadata[con.COLUMNS.encode()]) == list(
+            self.data.columns
+        )
+        labels = np.frombuffer(
+            batch.column(con.LABEL).buffers()[1], dtype=np.uint8
+        ).reshape(columnar[con.LABEL].shape)
+        np.testing.assert_array_equal(labels, columnar[con.LABEL])
+        levels = batch.column(con.LEVEL).flatten().to_numpy()
+        np.testing.assert_array_equal(levels, columnar[con.LEVEL].reshape(-1))
+        assert batch.column(con.ALGO).to_pylist()[:: len(self.data)] == algo
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch_output(self):
+        detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.NUMPY_OUTPUT
+        )
+        results = detector.run_batch({"host1": self.data, "host2": self.data * 2})
+        assert set(results) == {"host1", "host2"}
+        for columnar in results.values():
+            assert list(columnar[con.COLUMNS]) == list(self.data.columns)
+            assert columnar[con.LEVEL].shape == (len(algo), len(self.data), 10)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_event_output(self):
+        detector = PipelineDetector(algo=algo, params=self.params)
+        event_detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.EVENT_OUTPUT
+        )
+        results = detector.run(self.data.iloc[:250].copy())
+        events = event_detector.run(self.data.iloc[:250].copy())
+
+        expected = set()
+        for algorithm, time_series in zip(algo, results):
+            label = time_series[con.LABEL]
+            for time, column in label[label].stack().index:
+                expected.add((column, time, algorithm))
+        assert expected
+        assert {
+            (event[con.SERIES], event[con.TIME_COLUMN], event[con.ALGO])
+            for event in events
+        } == expected
+        times = [event[con.TIME_COLUMN] for event in events]
+        assert times == sorted(times)
+
+        # the overlapping window emits only the events newer than the watermarks
+        watermarks = {}
+        for event in events:
+            series = (event[con.SERIES], event[con.ALGO])
+            watermarks[series] = max(
+                watermarks.get(series, event[con.TIME_COLUMN]), event[con.TIME_COLUMN]
+            )
+        new_events = event_detector.run(self.data.iloc[200:].copy())
+        for event in new_events:
+            series = (event[con.SERIES], event[con.ALGO])
+            assert event[con.TIME_COLUMN] > watermarks.get(series, pd.Timestamp.min)
+        # the anomalies detected again are not emitted again
+        names = event_detector.name_algorithm
+        assert encode_events(results, algo, names, event_detector.cache_set) == []
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_event_output_time_zone(self):
+        detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.EVENT_OUTPUT
+        )
+        data = self.data.tz_localize("UTC").tz_convert("Asia/Shanghai")
+        events = detector.run(data)
+        assert events
+        for event in events:
+            assert str(event[con.TIME_COLUMN].tz) == "Asia/Shanghai"
+            assert event[con.TIME_COLUMN] in data.index
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch_event_output(self):
+        detector = PipelineDetector(
+            algo=algo, params=self.params, output_format=con.EVENT_OUTPUT
+        )
+        plain_detector = PipelineDetector(algo=algo, params=self.params)
+        batch = {"host1": self.data, "host2": self.data * 2}
+        results = detector.run_batch(batch)
+        plain_results = plain_detector.run_batch(batch)
+        assert results["host1"] and results["host2"]
+
+        names = detector.name_algorithm
+        for key in ["host1", "host2"]:
+            assert (
+                encode_events(plain_results[key], algo, names, detector.cache_set, key)
+                == []
+            )
+        # the watermarks are kept for every measurement
+        events = encode_events(
+            plain_results["host1"], algo, names, detector.cache_set, "host3"
+        )
+        assert events == results["host1"]
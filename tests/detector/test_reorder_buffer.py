@@ -0,0 +1,164 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.stream_filter.get_latest_data_module import LatestData
+from castor.detector.stream_filter.reorder_buffer import ReorderBuffer
+from castor.utils import const as con
+from castor.utils.exceptions import NoNewDataError
+
+
+def data_generation(seed: int, length: int = 60) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        rng.normal(size=(length, 3)),
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T", tz="UTC"),
+        columns=["field0", "field1", "field2"],
+    )
+
+
+def reorder(buffer: ReorderBuffer, latest_data: LatestData, chunk: pd.DataFrame):
+    """reorder a chunk and update the history as PipelineDetector does"""
+    try:
+        released = buffer.reorder(chunk)
+    except NoNewDataError:
+        return None
+    for frame in released:
+        latest_data.update(1, frame)
+    return released[0] if len(released) == 1 else released
+
+
+def test_reorder_within_lateness():
+    data = data_generation(seed=0)
+    cache_set = StateStore()
+    buffer = ReorderBuffer({con.LATENESS: "3T"}, cache_set)
+    latest_data = LatestData(cache_set)
+
+    # every chunk has points up to 3 minutes earlier than the latest point seen
+    rng = np.random.default_rng(1)
+    order = np.argsort(np.arange(60) + rng.uniform(0, 3, size=60))
+    released = [
+        reorder(buffer, latest_data, data.iloc[order[start : start + 4]])
+        for start in range(0, 60, 4)
+    ]
+    result = pd.concat([frame for frame in released if frame is not None])
+    assert result.index.is_monotonic_increasing
+    pd.testing.assert_frame_equal(result, data.iloc[: len(result)], check_freq=False)
+    assert len(result) >= 56
+
+    # the points held are released when the watermark advances
+    pending = cache_set.get_cache(con.REORDER_CACHE)
+    assert set(pending.keys()) == set(data.columns)
+    later = data_generation(seed=2, length=70).iloc[69:]
+    later.index = later.index + pd.Timedelta(minutes=5)
+    result = pd.concat([result, reorder(buffer, latest_data, later)])
+    pd.testing.assert_frame_equal(result, data, check_freq=False)
+    assert len(pending) == 3
+    assert all(len(pending.get_points(key)[0]) == 1 for key in data.columns)
+
+
+def test_reorder_late_and_bounded():
+    data = data_generation(seed=3)
+    data.iloc[12, 1] = np.nan
+    cache_set = StateStore()
+    buffer = ReorderBuffer({con.LATENESS: "30T", con.BUFFER_SIZE: 5}, cache_set)
+    latest_data = LatestData(cache_set)
+
+    # only the latest buffer_size timestamps are held
+    released = reorder(buffer, latest_data, data.iloc[:20])
+    pd.testing.assert_frame_equal(released, data.iloc[:15], check_freq=False)
+
+    # the points earlier than the points released are dropped
+    released = reorder(buffer, latest_data, data.iloc[[10, 21, 14, 15]])
+    pd.testing.assert_frame_equal(released, data.iloc[15:16], check_freq=False)
+    pending = cache_set.get_cache(con.REORDER_CACHE)
+    pending = pd.DataFrame({key: pending.get_value(key) for key in data.columns})
+    pd.testing.assert_frame_equal(
+        pending, data.iloc[[16, 17, 18, 19, 21]], check_freq=False
+    )
+    with pytest.raises(NoNewDataError):
+        buffer.reorder(data.iloc[[3, 5]])
+
+
+def test_reorder_series_not_released():
+    data = data_generation(seed=5)
+    data.iloc[:35, 0] = np.nan
+    buffer = ReorderBuffer({con.LATENESS: "30T"}, StateStore())
+    (released,) = buffer.reorder(data.iloc[:40])
+    pd.testing.assert_frame_equal(released, data.iloc[:10, 1:], check_freq=False)
+
+
+def test_reorder_series_lagging():
+    data = data_generation(seed=6).iloc[:, :2]
+    cache_set = StateStore()
+    buffer = ReorderBuffer({con.LATENESS: "2T"}, cache_set)
+    latest_data = LatestData(cache_set)
+
+    # the points of field1 arrive 5 minutes later than the ones of field0
+    released = []
+    for start in range(0, 60, 10):
+        chunk = pd.concat(
+            [
+                data["field0"].iloc[start : start + 10],
+                data["field1"].iloc[max(start - 5, 0) : start + 5],
+            ],
+            axis=1,
+        )
+        released.append(reorder(buffer, latest_data, chunk))
+
+    # every series is released up to its own watermark
+    field1, field0 = released[0]
+    assert list(field0.columns) == ["field0"] and field0.index[-1] == data.index[7]
+    assert list(field1.columns) == ["field1"] and field1.index[-1] == data.index[2]
+    # the lagging series is not dropped by the watermark of the other series
+    for col in data.columns:
+        result = pd.concat(
+            [frame[col] for frames in released for frame in frames if col in frame]
+        )
+        pd.testing.assert_series_equal(
+            result, data[col].iloc[: len(result)], check_freq=False
+        )
+        # the points within the lateness of the latest point are held
+        assert len(result) == {"field0": 58, "field1": 53}[col]
+
+
+def test_reorder_max_pending():
+    data = data_generation(seed=7)
+    cache_set = StateStore()
+    buffer = ReorderBuffer({con.LATENESS: "30T", con.MAX_PENDING: 40}, cache_set)
+    pending = cache_set.get_cache(con.REORDER_CACHE)
+
+    # the oldest points of all series are dropped beyond the maximum of points held
+    with pytest.raises(NoNewDataError):
+        buffer.reorder(data.iloc[:20])
+    assert sum(len(pending.get_points(key)[0]) for key in data.columns) == 40
+    with pytest.raises(NoNewDataError):
+        buffer.reorder(data.iloc[20:25, :1].rename(columns={"field0": "field3"}))
+    keys = ["field0", "field1", "field2", "field3"]
+    assert sum(len(pending.get_points(key)[0]) for key in keys) == 40
+    assert len(pending.get_points("field3")[0]) == 5
+
+
+def test_reorder_disabled():
+    data = data_generation(seed=4)
+    buffer = ReorderBuffer({con.LATENESS: None}, StateStore())
+    assert buffer.reorder(data)[0] is data
@@ -0,0 +1,154 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import copy
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [
+    con.DIFFERENTIATE_AD,
+    con.BATCH_DIFFERENTIATE_AD,
+    con.INCREMENTAL_AD,
+    con.THRESHOLD_AD,
+    con.VALUE_CHANGE_AD,
+]
+
+
+def data_generation(seed: int, columns: list, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, len(columns))).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=columns,
+    )
+
+
+def assert_results_equal(results: list, expected: list):
+    assert len(results) == len(expected)
+    for actual_kv, expected_kv in zip(results, expected):
+        assert set(actual_kv) == set(expected_kv)
+        for name, value in expected_kv.items():
+            assert_frame_equal(actual_kv.get(name), value, check_freq=False)
+
+
+class TestRunBatch:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.batch = {
+            "host1": data_generation(1, ["cpu", "data1"]),
+            "host2": data_generation(2, ["cpu", "data1"]),
+            "host3": data_generation(3, ["v"]).iloc[1:],
+        }
+        yield
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch(self):
+        batch_detector = PipelineDetector(algo=algo, params=self.params)
+        detectors = {
+            key: PipelineDetector(algo=algo, params=self.params) for key in self.batch
+        }
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            results = batch_detector.run_batch(
+                {key: data.iloc[start:end] for key, data in self.batch.items()}
+            )
+            assert set(results) == set(self.batch)
+            for key, data in self.batch.items():
+                expected = detectors[key].run(data.iloc[start:end])
+                assert_results_equal(results[key], expected)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch_measurements_joining(self):
+        self.batch["host4"] = data_generation(4, ["cpu", "data1"])
+        self.batch["host5"] = data_generation(5, ["v"])
+        self.batch["host5"].iloc[[210, 230], 0] = np.nan
+        # the measurements join the batch at different times
+        joins = {"host1": 0, "host2": 200, "host3": 0, "host4": 250, "host5": 200}
+        batch_detector = PipelineDetector(algo=algo, params=self.params)
+        detectors = {
+            key: PipelineDetector(algo=algo, params=self.params) for key in self.batch
+        }
+        for start, end in [(0, 200), (200, 250), (250, 260), (260, 300)]:
+            batch = {
+                key: data.iloc[start:end]
+                for key, data in self.batch.items()
+                if joins[key] <= start
+            }
+            results = batch_detector.run_batch(batch)
+            assert set(results) == set(batch)
+            for key, data in batch.items():
+                assert_results_equal(results[key], detectors[key].run(data))
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch_invalid_measurement(self):
+        batch_detector = PipelineDetector(algo=algo, params=self.params)
+        detector = PipelineDetector(algo=algo, params=self.params)
+        batch = {key: data.iloc[:200] for key, data in self.batch.items()}
+        batch["host4"] = batch["host1"] * np.nan
+        # the measurement with too many missing values is left out of the results
+        results = batch_detector.run_batch(batch)
+        assert set(results) == {"host1", "host2", "host3"}
+        assert_results_equal(results["host2"], detector.run(batch["host2"]))
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_run_batch_series_lagging(self):
+        params = copy.deepcopy(self.params)
+        params[con.STREAM_FILTER][con.LATENESS] = "2T"
+        batch_detector = PipelineDetector(algo=algo, params=params)
+        detectors = {
+            key: PipelineDetector(algo=algo, params=params) for key in self.batch
+        }
+        for start in range(0, 300, 50):
+            # the points of data1 arrive 5 minutes later than the ones of cpu
+            batch = {}
+            for key, data in self.batch.items():
+                columns = [
+                    (
+                        data[col].iloc[max(start - 5, 0) : start + 45]
+                        if col == "data1"
+                        else data[col].iloc[start : start + 50]
+                    )
+                    for col in data
+                ]
+                batch[key] = pd.concat(columns, axis=1)
+            results = batch_detector.run_batch(batch)
+            for key, data in batch.items():
+                expected = detectors[key].run(data)
+                assert_results_equal(results[key], expected)
+                label = expected[0][con.LABEL]
+                assert label.dtypes.eq(bool).all()
+                assert list(label.columns) == list(data.columns)
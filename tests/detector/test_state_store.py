@@ -0,0 +1,220 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.cache import (
+    CacheSet,
+    SeriesHistory,
+    StackedStates,
+    StateStore,
+    WatermarkCache,
+)
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils import const as con
+from castor.utils.globalSymbol import Symbol
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.INCREMENTAL_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 2)).cumsum(axis=0)
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["cpu_usage", "memory"],
+    )
+
+
+class TestStateStore:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        yield
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_detectors_with_same_columns(self):
+        data_1 = data_generation(seed=1)
+        data_2 = data_generation(seed=2)
+
+        # detectors sharing one process but running different measurements
+        detector_1 = PipelineDetector(algo=algo, params=self.params)
+        detector_2 = PipelineDetector(algo=algo, params=self.params)
+        # detector running a single measurement
+        expected_detector = PipelineDetector(algo=algo, params=self.params)
+        assert detector_1.cache_set is not detector_2.cache_set
+
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            result_1 = detector_1.run(data_1.iloc[start:end])
+            detector_2.run(data_2.iloc[start:end])
+            expected = expected_detector.run(data_1.iloc[start:end])
+            for actual_kv, expected_kv in zip(result_1, expected):
+                assert_frame_equal(actual_kv.get(con.LABEL), expected_kv.get(con.LABEL))
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_given_state_store(self):
+        cache_set = StateStore()
+        detector = PipelineDetector(algo=algo, params=self.params, cache_set=cache_set)
+        detector.run(data_generation(seed=1))
+        assert len(cache_set.get_cache(con.DATA_CACHE)) == 2
+        assert len(CacheSet().get_cache(con.DATA_CACHE)) == 0
+
+        clear_cache()
+        assert len(cache_set.get_cache(con.DATA_CACHE)) == 0
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_detectors_expire_own_state_store(self):
+        detectors = [PipelineDetector(algo=algo, params=self.params) for _ in range(2)]
+        data = data_generation(seed=1)
+        for start, end, columns in [(0, 200, 2), (200, 210, 2), (210, 220, 1)]:
+            if start == 200:
+                Symbol().set_symbol("del_cache", True)
+            for detector in detectors:
+                detector.run(data.iloc[start:end, :columns])
+
+        # every detector expires its own state store once in a period,
+        # never the one of the other detector
+        Symbol().set_symbol("del_cache", True)
+        detectors[0].run(data.iloc[220:230, :1])
+        assert len(detectors[0].cache_set.get_cache(con.DATA_CACHE)) == 1
+        assert len(detectors[1].cache_set.get_cache(con.DATA_CACHE)) == 2
+        detectors[1].run(data.iloc[220:230, :1])
+        assert len(detectors[1].cache_set.get_cache(con.DATA_CACHE)) == 1
+
+
+def test_series_history():
+    rng = np.random.default_rng(0)
+    history = SeriesHistory()
+    expected = {}
+    chunks = [(["a", "b"], 3), (["b", "c", "d"], 7), (["a", "d"], 1), (["c"], 20)]
+    chunks += [(["a", "b", "c", "d", "e"], 4)]
+    time = 0
+    for keys, length in chunks:
+        block = rng.normal(size=(length, len(keys)))
+        times = np.arange(time, time + length)
+        time += length
+        history.append(keys, block, times, 5)
+        for i, key in enumerate(keys):
+            values, key_times = expected.get(key, (np.array([]), np.array([])))
+            expected[key] = (
+                np.append(values, block[:, i])[-5:],
+                np.append(key_times, times)[-5:],
+            )
+        for key, (values, key_times) in expected.items():
+            np.testing.assert_array_equal(history.get_value(key)[0], values)
+            np.testing.assert_array_equal(history.get_value(key)[1], key_times)
+
+    rows = history.get_rows(["e", "a", "x"])
+    np.testing.assert_array_equal(history.get_lengths(rows), [4, 5, 0])
+    values, times = history.gather(rows[:2], 4)
+    np.testing.assert_array_equal(values[:, 0], expected["e"][0])
+    np.testing.assert_array_equal(values[:, 1], expected["a"][0][-4:])
+    np.testing.assert_array_equal(times, expected["e"][1])
+
+    # the rows of expired series are reused
+    history.remove_values_skip_keys({"a", "e"})
+    assert sorted(history.keys()) == ["a", "e"]
+    history.append(["f"], np.ones((2, 1)), np.arange(2), 5)
+    assert len(history._length) == 8
+
+    # a smaller window keeps the latest values
+    history.append(["a"], np.full((1, 1), 9.0), np.array([100]), 3)
+    np.testing.assert_array_equal(
+        history.get_value("a")[0], np.append(expected["a"][0][-2:], 9.0)
+    )
+    np.testing.assert_array_equal(history.get_value("e")[0], expected["e"][0][-3:])
+
+    # the state can be restored by another history
+    restored = SeriesHistory()
+    restored.update(dict(history.items()))
+    for key in history.keys():
+        np.testing.assert_array_equal(restored.get_value(key), history.get_value(key))
+
+
+def test_watermark_cache():
+    cache = WatermarkCache()
+    time = pd.Timestamp("2022-08-24 08:00", tz="Asia/Shanghai")
+    cache.set_watermarks(["a", "b"], time)
+    cache.set_value("c", time + pd.Timedelta(minutes=1))
+    np.testing.assert_array_equal(
+        cache.get_watermarks(["c", "x", "a"]),
+        [time.value + 60 * 10**9, np.iinfo(np.int64).min, time.value],
+    )
+    assert cache.get_value("a") == time and cache.get_value("a").tz == time.tz
+    assert cache.get_latest(["a", "c", "x"]) == time + pd.Timedelta(minutes=1)
+    assert cache.get_latest(["x"]) is None
+
+    # the slots of expired series are reused
+    cache.remove_values_skip_keys({"a"})
+    cache.set_watermarks(["d", "e"], time)
+    assert sorted(cache.keys()) == ["a", "d", "e"]
+    assert len(cache._watermarks) == 4
+
+    restored = WatermarkCache()
+    restored.update(dict(cache.items()))
+    assert dict(restored.items()) == dict(cache.items())
+
+
+def test_stacked_states():
+    cache = StackedStates()
+    defaults = (np.full(3, np.nan), np.int64(0))
+    keys = ["0_a", "0_b", "1_a"]
+    states = (np.arange(9.0).reshape(3, 3), np.array([1, 2, 3]))
+    cache.scatter(keys, states)
+    values, count = cache.gather(["1_a", "0_x", "0_a"], defaults)
+    np.testing.assert_array_equal(values, [[6, 7, 8], [np.nan] * 3, [0, 1, 2]])
+    np.testing.assert_array_equal(count, [3, 0, 1])
+    np.testing.assert_array_equal(cache.get_value("0_b")[0], [3, 4, 5])
+
+    # the series are expired by the postfix of keys, and their rows are reused
+    cache.remove_values_skip_keys({"a"})
+    assert sorted(cache.keys()) == ["0_a", "1_a"]
+    cache.scatter(["0_c", "0_d"], (np.ones((2, 3)), np.array([4, 5])))
+    assert len(cache._states[0]) == 6
+    assert cache.get_value("0_c")[1] == 4
+
+    # the state can be restored by another cache, also from the tuples of columns
+    restored = StackedStates()
+    restored.update(dict(cache.items()))
+    restored.set_value("0_e", (np.zeros(3), 7))
+    for key in cache.keys():
+        for actual, expected in zip(restored.get_value(key), cache.get_value(key)):
+            np.testing.assert_array_equal(actual, expected)
+    assert restored.get_value("0_e")[1] == 7
+
+    # the states of other shapes replace the states kept
+    cache.scatter(["0_a"], (np.zeros((1, 5)), np.array([1])))
+    assert list(cache.keys()) == ["0_a"]
+    values, _ = cache.gather(["0_a"], defaults)
+    assert np.isnan(values).all()
@@ -20,6 +20,7 @@ import numpy as np
 
 from castor.detector.stream_filter.get_latest_data_module import (
     LatestData,
+    LatestDataContext,
     get_latest_index,
 )
 from castor.utils import logger as llogger
@@ -141,8 +142,9 @@ class TestStreamFilter:
         latest_data.update(self.max_window, result)
 
         # input data contains disorder data
-        data_disorder = self.data_df.iloc[8:19]
-        data_disorder = latest_data.filter_disorder_data(data_disorder)
+        data_input = self.data_df.iloc[8:19]
+        data_disorder = latest_data.filter_disorder_data(data_input)
+        assert len(data_input.columns) == 10
         latest_index = get_latest_index(data_disorder.columns)
         assert latest_index == pd.to_datetime("2022-08-24 00:16:00")
         result = latest_data.get_data(data_disorder, latest_index, window=self.window)
@@ -152,3 +154,40 @@ class TestStreamFilter:
         )
         assert all(result.columns == [0, 3, 4, 5, 6, 7, 8, 9])
         latest_data.update(self.max_window, data_disorder)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_latest_data_context(self):
+        latest_data = LatestData()
+        chunks = [(4, 6), (3, 8), (2, 10), (6, 12), (8, 14), (1, 17)]
+        chunks += [(15, 20), (19, 22), (22, 24), (21, 30)]
+        for start, end in chunks:
+            data = self.data_df.iloc[start:end]
+            latest_index = get_latest_index(data.columns)
+            context = LatestDataContext(latest_data, data, self.max_window)
+            for window in range(self.max_window + 2):
+                try:
+                    expected = latest_data.get_data(data, latest_index, window)
+                except ValueNotEnoughError:
+                    with pytest.raises(ValueNotEnoughError):
+                        context.get_data(window)
+                    continue
+                pd.testing.assert_frame_equal(context.get_data(window), expected)
+            latest_data.update(self.max_window, data)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_latest_data_timestamps(self):
+        # the stitched history carries the real timestamps, even with gaps
+        latest_data = LatestData()
+        index = self.data_df.index.delete([3, 4])
+        data = self.data_df.loc[index]
+        latest_data.update(self.max_window, data.iloc[:12])
+        new_data = data.iloc[12:14]
+        result = latest_data.get_data(
+            new_data, get_latest_index(new_data.columns), self.max_window
+        )
+        pd.testing.assert_index_equal(
+            result.index, data.index[12 - self.max_window : 14]
+        )
+        np.testing.assert_array_equal(
+            result.values, data.iloc[12 - self.max_window : 14].values
+        )
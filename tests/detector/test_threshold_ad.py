@@ -0,0 +1,80 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.threshold_ad import ThresholdAD
+from castor.detector.stream_filter.get_latest_data_module import (
+    LatestData,
+    LatestDataContext,
+)
+from castor.utils import const as con
+
+
+def data_generation(seed: int, length: int = 100) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(scale=2, size=(length, 4))
+    data[rng.integers(length, size=5), rng.integers(4, size=5)] = np.nan
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(4)],
+    )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {con.UPPER_BOUND: 1, con.LOWER_BOUND: -1},
+        {con.UPPER_BOUND: 1},
+        {con.LOWER_BOUND_KV: {"field1": -3, "field2": 0}},
+        {
+            con.UPPER_BOUND: 2,
+            con.UPPER_BOUND_KV: {"field0": 0.5},
+            con.LOWER_BOUND_KV: {"field3": -1},
+        },
+    ],
+)
+def test_threshold_label(params):
+    data = data_generation(seed=5)
+    cache_set = StateStore()
+    detector = ThresholdAD("test", dict(params, window=0), cache_set)
+    ub = params.get(con.UPPER_BOUND)
+    if con.UPPER_BOUND_KV in params:
+        ub = {col: params[con.UPPER_BOUND_KV].get(col, ub) for col in data.columns}
+    lb = params.get(con.LOWER_BOUND)
+    if con.LOWER_BOUND_KV in params:
+        lb = {col: params[con.LOWER_BOUND_KV].get(col, lb) for col in data.columns}
+    expected = ThresholdAD._get_frame_label(data, ub, lb)
+
+    for start, end in [(0, 50), (50, 100)]:
+        chunk = data.iloc[start:end]
+        time_series = {
+            con.ORIGIN: chunk,
+            con.LATEST_DATA_CONTEXT: LatestDataContext(
+                LatestData(cache_set), chunk, 10
+            ),
+        }
+        label = detector.detect(time_series)[con.LABEL]
+        pd.testing.assert_frame_equal(label, expected.iloc[start:end])
+    bounds = detector._bounds
+    detector.detect({con.ORIGIN: data.copy()})
+    assert detector._bounds is bounds
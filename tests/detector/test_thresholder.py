@@ -0,0 +1,127 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.thresholder.sigma_ewm import SigewmThresholder
+from castor.detector.thresholder.sigma_welford import WelfordThresholder
+from castor.detector.thresholder.thresholder import ThresholderModule
+from castor.utils import const as con
+
+
+def data_generation(seed: int, length: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = np.abs(rng.normal(size=(length, 6)))
+    data[rng.integers(length, size=10), 0] += 10
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(6)],
+    )
+
+
+def sigewm_loop(data: pd.DataFrame, window: int, sigma: float, state: list):
+    """the row by row recurrence of ema, emvar and counter"""
+    ema, emvar, counter = state
+    upper = np.empty(data.shape)
+    lower = np.empty(data.shape)
+    alpha = 2 / float(window + 1)
+    for s in range(len(data)):
+        delta = data.values[s] - ema
+        ema = ema + alpha * delta
+        emvar = (1 - alpha) * (emvar + alpha * delta**2)
+        counter = np.minimum(window, counter + 1)
+        tmp = sigma * np.sqrt(emvar)
+        upper[s] = np.where(counter == window, ema + tmp, np.inf)
+        lower[s] = np.where(counter == window, ema - tmp, -np.inf)
+    state[:] = [ema, emvar, counter]
+    return upper, lower
+
+
+def test_sigewm_thresholder():
+    data = data_generation(seed=2)
+    cache_set = StateStore()
+    thresholder = SigewmThresholder("test", cache_set, window=30, sigma=3)
+    state = [data.values[0], np.zeros(6), np.zeros(6)]
+    for start, end in [(0, 1), (1, 20), (20, 31), (31, 500)]:
+        chunk = data.iloc[start:end]
+        upper, lower = sigewm_loop(chunk, 30, 3, state)
+        label = thresholder.threshold(chunk)
+        np.testing.assert_array_equal(
+            label.values, (chunk.values > upper) | (chunk.values < lower)
+        )
+
+        # the state cached between calls is the one of the recurrence
+        cache = cache_set.get_cache(con.SIGMA_EWM_THRESHOLD_CACHE)
+        cached = np.array([cache.get_value("test_" + col) for col in data.columns])
+        np.testing.assert_allclose(cached, np.array(state).T, rtol=1e-10)
+    assert label.values.any()
+
+
+@pytest.mark.parametrize("window", [None, 20])
+def test_welford_thresholder(window):
+    data = data_generation(seed=3)
+    data.iloc[[5, 50, 51], 1] = np.nan
+    chunks = [(0, 1), (1, 7), (7, 100), (100, 101), (101, 500)]
+    params = {"sigma": 3, con.WINDOW: window}
+
+    # the moments of the scores up to every point
+    scores = data.expanding() if window is None else data.rolling(window, 1)
+    mean = scores.mean().to_numpy()
+    std = scores.std(ddof=0).to_numpy()
+    expected = (data.values > mean + 3 * std) | (data.values < mean - 3 * std)
+
+    thresholder = WelfordThresholder("test", StateStore(), **params)
+    labels = [thresholder.threshold(data.iloc[start:end]) for start, end in chunks]
+    np.testing.assert_array_equal(pd.concat(labels).values, expected)
+    upper, lower = WelfordThresholder("test", StateStore(), **params)._get_threshold(
+        data
+    )
+    np.testing.assert_allclose(upper, mean + 3 * std, rtol=1e-9)
+    np.testing.assert_allclose(lower, mean - 3 * std, rtol=1e-9)
+    assert expected.any()
+
+
+def test_welford_thresholder_restores_window_scores():
+    data = data_generation(seed=3)
+    data.iloc[5, 1] = np.nan
+    params = {"sigma": 3, con.WINDOW: 20}
+    thresholder = WelfordThresholder("test", StateStore(), **params)
+    thresholder.threshold(data.iloc[:100])
+    expected = thresholder._get_threshold(data.iloc[100:])
+
+    # the latest window scores of every series kept by the old versions
+    cache_set = StateStore()
+    cache_set.get_cache(con.WELFORD_THRESHOLD_CACHE).update(
+        {"test_" + str(col): data[col].values[80:100] for col in data.columns}
+    )
+    restored = WelfordThresholder("test", cache_set, **params)
+    for actual, bound in zip(restored._get_threshold(data.iloc[100:]), expected):
+        np.testing.assert_allclose(actual, bound, rtol=1e-9)
+
+
+def test_thresholder_module_choice():
+    module = ThresholderModule(
+        "test",
+        {"CHOICE": con.WELFORD_THRESHOLDER, con.WELFORD_THRESHOLDER: {"sigma": 3}},
+        StateStore(),
+    )
+    assert isinstance(module.thresholder_core, WelfordThresholder)
@@ -0,0 +1,65 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from castor.detector.cache.cache import StateStore
+from castor.detector.value_change_ad import ValueChangeAD
+from castor.utils import const as con
+
+
+def data_generation(seed: int, length: int = 100) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(
+        rng.integers(3, size=(length, 3)).astype(float),
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["field%d" % i for i in range(3)],
+    )
+    data.iloc[rng.integers(length, size=5), 1] = np.nan
+    data["status"] = pd.Categorical(
+        rng.choice(["up", "down", None], p=[0.6, 0.3, 0.1], size=length)
+    )
+    return data
+
+
+def test_value_change():
+    data = data_generation(seed=6)
+    expected = ~data.astype(object).eq(data.astype(object).shift())
+    params = {con.WINDOW: 1}
+    detector = ValueChangeAD("test", params, StateStore())
+    assert detector.window == 1 and params == {con.WINDOW: 1}
+    with pytest.raises(ValueError):
+        ValueChangeAD("test", {con.WINDOW: 5}, StateStore())
+
+    labels = []
+    for start, end in [(0, 1), (1, 2), (2, 30), (30, 31), (31, 100)]:
+        chunk = data.iloc[start:end]
+        labels.append(detector.detect({con.ORIGIN: chunk})[con.LABEL])
+    # the first point without previous value is not labeled
+    assert labels[0].empty
+    pd.testing.assert_frame_equal(pd.concat(labels), expected.iloc[1:])
+
+    # only the first point of the series never seen is masked
+    chunk = pd.DataFrame(
+        {"field0": [5.0, 5.0, 2.0], "field9": [1.0, 1.0, 2.0]},
+        index=pd.date_range(start="2022-08-25", periods=3, freq="T"),
+    )
+    label = detector.detect({con.ORIGIN: chunk})[con.LABEL]
+    assert label.to_numpy().tolist() == [[True, False], [False, False], [True, True]]
@@ -0,0 +1,147 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.runtime.sharded_runtime import ShardedRuntime
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.INCREMENTAL_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 2)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["cpu", "memory"],
+    )
+
+
+class TestShardedRuntime:
+    @pytest.fixture()
+    def env_ready(self, tmp_path):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.batch = {"host%d" % i: data_generation(i) for i in range(6)}
+        self.runtime = ShardedRuntime(
+            algo=algo,
+            params=self.params,
+            workers=3,
+            state_dir=str(tmp_path),
+            checkpoint_interval=1,
+        )
+        yield
+        self.runtime.close()
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_sharded_runtime_with_restart(self):
+        detectors = {
+            key: PipelineDetector(algo=algo, params=self.params) for key in self.batch
+        }
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            results = self.runtime.run(
+                {key: data.iloc[start:end] for key, data in self.batch.items()}
+            )
+            assert set(results) == set(self.batch)
+            for key, data in self.batch.items():
+                expected = detectors[key].run(data.iloc[start:end])
+                for actual_kv, expected_kv in zip(results[key], expected):
+                    assert_frame_equal(
+                        actual_kv.get(con.LABEL),
+                        expected_kv.get(con.LABEL),
+                        check_freq=False,
+                    )
+            # the worker reloads its state shard after restarting
+            self.runtime._processes[self.runtime.get_shard("host0")].kill()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_sharded_runtime_worker_killed_in_batch(self):
+        detectors = {
+            key: PipelineDetector(algo=algo, params=self.params) for key in self.batch
+        }
+        shard = self.runtime.get_shard("host0")
+        send = self.runtime._send
+
+        def send_and_kill(to_shard, message):
+            send(to_shard, message)
+            if to_shard == shard:
+                self.runtime._processes[shard].kill()
+
+        for start, end in [(0, 200), (200, 250)]:
+            batch = {key: data.iloc[start:end] for key, data in self.batch.items()}
+            if start:
+                # the worker dies while detecting, the batch is detected again
+                # by a new worker from the state shard
+                self.runtime._send = send_and_kill
+            results = self.runtime.run(batch)
+            assert set(results) == set(self.batch) and not self.runtime.errors
+            for key, data in batch.items():
+                expected = detectors[key].run(data)
+                for actual_kv, expected_kv in zip(results[key], expected):
+                    assert_frame_equal(
+                        actual_kv.get(con.LABEL),
+                        expected_kv.get(con.LABEL),
+                        check_freq=False,
+                    )
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_sharded_runtime_shard_failed(self):
+        detectors = {
+            key: PipelineDetector(algo=algo, params=self.params) for key in self.batch
+        }
+        failed = self.runtime.get_shard("host0")
+        for start, end in [(0, 200), (200, 250), (250, 300)]:
+            batch = {key: data.iloc[start:end] for key, data in self.batch.items()}
+            if start == 200:
+                batch["host0"] = batch["host0"].reset_index(drop=True)
+            results = self.runtime.run(batch)
+            # the results of the other shards are kept when a shard fails
+            if start == 200:
+                assert set(self.runtime.errors) == {
+                    key for key in batch if self.runtime.get_shard(key) == failed
+                }
+            else:
+                assert not self.runtime.errors
+            for key, data in batch.items():
+                if self.runtime.get_shard(key) == failed:
+                    continue
+                expected = detectors[key].run(data)
+                for actual_kv, expected_kv in zip(results[key], expected):
+                    assert_frame_equal(
+                        actual_kv.get(con.LABEL),
+                        expected_kv.get(con.LABEL),
+                        check_freq=False,
+                    )
@@ -0,0 +1,137 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import asyncio
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.organize_cache import clear_cache
+from castor.server.ingest_server import IngestServer, format_anomalies
+from castor.server.line_protocol import LineProtocolError, parse_line
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 2)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["usage", "idle"],
+    )
+
+
+def to_lines(series_key: str, data: pd.DataFrame) -> list:
+    return [
+        "%s usage=%r,idle=%r %d" % (series_key, row[0], row[1], timestamp)
+        for timestamp, row in zip(data.index.asi8, data.to_numpy())
+    ]
+
+
+def test_parse_line():
+    measurement, series_key, fields, timestamp = parse_line(
+        'cpu,region=east,host=a usage=0.5,cores=4i,up=true,name="x y" 1661299200'
+    )
+    assert measurement == "cpu"
+    assert series_key == "cpu,host=a,region=east"
+    assert fields == {"usage": 0.5, "cores": 4, "up": True, "name": "x y"}
+    assert timestamp == 1661299200
+
+    measurement, series_key, fields, timestamp = parse_line(
+        r"disk\ io,path=/a\,b used=1", precision="s"
+    )
+    assert measurement == "disk io"
+    assert series_key == r"disk\ io,path=/a\,b"
+    assert fields == {"used": 1.0}
+    assert timestamp is None
+
+    for line in ["cpu", "cpu usage", "cpu usage=abc 1", "cpu usage=1 now"]:
+        with pytest.raises(LineProtocolError):
+            parse_line(line)
+
+
+class TestIngestServer:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.batch = {"cpu,host=h%d" % i: data_generation(i) for i in range(3)}
+        yield
+        clear_cache()
+
+    async def send_lines(self, max_batch_points: int) -> list:
+        anomalies = []
+
+        async def collect(lines):
+            anomalies.extend(lines)
+
+        server = IngestServer(
+            algo=algo,
+            params=self.params,
+            max_batch_points=max_batch_points,
+            max_delay=60,
+            anomaly_writer=collect,
+        )
+        await server.start(port=0)
+        port = server._servers[0].sockets[0].getsockname()[1]
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        lines = []
+        for series_key, data in self.batch.items():
+            lines.extend(to_lines(series_key, data))
+        writer.write(("\n".join(lines) + "\nmalformed line\n").encode())
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+        # wait for the server to read all points
+        while server.number_points + server.number_errors < len(lines) + 1:
+            await asyncio.sleep(0.01)
+        await server.close()
+        assert server.number_errors == 1
+        return anomalies
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_ingest_server(self):
+        anomalies = asyncio.run(self.send_lines(max_batch_points=100000))
+
+        detector = PipelineDetector(algo=algo, params=self.params)
+        expected = []
+        for series_key, results in detector.run_batch(self.batch).items():
+            expected.extend(format_anomalies(series_key, algo, results))
+        assert len(expected) > 0
+        assert sorted(anomalies) == sorted(expected)
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_ingest_server_by_size(self):
+        # the batches are dispatched by size and detected in arrival order
+        anomalies = asyncio.run(self.send_lines(max_batch_points=100))
+        assert len(anomalies) > 0
+        assert all(line.startswith("cpu,host=h") for line in anomalies)
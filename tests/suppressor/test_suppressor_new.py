@@ -33,6 +33,8 @@ from castor.detector.suppressor.suppressor import (
     SuppressorPipeline,
 )
 from castor.utils import logger as llogger, const as con
+from castor.detector.cache.cache import StateStore
+from castor.utils.common import FIFOData
 from castor.detector.cache.organize_cache import clear_cache
 
 CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
@@ -186,3 +188,132 @@ class TestSuppressor:
         assert sum(detect_results.get(con.LABEL).iloc[:, 0]) == result.get(module).get(
             if_anomaly_bool
         )
+
+
+def continuous_suppress_loop(labels: pd.DataFrame, gap: pd.Timedelta) -> pd.DataFrame:
+    """the anomaly by anomaly suppression of every column"""
+    result = labels.copy()
+    for col in labels.columns:
+        last_anomaly_index = None
+        for index in labels.index[labels[col]]:
+            if last_anomaly_index is not None and index - last_anomaly_index <= gap:
+                result.loc[index, col] = False
+            else:
+                last_anomaly_index = index
+    return result
+
+
+def test_continuous_suppress_columns():
+    rng = np.random.default_rng(0)
+    labels = pd.DataFrame(
+        rng.random((200, 50)) < 0.1,
+        index=pd.date_range(start="2021-01-02", periods=200, freq="T", tz="UTC"),
+        columns=["field%d" % i for i in range(50)],
+    )
+    suppressor = ContinuousAnomalySuppressor(
+        name="Gemini", params={con.GAP: "7T"}, cache_set=StateStore()
+    )
+    chunks = [(0, 3), (3, 50), (50, 51), (51, 200)]
+    result = pd.concat(
+        [suppressor.suppress(labels.iloc[start:end]) for start, end in chunks]
+    )
+    pd.testing.assert_frame_equal(
+        result, continuous_suppress_loop(labels, pd.Timedelta("7T"))
+    )
+    assert labels.values.sum() > result.values.sum() > 0
+
+
+def variation_suppress_loop(
+    labels: pd.DataFrame, ori_data: pd.DataFrame, threshold: float, length: int
+) -> pd.DataFrame:
+    """the anomaly by anomaly suppression of every column"""
+    result = labels.copy()
+    for col in labels.columns:
+        values = ori_data[col].values
+        for index in labels.index[labels[col]]:
+            position = ori_data.index.get_loc(index)
+            history = values[max(position - length, 0) : position]
+            if history.size == 0:
+                continue
+            variation = max(
+                abs(values[position] - history.max()) / (abs(history.max()) + 1e-9),
+                abs(values[position] - history.min()) / (abs(history.min()) + 1e-9),
+            )
+            if variation < threshold:
+                result.loc[index, col] = False
+    return result
+
+
+@pytest.mark.parametrize("history_length", [1, 4, 50])
+def test_variation_ratio_suppress_columns(history_length):
+    rng = np.random.default_rng(history_length)
+    ori_data = pd.DataFrame(
+        100 + rng.normal(size=(120, 30)) * rng.uniform(1, 10, size=30),
+        index=pd.date_range(start="2021-01-02", periods=120, freq="T"),
+        columns=["field%d" % i for i in range(30)],
+    )
+    ori_data.iloc[rng.integers(120, size=5), rng.integers(30, size=5)] = np.nan
+    labels = pd.DataFrame(
+        rng.random((100, 30)) < 0.2, index=ori_data.index[20:], columns=ori_data.columns
+    )
+    labels.iloc[:, 3] = False
+    labels.iloc[0, :] = True
+    expected = variation_suppress_loop(labels, ori_data, 0.1, history_length)
+
+    suppressor = VariationRatioSuppressor(
+        name="Gemini", params={"threshold": 0.1, "history_length": history_length}
+    )
+    result = suppressor.suppress(labels, ori_data)
+    pd.testing.assert_frame_equal(result, expected)
+    assert labels.values.sum() > result.values.sum() > 0
+
+    # the anomalies of the first point have empty history
+    result = suppressor.suppress(labels.iloc[:5], ori_data.iloc[20:])
+    assert result.iloc[0].all()
+
+
+def transient_suppress_loop(labels: pd.DataFrame, window: int, anomalies: int):
+    """the column by column suppression with the whole history"""
+    result = labels.copy()
+    for col in labels.columns:
+        counts = np.convolve(labels[col].values, np.ones(window, dtype=int))
+        result[col] = labels[col].values & (counts[: len(labels)] >= anomalies)
+    return result
+
+
+@pytest.mark.parametrize("window, anomalies", [(5, 3), (2, 2), (12, 4)])
+def test_transient_suppress_columns(window, anomalies):
+    rng = np.random.default_rng(window)
+    labels = pd.DataFrame(
+        rng.random((120, 40)) < 0.3,
+        index=pd.date_range(start="2021-01-02", periods=120, freq="T"),
+        columns=["field%d" % i for i in range(40)],
+    )
+    cache_set = StateStore()
+    params = {con.WINDOW: window, "anomalies": anomalies}
+    suppressor = TransientAnomalySuppressor("Gemini", params, cache_set)
+    chunks = [(0, 1), (1, 4), (4, 60), (60, 61), (61, 120)]
+    result = pd.concat(
+        [suppressor.suppress(labels.iloc[start:end]) for start, end in chunks]
+    )
+    pd.testing.assert_frame_equal(
+        result, transient_suppress_loop(labels, window, anomalies)
+    )
+    assert labels.values.sum() > result.values.sum() > 0
+
+
+def test_transient_suppress_fifo_cache():
+    labels = pd.DataFrame(
+        {"field0": [True, False, True, False], "field1": [True, True, False, True]},
+        index=pd.date_range(start="2021-01-02", periods=4, freq="T"),
+    )
+    cache_set = StateStore()
+    # the labels cached by the old versions are restored
+    history = FIFOData(6, array_type=bool)
+    history.update(np.array([False, True, True]))
+    cache = cache_set.get_cache(con.SUPPRESS_CACHE)
+    cache.set_value("Gemini_TransientAnomalySuppressorfield0", history)
+    params = {con.WINDOW: 5, "anomalies": 3}
+    result = TransientAnomalySuppressor("Gemini", params, cache_set).suppress(labels)
+    assert list(result["field0"]) == [True, False, True, False]
+    assert list(result["field1"]) == [False, False, False, True]
@@ -0,0 +1,109 @@
+"""
+Copyright 2022 Huawei Cloud Computing Technologies Co., Ltd.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+ http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+import os
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from castor.utils.base_functions import load_params_from_yaml
+from castor.detector.pipeline_detector import PipelineDetector
+from castor.detector.cache.organize_cache import clear_cache
+from castor.utils.instrumentation import Instrumentation, StageStats
+from castor.utils import const as con
+from castor.utils import logger as llogger
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+TESTS_PATH = os.path.split(CURRENT_PATH)[0]
+CONF_PATH = os.path.join(TESTS_PATH, "conf")
+llogger.basic_config(level="DEBUG")
+
+algo = [con.DIFFERENTIATE_AD, con.INCREMENTAL_AD, con.THRESHOLD_AD]
+
+
+def data_generation(seed: int, length: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(length, 2)).cumsum(axis=0)
+    data[rng.integers(length, size=10), 0] += 30
+    return pd.DataFrame(
+        data,
+        index=pd.date_range(start="2022-08-24", periods=length, freq="T"),
+        columns=["cpu", "memory"],
+    )
+
+
+def test_stage_stats():
+    stats = StageStats()
+    for duration in [1e-6, 3e-6, 1e-3, 100.0]:
+        stats.record(duration, rows=10, columns=2)
+    result = stats.to_dict()
+    assert result["count"] == 4
+    assert result["rows"] == 40
+    assert result["max_seconds"] == 100.0
+    assert result["p50_seconds"] == pytest.approx(4e-6)
+    assert result["p99_seconds"] == 100.0
+    assert sum(result["histogram"].values()) == 4
+
+
+class TestInstrumentation:
+    @pytest.fixture()
+    def env_ready(self):
+        self.params = load_params_from_yaml(
+            config_file=os.path.join(CONF_PATH, "detect_base.yaml")
+        )
+        self.instrumentation = Instrumentation()
+        self.instrumentation.reset()
+        yield
+        self.instrumentation.disable()
+        self.instrumentation.reset()
+        clear_cache()
+
+    @pytest.mark.usefixtures("env_ready")
+    def test_instrumentation(self):
+        data = data_generation(seed=1)
+        detector = PipelineDetector(algo=algo, params=self.params)
+        detector.run(data.iloc[:200])
+        assert self.instrumentation.snapshot()["stages"] == {}
+
+        self.instrumentation.enable()
+        detector.run(data.iloc[200:250])
+        detector.run(data.iloc[250:])
+        snapshot = self.instrumentation.snapshot()
+        stages = snapshot["stages"]
+        for stage in [
+            "PipelineDetector.run",
+            "PreProcess.validate_preprocess",
+            "LatestData.filter_disorder_data",
+            "LatestData.update",
+            "DIFFERENTIATEAD.detect",
+            "IncrementalAD.detect",
+            "ThresholdAD.detect",
+            "SigewmThresholder.threshold",
+            "ContinuousAnomalySuppressor.suppress",
+            "SeverityLevelCombiner.run",
+        ]:
+            assert stages[stage]["count"] > 0
+        assert stages["PipelineDetector.run"]["count"] == 2
+        assert stages["PipelineDetector.run"]["rows"] == 100
+        assert stages["PipelineDetector.run"]["columns"] == 4
+        assert snapshot["gauges"]["cache_sizes"][con.DATA_CACHE] >= 2
+        assert snapshot["gauges"]["state_stores"] >= 1
+
+        self.instrumentation.disable()
+        detector.run(data_generation(seed=1, length=310).iloc[300:])
+        assert self.instrumentation.snapshot()["stages"] == stages
@@ -20,7 +20,14 @@ import pytest
 import pandas as pd
 import numpy as np
 
-from castor.utils.common import monotonic_concatenate, get_freq
+import pyarrow as pa
+
+from castor.utils.common import (
+    monotonic_concatenate,
+    get_freq,
+    arrow_to_frame,
+    FIFOData,
+)
 
 
 a = np.ones((10, 2))
@@ -65,3 +72,53 @@ class TestUtils:
 class TestFreq:
     def test_get_freq(self, freqdat):
         assert freqdat[1] == get_freq(freqdat[0])
+
+
+def test_arrow_to_frame():
+    times = pd.date_range(start="2022-08-24", periods=6, freq="T")
+    table = pa.Table.from_batches(
+        [
+            pa.record_batch(
+                [
+                    pa.array(times[start:end], type=pa.timestamp("ms")),
+                    pa.array([1.0, None, 3.0, 4.0, 5.0, 6.0][start:end]),
+                    pa.array([1, 2, 3, 4, 5, 6][start:end], type=pa.int32()),
+                ],
+                names=["time", "cpu", "count"],
+            )
+            for start, end in [(0, 2), (2, 6)]
+        ]
+    )
+    expected = pd.DataFrame(
+        {"cpu": [1.0, np.nan, 3.0, 4.0, 5.0, 6.0], "count": np.arange(1.0, 7.0)},
+        index=times,
+    )
+    pd.testing.assert_frame_equal(arrow_to_frame(table), expected, check_freq=False)
+    pd.testing.assert_frame_equal(
+        arrow_to_frame(table.to_batches()[1]), expected.iloc[2:], check_freq=False
+    )
+    with pytest.raises(ValueError):
+        arrow_to_frame(table, time_column="timestamp")
+
+
+def test_fifo_data():
+    fifo = FIFOData(5)
+    expected = np.array([])
+    for start, end in [(0, 2), (2, 3), (3, 7), (7, 7), (7, 8), (8, 20), (20, 24)]:
+        values = np.arange(start, end, dtype=float)
+        fifo.update(values, values.astype(np.int64) * 10)
+        expected = np.append(expected, values)[-5:]
+        np.testing.assert_array_equal(fifo.get_filling_data(), expected)
+        np.testing.assert_array_equal(fifo.get_times(), expected.astype(np.int64) * 10)
+        np.testing.assert_array_equal(np.concatenate(fifo.get_segments()), expected)
+        assert fifo.get_length() == len(expected)
+        assert fifo.is_full() == (len(expected) == 5)
+
+    # the segments are views of the buffer
+    first, second = fifo.get_segments()
+    assert len(second) > 0 and np.shares_memory(first, fifo._data)
+    # the timestamps are dropped once values without timestamps are appended
+    fifo.update(np.array([1.0]))
+    assert fifo.get_times() is None
+    fifo.set_data(np.arange(3, dtype=float), np.arange(3))
+    np.testing.assert_array_equal(fifo.get_times(), np.arange(3))